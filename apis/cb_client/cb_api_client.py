@@ -1,29 +1,62 @@
-import random
-
 from openapi_client import ApiClient, Configuration, TrackerItemApi, TrackerApi, TestRunApi, ProjectApi
 
+from apis.cb_client.metadata_cache import MetadataCache
+from apis.cb_client.rate_limiter import AdaptiveRateLimiter, InFlightCounter, RateLimitedApi
 from apis.cb_client.utils import Utils
+from structured_logging import PER_ITEM, get_logger
+from tracing import ContextThreadPoolExecutor
 
+logger = get_logger("cb_client")
 
-class CBApiClient:
-    _member_ids = []
 
-    def __init__(self, url, username, password):
+# Outcome of one item in a bulk create: the created item, or the error that stopped it
+class BulkCreateResult:
+    def __init__(self, item_request, item=None, error=None):
+        self.item_request = item_request
+        self.item = item
+        self.error = error
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+
+class CBApiClient:
+    # Largest page size Codebeamer accepts for item listings
+    MAX_PAGE_SIZE = 500
+
+    # pool_size is the number of keep-alive connections kept to the server, it should be at least
+    # the number of threads that use this client at once (defaults to max_workers)
+    def __init__(self, url, username, password, max_workers=8, pool_size=None):
+        self.max_workers = max_workers
+        self.pool_size = pool_size or max_workers
         config = Configuration()
         config.username = username
         config.password = password
         config.host = url + "/api"
+        config.connection_pool_maxsize = self.pool_size
         api_client = ApiClient(configuration=config)
+        self.api_client = api_client
+        self.host = config.host
 
-        self.tracker_api_instance = TrackerApi(api_client)
-        self.tracker_item_api_instance = TrackerItemApi(api_client)
-        self.test_run_api_instance = TestRunApi(api_client)
-        self.project_api_instance = ProjectApi(api_client)
+        # Every call to the server goes through the shared per-server rate limiter
+        self.rate_limiter = AdaptiveRateLimiter.for_server(config.host)
+        self.in_flight = InFlightCounter()
+        self.tracker_api_instance = RateLimitedApi(TrackerApi(api_client), self.rate_limiter, in_flight=self.in_flight)
+        self.tracker_item_api_instance = RateLimitedApi(TrackerItemApi(api_client), self.rate_limiter, in_flight=self.in_flight)
+        self.test_run_api_instance = RateLimitedApi(TestRunApi(api_client), self.rate_limiter, in_flight=self.in_flight)
+        self.project_api_instance = RateLimitedApi(ProjectApi(api_client), self.rate_limiter, in_flight=self.in_flight)
 
-    # Populates project relevant data
+        self.metadata_cache = MetadataCache.for_server(config.host, username)
+
+    # Loads project relevant data ahead of the first job. Clients are shared between sessions,
+    # so the data is cached per project rather than kept as the client's current project.
     def populate_project_data(self, project_id):
-        self._member_ids = []
-        self.populate_member_ids(project_id)
+        self.get_project_member_ids(project_id)
+
+    # Closes the pooled connections to the server, the client can still be used afterwards
+    def close(self):
+        self.api_client.rest_client.pool_manager.clear()
 
     # Creates tracker item
     def create_generic_tracker_item(self, tracker_id: int, name: str, description: str, upstream):
@@ -32,35 +65,113 @@ class CBApiClient:
         if upstream is not None:
             new_tracker_item.subjects = [upstream]
 
-        print("Adding " + name + " to " + str(tracker_id) + " tracker...")
+        logger.debug("Adding " + name + " to tracker", extra={"tracker_id": tracker_id, **PER_ITEM})
 
         response_object = self.tracker_item_api_instance.create_tracker_item(
             tracker_id, new_tracker_item)
         return response_object
 
-    # Creates list of all members on project
-    def populate_member_ids(self, project_id):
-        members = self.project_api_instance.get_members_of_project(project_id)
-        user_references = members.members  # contains the list of UserReference objects
+    # Creates the item for one (tracker_id, name, description, upstream) request without raising
+    def try_create_generic_tracker_item(self, item_request):
+        try:
+            return BulkCreateResult(item_request, item=self.create_generic_tracker_item(*item_request))
+        except Exception as e:
+            logger.warning("Failed to add " + str(item_request[1]) + ": " + str(e),
+                           extra={"tracker_id": item_request[0], **PER_ITEM})
+            return BulkCreateResult(item_request, error=e)
+
+    # Creates a list of (tracker_id, name, description, upstream) requests with bounded concurrency.
+    # Results come back in input order and a failed item never stops the rest of the batch.
+    # on_result is called from the worker threads as each item finishes.
+    def create_generic_tracker_items(self, item_requests, max_workers=None, on_result=None):
+        item_requests = list(item_requests)
+        if not item_requests:
+            return []
+
+        def create(item_request):
+            result = self.try_create_generic_tracker_item(item_request)
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        with ContextThreadPoolExecutor(max_workers=min(max_workers or self.max_workers, len(item_requests))) as executor:
+            results = list(executor.map(create, item_requests))
+
+        failed_count = sum(1 for result in results if not result.succeeded)
+        logger.info("Created " + str(len(results) - failed_count) + " of " + str(len(results)) + " items (" +
+                    str(failed_count) + " failed)")
+        return results
+
+    # IDs of all members on a project
+    def get_project_member_ids(self, project_id):
+        def load():
+            members = self.project_api_instance.get_members_of_project(project_id)
+            return [user_ref.id for user_ref in members.members or []]  # members is a list of UserReference objects
+
+        return self.metadata_cache.get_or_load(("members", project_id), load)
+
+    # Gets all item references in a tracker. The first page is used to read the total, then the
+    # remaining pages are fetched with at most max_workers requests in flight. Order is preserved.
+    # Setting the optional cancelled event stops the listing before the next page is requested
+    def get_paginated_tracker_items(self, tracker_id, page_size=MAX_PAGE_SIZE, max_workers=None, cancelled=None):
+        page_size = max(1, min(page_size, self.MAX_PAGE_SIZE))
+        max_workers = max_workers or self.max_workers
+
+        first_page = self.tracker_api_instance.get_items_by_tracker(tracker_id, 1, page_size)
+        page_count = ((first_page.total or 0) + page_size - 1) // page_size
+
+        all_items = list(first_page.item_refs or [])
+        if page_count <= 1:
+            return all_items
+
+        def get_page(page):
+            if cancelled is not None and cancelled.is_set():
+                raise Exception("Listing items of tracker " + str(tracker_id) + " was cancelled")
+            return self.tracker_api_instance.get_items_by_tracker(tracker_id, page, page_size).item_refs or []
+
+        with ContextThreadPoolExecutor(max_workers=min(max_workers, page_count - 1)) as executor:
+            for items in executor.map(get_page, range(2, page_count + 1)):
+                all_items.extend(items)
 
-        # Collect member IDs
-        for user_ref in user_references:
-            self._member_ids.append(user_ref.id)  # Collect the ID
+        return all_items
 
-    def get_paginated_tracker_items(self, tracker_id):
-        page_size = 100
-        sample = self.tracker_api_instance.get_items_by_tracker(tracker_id, 1, page_size)
-        total_items = sample.total
-        page_count = (total_items + page_size - 1) // page_size
+    # Cached metadata lookups. Tracker schema rarely changes during a demo build, so these are
+    # served from the per-server, per-user MetadataCache until the TTL expires or they are invalidated.
+    def get_tracker(self, tracker_id):
+        return self.metadata_cache.get_or_load(
+            ("tracker", tracker_id), lambda: self.tracker_api_instance.get_tracker(tracker_id))
 
-        all_items = []
+    def get_tracker_fields(self, tracker_id):
+        return self.metadata_cache.get_or_load(
+            ("fields", tracker_id), lambda: self.tracker_api_instance.get_tracker_fields(tracker_id))
 
-        for page in range(1, page_count + 1):
-            items = self.tracker_api_instance.get_items_by_tracker(tracker_id, page, page_size).item_refs
-            all_items.extend(items)
+    def get_tracker_field(self, tracker_id, field_id):
+        return self.metadata_cache.get_or_load(
+            ("field", tracker_id, field_id), lambda: self.tracker_api_instance.get_tracker_field(tracker_id, field_id))
 
-        return all_items
+    def get_tracker_field_by_name(self, tracker_id, field_name):
+        for field in self.get_tracker_fields(tracker_id):
+            if field.name == field_name:
+                return self.get_tracker_field(tracker_id, field.id)
+        return None
 
-    @property
-    def member_ids(self):
-        return self._member_ids
+    # Options of a choice field
+    def get_field_options(self, tracker_id, field_id):
+        return getattr(self.get_tracker_field(tracker_id, field_id), "options", None) or []
+
+    # Columns of a table field
+    def get_table_columns(self, tracker_id, field_id):
+        return getattr(self.get_tracker_field(tracker_id, field_id), "columns", None) or []
+
+    def get_tracker_transitions(self, tracker_id):
+        return self.metadata_cache.get_or_load(
+            ("transitions", tracker_id), lambda: self.tracker_api_instance.get_tracker_transitions(tracker_id))
+
+    def invalidate_metadata(self, tracker_id=None):
+        self.metadata_cache.invalidate(tracker_id)
+
+    def metadata_cache_stats(self):
+        return self.metadata_cache.stats()
+
+    def rate_limiter_stats(self):
+        return self.rate_limiter.stats()
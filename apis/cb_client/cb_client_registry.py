@@ -0,0 +1,89 @@
+import hashlib
+import logging
+import threading
+
+from apis.cb_client.cb_api_client import CBApiClient
+
+
+# Counts the connections urllib3 throws away because a pool was already full. urllib3 only
+# logs these, so the filter watches its logger and lets every record through.
+class PoolFullCounter(logging.Filter):
+    def __init__(self):
+        super().__init__()
+        self.discards = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.getMessage().startswith("Connection pool is full"):
+            host = str(record.args[0]) if record.args else ""
+            with self._lock:
+                self.discards[host] = self.discards.get(host, 0) + 1
+        return True
+
+    def discards_for(self, url):
+        with self._lock:
+            return sum(count for host, count in self.discards.items() if host and host in url)
+
+
+# Process-wide registry of Codebeamer clients. Sessions that log in to the same server as the
+# same user share one client, so its connection pool and TLS sessions are reused between
+# logins. A client is closed once the last session using it lets go.
+class CBClientRegistry:
+    def __init__(self, max_workers=8, pool_size=None):
+        self.max_workers = max_workers
+        self.pool_size = pool_size or max_workers
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.pool_full_counter = PoolFullCounter()
+        logging.getLogger("urllib3.connectionpool").addFilter(self.pool_full_counter)
+
+    # Returns the shared client for these credentials, creating it on first use.
+    # Every acquire must be matched by a release.
+    def acquire(self, url, username, password):
+        key = (url, username, hashlib.sha256((password or "").encode()).hexdigest())
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                client = CBApiClient(url, username, password, max_workers=self.max_workers, pool_size=self.pool_size)
+                entry = {"client": client, "key": key, "refs": 0}
+                self._clients[key] = entry
+            entry["refs"] += 1
+            return entry["client"]
+
+    def release(self, cb_api_client):
+        with self._lock:
+            entry = next((entry for entry in self._clients.values() if entry["client"] is cb_api_client), None)
+            if entry is None:
+                # Not one of ours, e.g. created before the registry existed
+                unused = True
+            else:
+                entry["refs"] -= 1
+                unused = entry["refs"] <= 0
+                if unused:
+                    del self._clients[entry["key"]]
+
+        if unused:
+            cb_api_client.close()
+
+    # Saturation is the highest number of concurrent calls seen relative to the pool size,
+    # anything above 1.0 means connections were opened and discarded. Only the given client's
+    # stats are returned when one is passed.
+    def stats(self, cb_api_client=None):
+        with self._lock:
+            entries = [entry for entry in self._clients.values()
+                       if cb_api_client is None or entry["client"] is cb_api_client]
+
+        clients = []
+        for entry in entries:
+            client = entry["client"]
+            clients.append({
+                "url": client.host,
+                "user": entry["key"][1],
+                "sessions": entry["refs"],
+                "pool_size": client.pool_size,
+                "in_flight": client.in_flight.current,
+                "peak_in_flight": client.in_flight.peak,
+                "saturation": round(client.in_flight.peak / client.pool_size, 2),
+                "pool_full_discards": self.pool_full_counter.discards_for(client.host),
+            })
+        return {"clients": clients}
@@ -0,0 +1,100 @@
+import threading
+import time
+
+
+# TTL cache for tracker schema (tracker info, field definitions, transitions) that barely changes.
+# One cache is shared by every CBApiClient talking to the same Codebeamer server as the same user,
+# since what a tracker's schema shows depends on the user's permissions.
+class MetadataCache:
+    DEFAULT_TTL_SECONDS = 300
+
+    # Kinds of metadata that belong to one tracker, i.e. keys of the form (kind, tracker_id, ...)
+    TRACKER_KINDS = ("tracker", "fields", "field", "transitions")
+
+    _caches = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expirations = 0
+        self._next_prune = time.monotonic() + ttl_seconds
+
+    @classmethod
+    def for_server(cls, server_url, username, ttl_seconds=DEFAULT_TTL_SECONDS):
+        key = (server_url, username)
+        with cls._caches_lock:
+            if key not in cls._caches:
+                cls._caches[key] = cls(ttl_seconds)
+            return cls._caches[key]
+
+    # Stats of every server's caches added up over their users, keyed by server url
+    @classmethod
+    def all_stats(cls):
+        with cls._caches_lock:
+            caches = dict(cls._caches)
+
+        totals = {}
+        for (server_url, _), cache in caches.items():
+            server_totals = totals.setdefault(server_url, {"hits": 0, "misses": 0, "expirations": 0, "entries": 0})
+            for key, value in cache.stats().items():
+                if key in server_totals:
+                    server_totals[key] += value
+
+        for server_totals in totals.values():
+            lookups = server_totals["hits"] + server_totals["misses"]
+            server_totals["hit_rate"] = round(server_totals["hits"] / lookups, 3) if lookups else 0.0
+        return totals
+
+    # Keys are tuples starting with the kind of metadata, e.g. ("field", 123, 5) for a tracker's
+    # field or ("members", 7) for a project's members
+    def get_or_load(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if time.monotonic() < expires_at:
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._expirations += 1
+            self._misses += 1
+
+        # Load outside the lock so one slow request doesn't block lookups for other trackers
+        value = loader()
+        with self._lock:
+            now = time.monotonic()
+            self._entries[key] = (value, now + self.ttl_seconds)
+            if now >= self._next_prune:
+                self._prune_expired(now)
+        return value
+
+    # Drops everything cached for one tracker, or the whole cache when no tracker is given
+    def invalidate(self, tracker_id=None):
+        with self._lock:
+            if tracker_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] in self.TRACKER_KINDS and key[1] == tracker_id]:
+                del self._entries[key]
+
+    # The caches live as long as the process, so entries nobody reads again are dropped once per TTL
+    def _prune_expired(self, now):
+        self._next_prune = now + self.ttl_seconds
+        for key in [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+            self._expirations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "expirations": self._expirations,
+                "entries": len(self._entries),
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,196 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from openapi_client.exceptions import ApiException
+from urllib3.exceptions import HTTPError
+
+import metrics
+import tracing
+
+
+# Token bucket shared by every client talking to the same Codebeamer server. The rate grows a
+# little after every successful call and is halved whenever the server throttles us (429/503),
+# so bulk jobs settle at roughly the highest rate the server sustains.
+class AdaptiveRateLimiter:
+    INITIAL_RATE = float(os.getenv("CB_RATE_LIMIT_INITIAL", "25"))
+    MIN_RATE = 1.0
+    MAX_RATE = float(os.getenv("CB_RATE_LIMIT_MAX", "200"))
+    INCREASE_PER_SUCCESS = 0.1
+
+    _limiters = {}
+    _limiters_lock = threading.Lock()
+
+    def __init__(self, rate=INITIAL_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.throttles = 0
+        self.retries = 0
+        self.requests = 0
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_server(cls, server_url):
+        with cls._limiters_lock:
+            if server_url not in cls._limiters:
+                cls._limiters[server_url] = cls()
+            return cls._limiters[server_url]
+
+    # Stats of every server's limiter, keyed by server url
+    @classmethod
+    def all_stats(cls):
+        with cls._limiters_lock:
+            limiters = dict(cls._limiters)
+        return {server_url: limiter.stats() for server_url, limiter in limiters.items()}
+
+    # Blocks until a request may be sent
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    burst = max(1.0, self.rate)
+                    self._tokens = min(burst, self._tokens + max(0.0, now - self._last_refill) * self.rate)
+                    self._last_refill = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.requests += 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.INCREASE_PER_SUCCESS)
+
+    # Halves the rate and, if the server said how long to back off, pauses every caller until then
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                self._last_refill = self._paused_until
+
+    def on_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate_per_second": round(self.rate, 2),
+                "requests": self.requests,
+                "throttles": self.throttles,
+                "retries": self.retries,
+            }
+
+
+# Counts the calls currently running against one client, and the most seen at once
+class InFlightCounter:
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self.current -= 1
+
+
+# Wraps a generated openapi_client API instance so every operation goes through the rate
+# limiter and throttled or failed calls are retried with jittered exponential backoff.
+# 429 is always retried since the server rejected the request before doing anything;
+# other server and connection errors are only retried for idempotent operations.
+class RateLimitedApi:
+    MAX_RETRIES = 5
+    BACKOFF_BASE_SECONDS = 0.5
+    BACKOFF_MAX_SECONDS = 30.0
+    IDEMPOTENT_PREFIXES = ("get_", "delete_", "update_")
+    RETRYABLE_STATUSES = (500, 502, 503, 504)
+
+    def __init__(self, api, limiter, max_retries=MAX_RETRIES, in_flight=None):
+        self._api = api
+        self._limiter = limiter
+        self._max_retries = max_retries
+        self._in_flight = in_flight or InFlightCounter()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._api, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+
+        idempotent = name.startswith(self.IDEMPOTENT_PREFIXES)
+
+        def call(*args, **kwargs):
+            with tracing.span("codebeamer." + name) as span:
+                result, attempts = self._call_with_retries(name, attribute, idempotent, args, kwargs)
+                if span is not None:
+                    span.set_attribute("attempts", attempts)
+                return result
+
+        return call
+
+    # Returns the result and the number of attempts it took
+    def _call_with_retries(self, name, attribute, idempotent, args, kwargs):
+        attempt = 0
+        while True:
+            self._limiter.acquire()
+            try:
+                with self._in_flight, metrics.track(metrics.codebeamer_request_duration,
+                                                    metrics.codebeamer_requests_in_flight, operation=name):
+                    result = attribute(*args, **kwargs)
+            except ApiException as e:
+                metrics.codebeamer_errors.inc(operation=name, status=e.status)
+                retry_after = self.get_retry_after(e)
+                if e.status in (429, 503):
+                    self._limiter.on_throttle(retry_after)
+
+                retryable = e.status == 429 or (idempotent and e.status in self.RETRYABLE_STATUSES)
+                if not retryable or attempt >= self._max_retries:
+                    raise
+                self._backoff(attempt, retry_after)
+            except HTTPError:
+                metrics.codebeamer_errors.inc(operation=name, status="connection")
+                if not idempotent or attempt >= self._max_retries:
+                    raise
+                self._backoff(attempt, None)
+            else:
+                self._limiter.on_success()
+                return result, attempt + 1
+            attempt += 1
+
+    def _backoff(self, attempt, retry_after):
+        self._limiter.on_retry()
+        delay = min(self.BACKOFF_MAX_SECONDS, self.BACKOFF_BASE_SECONDS * (2 ** attempt))
+        time.sleep(max(retry_after or 0.0, random.uniform(0, delay)))
+
+    # Retry-After is either a number of seconds or an HTTP date
+    @staticmethod
+    def get_retry_after(exception):
+        headers = getattr(exception, "headers", None) or {}
+        value = headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -49,3 +49,17 @@ class Utils:
             if option.name != "Information" and option.name != "Folder" and option.name != "Unset" and option.name != "Theme":
                 valid_ids.append(option.id)
         return valid_ids
+
+    # Splits total into whole counts proportional to the weights (largest remainder rounding)
+    @staticmethod
+    def distribute_counts(weights, total):
+        total_weight = sum(weights.values())
+        if total_weight <= 0:
+            return {}
+
+        exact = {key: total * weight / total_weight for key, weight in weights.items()}
+        counts = {key: int(value) for key, value in exact.items()}
+        leftover = total - sum(counts.values())
+        for key in sorted(exact, key=lambda key: exact[key] - counts[key], reverse=True)[:leftover]:
+            counts[key] += 1
+        return counts
@@ -1,20 +1,124 @@
 import json
 import os
+import threading
 
 import requests
+from requests.adapters import HTTPAdapter
 
+import metrics
+import tracing
 
-class GPTAPIClient:
+from apis.gpt_client.gpt_response_cache import GPTResponseCache
+from structured_logging import get_logger
+
+logger = get_logger("gpt_client")
+
+
+# Structured output schema for a list of entries. The root of a schema has to be an object, so the
+# entries go under "items", and strict mode needs every property listed as required.
+def items_schema(name, properties):
+    entry = {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+    return {
+        "name": name,
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"items": {"type": "array", "items": entry}},
+            "required": ["items"],
+            "additionalProperties": False,
+        },
+    }
+
+
+STRING = {"type": "string"}
+INTEGER = {"type": "integer"}
 
-    def __init__(self):
+
+class GPTAPIClient:
+    # Transport settings shared by every GPTAPIClient in the process
+    CONNECT_TIMEOUT = float(os.getenv("GPT_CONNECT_TIMEOUT", "10"))
+    READ_TIMEOUT = float(os.getenv("GPT_READ_TIMEOUT", "300"))
+    POOL_CONNECTIONS = int(os.getenv("GPT_POOL_CONNECTIONS", "4"))
+    POOL_MAXSIZE = int(os.getenv("GPT_POOL_MAXSIZE", "32"))
+
+    # Response cache settings, the cache is opt-in through GPT_CACHE_ENABLED or use_cache
+    CACHE_DIR = os.getenv("GPT_CACHE_DIR", ".gpt_cache")
+    CACHE_MEMORY_ENTRIES = int(os.getenv("GPT_CACHE_MEMORY_ENTRIES", "256"))
+    CACHE_MAX_DISK_BYTES = int(os.getenv("GPT_CACHE_MAX_DISK_MB", "100")) * 1024 * 1024
+
+    # Azure OpenAI resource, overridable to point at a proxy or the local stand-in in benchmarks/
+    BASE_URL = os.getenv("AZURE_OPENAI_BASE_URL", "https://codebeamerdemogenerator.openai.azure.com").rstrip("/")
+    API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
+
+    MAX_TOKENS = 4000
+    TEMPERATURE = 0.5
+
+    # Prompts ask for JSON that must follow a per-prompt schema (Azure structured outputs) instead
+    # of free-form YAML. Streamed prompts stay on YAML, which can be parsed entry by entry.
+    STRUCTURED_OUTPUT = os.getenv("GPT_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+
+    ITEMS_SCHEMA = items_schema("items", {"name": STRING, "description": STRING})
+    LINKED_ITEMS_SCHEMA = items_schema("linked_items", {"id": INTEGER, "name": STRING, "description": STRING})
+    TEST_STEPS_SCHEMA = items_schema("test_steps", {"action": STRING, "expected_result": STRING})
+    BATCH_TEST_STEPS_SCHEMA = items_schema("test_steps_batch", {
+        "test_case_id": INTEGER,
+        "steps": TEST_STEPS_SCHEMA["schema"]["properties"]["items"],
+    })
+    WINDCHILL_PARTS_SCHEMA = items_schema("windchill_parts",
+                                          {"id": STRING, "part_name": STRING, "requirement_name": STRING})
+
+    _session = None
+    _session_lock = threading.Lock()
+    _cache = None
+    _cache_lock = threading.Lock()
+
+    def __init__(self, use_cache=None, bypass_cache=False, structured_output=None):
         self.azure_api_key = os.getenv("OPENAI_KEY")
-        self.azure_endpoint = "https://codebeamerdemogenerator.openai.azure.com/openai/deployments/gpt-4o-mini/chat/completions?api-version=2025-01-01-preview"
+        self.deployment = "gpt-4o-mini"
+        self.azure_endpoint = f"{self.BASE_URL}/openai/deployments/{self.deployment}/chat/completions?api-version={self.API_VERSION}"
+        self.session = self.get_session()
+
+        if use_cache is None:
+            use_cache = os.getenv("GPT_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.cache = self.get_cache() if use_cache else None
+
+        # When set, responses are always fetched from Azure (and the cache is refreshed with them)
+        self.bypass_cache = bypass_cache
+
+        self.structured_output = self.STRUCTURED_OUTPUT if structured_output is None else structured_output
+        self.output_format = "JSON" if self.structured_output else "YAML"
+
+    # Keep-alive session whose connection pool is reused across all clients, so prompts
+    # after the first one skip the TCP + TLS handshake to Azure
+    @classmethod
+    def get_session(cls):
+        with cls._session_lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=cls.POOL_CONNECTIONS, pool_maxsize=cls.POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                cls._session = session
+            return cls._session
+
+    # Response cache shared by every client in the process
+    @classmethod
+    def get_cache(cls):
+        with cls._cache_lock:
+            if cls._cache is None:
+                cls._cache = GPTResponseCache(cls.CACHE_DIR, cls.CACHE_MEMORY_ENTRIES, cls.CACHE_MAX_DISK_BYTES)
+            return cls._cache
+
+    @classmethod
+    def cache_stats(cls):
+        return cls._cache.stats() if cls._cache is not None else None
 
     def get_downstream_items(self, id_name_map, product, downstream_tracker_name, upstream_tracker_name,
                              upstream_tracker_type: str, downstream_tracker_type: str, downstream_count: int, additional_rules: str):
         entries = "\n".join(
             [f"- id: {id}, name: {name}" for id, name in id_name_map.items()]
         )
+        output_instructions = self.output_instructions(self.output_format, '- id: ...\n  name: "..."\n  description: "..."')
         prompt = f"""
         You are tasked with creating corresponding "{downstream_tracker_name}" {downstream_tracker_type}s to the following "{upstream_tracker_name}" {upstream_tracker_type}s:
         
@@ -26,75 +130,84 @@ class GPTAPIClient:
         - The new items should have a unique name that is different from the {upstream_tracker_type} name.
         - DO NOT use anything similar to "{downstream_tracker_name}" or any numbers in the new {downstream_tracker_type} names.
         - The new name should be creative and relevant to the {upstream_tracker_type} but distinct.
-        - Provide a YAML object for each new {downstream_tracker_type} with:
+        - Provide a {self.output_format} object for each new {downstream_tracker_type} with:
           - "id": matching the provided id.
           - "name": a unique name for the new {downstream_tracker_type}.
           - "description": a realistically detailed explanation of the {downstream_tracker_type}. This should be formatted to make it look like a real {downstream_tracker_type}
-        
-        Output example for one entry:
-        - id: ...
-          name: "..."
-          description: "..."
           
         Additional rules: {additional_rules}
     
-        Now generate the YAML for all entries. Please don't include any text other than the YAML.
+        {output_instructions}
                 """
-        print("Getting", downstream_tracker_name, "from GPT...")
+        logger.debug("Getting " + downstream_tracker_name + " from GPT...")
 
-        yaml_response = self.get_azure_gpt_response(prompt)
+        yaml_response = self.get_azure_gpt_response(prompt, prompt_type="downstream_items",
+                                                    response_schema=self.response_schema(self.LINKED_ITEMS_SCHEMA))
 
-        print("Data received from GPT!")
+        logger.debug("Data received from GPT!")
 
         return yaml_response
 
     def get_top_level_items(self, product, tracker_name: str, tracker_type: str, item_count: int, requirement_type_prompt_text: str, additional_inputted_rules: str):
-        prompt = f"""
+        prompt = self.build_top_level_items_prompt(product, tracker_name, tracker_type, item_count,
+                                                   requirement_type_prompt_text, additional_inputted_rules,
+                                                   self.output_format)
+        logger.debug("Getting " + tracker_name + " from GPT...")
+
+        yaml_response = self.get_azure_gpt_response(prompt, prompt_type="top_level_items",
+                                                    response_schema=self.response_schema(self.ITEMS_SCHEMA))
+
+        logger.debug("Data received from GPT!")
+
+        return yaml_response
+
+    # Same prompt as get_top_level_items, but yields the YAML in pieces while the model is still writing
+    def stream_top_level_items(self, product, tracker_name: str, tracker_type: str, item_count: int, requirement_type_prompt_text: str, additional_inputted_rules: str):
+        prompt = self.build_top_level_items_prompt(product, tracker_name, tracker_type, item_count,
+                                                   requirement_type_prompt_text, additional_inputted_rules)
+        logger.debug("Streaming " + tracker_name + " from GPT...")
+
+        yield from self.stream_azure_gpt_response(prompt, prompt_type="top_level_items")
+
+        logger.debug("Data received from GPT!")
+
+    @classmethod
+    def build_top_level_items_prompt(cls, product, tracker_name: str, tracker_type: str, item_count: int, requirement_type_prompt_text: str, additional_inputted_rules: str,
+                                     output_format="YAML"):
+        output_instructions = cls.output_instructions(output_format, '- name: "..."\n  description: "..."')
+        return f"""
             You are tasked with creating {item_count} {tracker_name} {tracker_type}s.
             
             This data is for the product "{product}" and is intended to support ALM Demo Data. {requirement_type_prompt_text} The new items should not be numbered in any way.
             
-            Provide a YAML object for each new {tracker_type} with:
+            Provide a {output_format} object for each new {tracker_type} with:
             - "name": the name of the new {tracker_type}
             - "description": a realistically detailed explanation of the {tracker_type}. This should be formatted to make it look like a real {tracker_type}
-            
-            Output example for one entry:
-            - name: "..."
-              description: "..."
               
             Additional rules: {additional_inputted_rules}
             
-            Now generate the YAML for all entries. Please don't include any text other than the YAML.
+            {output_instructions}
                 """
-        print("Getting", tracker_name, "from GPT...")
-
-        yaml_response = self.get_azure_gpt_response(prompt)
-
-        print("Data received from GPT!")
-
-        return yaml_response
 
     def get_compliance_top_level(self, tracker_name: str, tracker_type: str):
+        output_instructions = self.output_instructions(self.output_format, '- name: "..."\n  description: "..."')
         prompt = f"""
             You are tasked with creating compliance requirements for {tracker_name} .
             
             This data is intended to support ALM Demo Data. It should include all standards within {tracker_name}
             
-            Provide a YAML object for each new regulatory {tracker_type} with:
+            Provide a {self.output_format} object for each new regulatory {tracker_type} with:
             - "name": the name of the new {tracker_type}
             - "description": a detailed description of the regulatory {tracker_type}
             
-            Output example for one entry:
-            - name: "..."
-              description: "..."
-            
-            Now generate the YAML for all entries. Please don't include any text other than the YAML.
+            {output_instructions}
                 """
-        print("Getting", tracker_name, "from GPT...")
+        logger.debug("Getting " + tracker_name + " from GPT...")
 
-        yaml_response = self.get_azure_gpt_response(prompt)
+        yaml_response = self.get_azure_gpt_response(prompt, prompt_type="compliance_top_level",
+                                                    response_schema=self.response_schema(self.ITEMS_SCHEMA))
 
-        print("Data received from GPT!")
+        logger.debug("Data received from GPT!")
 
         return yaml_response
 
@@ -104,6 +217,7 @@ class GPTAPIClient:
             [f"- id: {id}, name: {name}" for id, name in id_name_map.items()]
         )
 
+        output_instructions = self.output_instructions(self.output_format, '- id: ...\n  name: "..."\n  description: "..."')
         prompt = f"""
             For each of these Regulatory Standard Entries from {compliance_tracker_name}: 
             
@@ -114,7 +228,7 @@ class GPTAPIClient:
             This data should be roughly related to a {product} and is intended to support ALM Demo Data. 
             The new {tracker_type}s should not have the same exact name as their parent or include "{downstream_tracker_name}" or the Regulatory Standard Entry name.
                         
-            Provide 2 YAML objects for each of the regulatory standard entries. Each YAML object should have the following:
+            Provide 2 {self.output_format} objects for each of the regulatory standard entries. Each {self.output_format} object should have the following:
             - "id": matching the provided id.
             - "name": the name of the new {tracker_type} (This should not include the tracker name, tracker type, or upstream standard name, it should just be a brief summary of the {tracker_type})
             - "description": a detailed description of the {tracker_type}
@@ -122,22 +236,15 @@ class GPTAPIClient:
             Each parent entry should result in multiple specific requirements that are actionable and detailed. Ensure that the names and descriptions are varied and related to the product.
 
             It's expected that there will be multiple entries for each item in the list.
-                        
-            Output example for one entry:
-            - id: ...
-              name: "..."
-              description: "..."
             
-            Now generate the YAML for all entries. Please don't include any text other than the YAML.
+            {output_instructions}
                 """
-        print("Getting", downstream_tracker_name, "from GPT...")
-        print(prompt)
-
-        yaml_response = self.get_azure_gpt_response(prompt)
+        logger.debug("Getting " + downstream_tracker_name + " from GPT...")
 
-        print(yaml_response)
+        yaml_response = self.get_azure_gpt_response(prompt, prompt_type="compliance_downstream",
+                                                    response_schema=self.response_schema(self.LINKED_ITEMS_SCHEMA))
 
-        print("Data received from GPT!")
+        logger.debug("Data received from GPT!")
 
         return yaml_response
 
@@ -147,6 +254,7 @@ class GPTAPIClient:
             [f"- name: {name}" for name in tracker_item_names]
         )
 
+        output_instructions = self.output_instructions(self.output_format, '- id: ...\n  part_name: "..."\n  requirement_name: "..."')
         prompt = f"""
         You are tasked with creating corresponding PLM Windchill Parts for the following requirements:
         
@@ -157,53 +265,217 @@ class GPTAPIClient:
         For each requirement, create a corresponding Windchill Part with the following criteria:
         - The new items should have a unique name that is different from the requirement name.
         - The parts should be realistic and detailed
-        - Provide a YAML object for each new Windchill Part with:
+        - Provide a {self.output_format} object for each new Windchill Part with:
           - "id": abbreviated version of the name - ideally at least 5 letters
           - "part_name": a name for the new Windchill Part with spaces
           - "requirement_name": the requirement it corresponds to
         
-        Output example for one entry:
-        - id: ...
-          part_name: "..."
-          requirement_name: "..."
-              
-    Now generate the YAML for all entries. Please don't include any text other than the YAML.
+        {output_instructions}
                 """
-        print("Getting Windchill Parts from GPT...")
+        logger.debug("Getting Windchill Parts from GPT...")
 
-        yaml_response = self.get_azure_gpt_response(prompt)
+        yaml_response = self.get_azure_gpt_response(prompt, prompt_type="windchill_parts",
+                                                    response_schema=self.response_schema(self.WINDCHILL_PARTS_SCHEMA))
 
-        print(yaml_response)
-
-        print("Data received from GPT!")
+        logger.debug("Data received from GPT!")
 
         return yaml_response
 
     def get_test_steps(self, product, test_case_name):
+        output_instructions = self.output_instructions(self.output_format, '- action: "..."\n  expected_result: "..."')
         prompt = f"""
             You are tasked with creating 2 test steps for a test case called {test_case_name}. 
             This is to support an ALM demo for a {product}.
             
-            Provide a YAML object for each test step with:
+            Provide a {self.output_format} object for each test step with:
             - "action": The action the tester should take for this test
             - "expected_result": The expected result for this action
             
-            Output example for one entry:
-            - action: "..."
-              expected_result: "..."
-              
-            Now generate the YAML. Please don't include any text other than the YAML.
+            {output_instructions}
+        """
+
+        logger.debug("Getting test steps from GPT...")
+
+        yaml_response = self.get_azure_gpt_response(prompt, prompt_type="test_steps",
+                                                    response_schema=self.response_schema(self.TEST_STEPS_SCHEMA))
+
+        logger.debug("Data received from GPT!")
+
+        return yaml_response
+
+    def get_test_steps_batch(self, product, test_case_map):
+        entries = "\n".join(
+            [f"- id: {id}, name: {name}" for id, name in test_case_map.items()]
+        )
+        output_instructions = self.output_instructions(self.output_format, '- test_case_id: ...\n  steps:\n    - action: "..."\n      expected_result: "..."')
+        prompt = f"""
+            You are tasked with creating 2 test steps for each of the following test cases:
+            
+            {entries}
+            
+            This is to support an ALM demo for a {product}.
+            
+            Provide a {self.output_format} object for each test case with:
+            - "test_case_id": matching the provided id.
+            - "steps": a list of test steps, each with:
+              - "action": The action the tester should take for this test
+              - "expected_result": The expected result for this action
+            
+            {output_instructions}
         """
 
-        print("Getting test steps from GPT...")
+        logger.debug("Getting test steps for " + str(len(test_case_map)) + " test cases from GPT...")
 
-        yaml_response = self.get_azure_gpt_response(prompt)
+        yaml_response = self.get_azure_gpt_response(prompt, prompt_type="test_steps_batch",
+                                                    response_schema=self.response_schema(self.BATCH_TEST_STEPS_SCHEMA))
 
-        print("Data received from GPT!")
+        logger.debug("Data received from GPT!")
 
         return yaml_response
 
-    def get_azure_gpt_response(self, prompt):
+    # The closing instructions of a prompt. YAML prompts get an example entry; for JSON the
+    # response schema already defines the fields, so the model is only told where the entries go.
+    @staticmethod
+    def output_instructions(output_format, yaml_example):
+        if output_format == "JSON":
+            return 'Return all entries in the "items" list of the JSON object.'
+        return ("Output example for one entry:\n" + yaml_example +
+                "\n\nNow generate the YAML for all entries. Please don't include any text other than the YAML.")
+
+    # The schema to send with a prompt, or None when structured output is off
+    def response_schema(self, schema):
+        return schema if self.structured_output else None
+
+    # prompt_type labels the request in the metrics and traces, e.g. "top_level_items".
+    # response_schema asks for JSON that follows the schema instead of free-form text.
+    def get_azure_gpt_response(self, prompt, bypass_cache=None, prompt_type="other", response_schema=None):
+        with tracing.span("gpt.prompt", prompt_type=prompt_type, prompt_chars=len(prompt),
+                          structured=response_schema is not None):
+            return self._get_azure_gpt_response(prompt, bypass_cache, prompt_type, response_schema)
+
+    def _get_azure_gpt_response(self, prompt, bypass_cache, prompt_type, response_schema):
+        if bypass_cache is None:
+            bypass_cache = self.bypass_cache
+
+        headers, data = self.build_request(prompt, response_schema)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.get_cache_key(data)
+            if not bypass_cache:
+                cached_response = self.cache.get(cache_key)
+                if cached_response is not None:
+                    logger.debug("Using cached GPT response")
+                    metrics.gpt_cache_hits.inc(prompt_type=prompt_type)
+                    tracing.set_attribute("cached", True)
+                    return cached_response
+
+        with metrics.track(metrics.gpt_request_duration, metrics.gpt_requests_in_flight, prompt_type=prompt_type):
+            try:
+                # Make the POST request
+                response = self.session.post(self.azure_endpoint, headers=headers, data=json.dumps(data),
+                                             timeout=(self.CONNECT_TIMEOUT, self.READ_TIMEOUT))
+
+                # Check response
+                if response.status_code == 200:
+                    result = response.json()
+                else:
+                    logger.warning("Azure OpenAI request failed: " + str(response.status_code) + ", " + response.text[:500])
+                    raise Exception(f"Azure OpenAI request failed with status {response.status_code}")
+            except Exception:
+                metrics.gpt_errors.inc(prompt_type=prompt_type)
+                raise
+
+        usage = result.get("usage") or {}
+        metrics.record_gpt_usage(prompt_type, usage)
+        tracing.set_attribute("prompt_tokens", usage.get("prompt_tokens"))
+        tracing.set_attribute("completion_tokens", usage.get("completion_tokens"))
+
+        # With structured output the model answers with a refusal instead of content when it won't comply
+        message = result["choices"][0]["message"]
+        if message.get("content") is None:
+            raise Exception("Azure OpenAI returned no content: " + str(message.get("refusal")))
+
+        yaml_response_cleaned = self.clean_response(message["content"])
+
+        if cache_key is not None:
+            self.cache.set(cache_key, yaml_response_cleaned)
+
+        return yaml_response_cleaned
+
+    # Streams the completion as server-sent events and yields each piece of content as it arrives.
+    # Cache hits are yielded in one piece, and the full response is cached once the stream completes.
+    def stream_azure_gpt_response(self, prompt, bypass_cache=None, prompt_type="other"):
+        with tracing.span("gpt.prompt", activate=False, prompt_type=prompt_type, prompt_chars=len(prompt),
+                          stream=True) as span:
+            yield from self._stream_azure_gpt_response(prompt, bypass_cache, prompt_type, span)
+
+    def _stream_azure_gpt_response(self, prompt, bypass_cache, prompt_type, span):
+        if bypass_cache is None:
+            bypass_cache = self.bypass_cache
+
+        headers, data = self.build_request(prompt)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.get_cache_key(data)
+            if not bypass_cache:
+                cached_response = self.cache.get(cache_key)
+                if cached_response is not None:
+                    logger.debug("Using cached GPT response")
+                    metrics.gpt_cache_hits.inc(prompt_type=prompt_type)
+                    if span is not None:
+                        span.set_attribute("cached", True)
+                    yield cached_response
+                    return
+
+        data["stream"] = True
+        # Ask for a final chunk with the token usage of the whole stream
+        data["stream_options"] = {"include_usage": True}
+        with metrics.track(metrics.gpt_request_duration, metrics.gpt_requests_in_flight, prompt_type=prompt_type):
+            try:
+                response = self.session.post(self.azure_endpoint, headers=headers, data=json.dumps(data), stream=True,
+                                             timeout=(self.CONNECT_TIMEOUT, self.READ_TIMEOUT))
+            except Exception:
+                metrics.gpt_errors.inc(prompt_type=prompt_type)
+                raise
+
+            try:
+                if response.status_code != 200:
+                    logger.warning("Azure OpenAI request failed: " + str(response.status_code) + ", " + response.text[:500])
+                    metrics.gpt_errors.inc(prompt_type=prompt_type)
+                    raise Exception(f"Azure OpenAI request failed with status {response.status_code}")
+
+                content_parts = []
+                for raw_line in response.iter_lines():
+                    line = raw_line.decode("utf-8")
+                    if not line.startswith("data:"):
+                        continue
+
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+
+                    # Azure sends content filter results and the usage in chunks without choices
+                    chunk = json.loads(payload)
+                    usage = chunk.get("usage")
+                    if usage:
+                        metrics.record_gpt_usage(prompt_type, usage)
+                        if span is not None:
+                            span.set_attribute("prompt_tokens", usage.get("prompt_tokens"))
+                            span.set_attribute("completion_tokens", usage.get("completion_tokens"))
+                    choices = chunk.get("choices") or []
+                    content = choices[0].get("delta", {}).get("content") if choices else None
+                    if content:
+                        content_parts.append(content)
+                        yield content
+            finally:
+                response.close()
+
+        if cache_key is not None:
+            self.cache.set(cache_key, self.clean_response("".join(content_parts)))
+
+    def build_request(self, prompt, response_schema=None):
         # Request headers
         headers = {
             "Content-Type": "application/json",
@@ -216,27 +488,32 @@ class GPTAPIClient:
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": prompt}
             ],
-            "max_tokens": 4000,
-            "temperature": 0.5
+            "max_tokens": self.MAX_TOKENS,
+            "temperature": self.TEMPERATURE
         }
 
-        # Make the POST request
-        response = requests.post(self.azure_endpoint, headers=headers, data=json.dumps(data))
+        if response_schema is not None:
+            data["response_format"] = {"type": "json_schema", "json_schema": response_schema}
 
-        # Check response
-        if response.status_code == 200:
-            result = response.json()
-        else:
-            print(f"Error: {response.status_code}, {response.text}")
+        return headers, data
 
-        yaml_response = result["choices"][0]["message"]["content"]
+    def get_cache_key(self, data):
+        # JSON and YAML prompts differ in their text, so their responses never share a key. The same
+        # prompt asked with a different schema must not return a response shaped by the other one.
+        return GPTResponseCache.make_key(self.deployment, data["messages"], data["temperature"], data["max_tokens"],
+                                         data.get("response_format"))
 
+    @staticmethod
+    def clean_response(yaml_response):
         # Remove any leading/trailing whitespace or newlines
         yaml_response_cleaned = yaml_response.strip()
 
-        # Remove the leading "```yaml" or similar markers
-        if yaml_response_cleaned.startswith("```yaml"):
-            yaml_response_cleaned = yaml_response_cleaned[7:]  # Remove the first 7 characters ("```yaml")
+        # Remove the leading "```yaml", "```json" or similar markers
+        if yaml_response_cleaned.startswith("```"):
+            yaml_response_cleaned = yaml_response_cleaned[3:]
+            for language in ("yaml", "json"):
+                if yaml_response_cleaned.startswith(language):
+                    yaml_response_cleaned = yaml_response_cleaned[len(language):]
 
         # Remove trailing "```" or any similar backticks
         if yaml_response_cleaned.endswith("```"):
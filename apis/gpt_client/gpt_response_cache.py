@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+# Two-tier cache for GPT responses: an in-memory LRU in front of a size-bounded directory on disk.
+# Entries are keyed by a hash of everything that determines the completion, so the same prompt
+# for the same deployment and sampling settings is only ever sent to Azure once.
+class GPTResponseCache:
+    def __init__(self, cache_dir, memory_entries=256, max_disk_bytes=100 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._disk_index = OrderedDict()  # key -> file size, oldest first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_disk_index()
+
+    # response_format is only part of the key when set, so keys of plain prompts stay the same
+    @staticmethod
+    def make_key(deployment, messages, temperature, max_tokens, response_format=None):
+        parts = [deployment, messages, temperature, max_tokens]
+        if response_format is not None:
+            parts.append(response_format)
+        payload = json.dumps(parts, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return self._memory[key]
+
+            value = self._read_disk(key)
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+
+            self._counters["disk_hits"] += 1
+            self._remember(key, value)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            self._write_disk(key, value)
+            self._counters["stores"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = len(self._disk_index)
+            stats["disk_bytes"] = self._disk_bytes
+            return stats
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _load_disk_index(self):
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".json"):
+                stat = os.stat(os.path.join(self.cache_dir, file_name))
+                entries.append((stat.st_mtime, file_name[:-5], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self._disk_bytes += size
+
+    def _read_disk(self, key):
+        if key not in self._disk_index:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as cache_file:
+                value = json.load(cache_file)["response"]
+        except (OSError, ValueError, KeyError):
+            self._drop_disk(key)
+            return None
+
+        # Touch the file so eviction stays least-recently-used across restarts
+        os.utime(self._path(key))
+        self._disk_index.move_to_end(key)
+        return value
+
+    def _write_disk(self, key, value):
+        data = json.dumps({"response": value}).encode("utf-8")
+        if len(data) > self.max_disk_bytes:
+            return
+
+        # Write to a temp file first so a crash never leaves a half-written entry behind
+        temp_path = self._path(key) + ".tmp"
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(data)
+        os.replace(temp_path, self._path(key))
+
+        self._disk_bytes += len(data) - self._disk_index.pop(key, 0)
+        self._disk_index[key] = len(data)
+
+        while self._disk_bytes > self.max_disk_bytes and self._disk_index:
+            oldest_key = next(iter(self._disk_index))
+            self._drop_disk(oldest_key)
+            self._counters["evictions"] += 1
+
+    def _drop_disk(self, key):
+        self._disk_bytes -= self._disk_index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
@@ -1,6 +1,23 @@
-from typing import List
+import json
+import textwrap
+from typing import Dict, List, Optional, Type, Union
 
 import yaml
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+import tracing
+from structured_logging import PER_ITEM, get_logger
+
+# orjson is optional, it parses the JSON responses several times faster than the json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = get_logger("gpt_response")
+
+# libyaml's loader when PyYAML was built with it, for the responses that still come back as YAML
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 
 class GenericItem:
@@ -23,85 +40,193 @@ class WindchillPart:
         self.requirement_name = requirement_name
 
 
-class ItemsParser:
-    def __init__(self, yaml_data: str):
-        self.yaml_data = yaml_data
-        self.items: List[GenericItem] = []
-        self._parse_yaml()
+# Shapes of the entries GPT returns, checked one by one so a malformed entry is skipped
+# instead of failing the whole response. Numbers are accepted where text is expected, since
+# YAML reads an unquoted name like 2024 as an int.
+class ItemEntry(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    name: str
+    description: str
+    id: Optional[Union[int, str]] = None
+
+
+class TestStepEntry(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    action: str
+    expected_result: str
+
 
-    def _parse_yaml(self):
-        # Parse the YAML string
-        data = yaml.safe_load(self.yaml_data)
+class BatchTestStepEntry(BaseModel):
+    test_case_id: Union[int, str]
+    steps: List[TestStepEntry]
 
-        # Check if the parsed data is a list
-        if not isinstance(data, list):
-            raise ValueError("Invalid YAML format. Expected a top-level list.")
 
-        for item in data:
-            # Ensure each item has the required keys
-            if not all(key in item for key in ["name", "description"]):
-                raise ValueError(f"Missing keys in item: {item}")
+class WindchillPartEntry(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
 
-            # Create and append new item
-            self.items.append(
-                GenericItem(item["name"], item["description"], item.get("id"))
-            )
+    id: Union[str, int]
+    part_name: str
+    requirement_name: str
+
+
+# Returns the list of entries in a response. Structured output responses are JSON objects with
+# the entries under "items", older prompts return a YAML list (JSON is tried first either way).
+def load_entries(response: str) -> list:
+    text = (response or "").strip()
+
+    data = None
+    if text.startswith("{") or text.startswith("["):
+        try:
+            data = orjson.loads(text) if orjson is not None else json.loads(text)
+        except ValueError:
+            data = None
+    if data is None:
+        data = yaml.load(text, Loader=YAML_LOADER)
+
+    if isinstance(data, dict) and isinstance(data.get("items"), list):
+        data = data["items"]
+
+    # Check if the parsed data is a list
+    if not isinstance(data, list):
+        raise ValueError("Invalid response format. Expected a list of entries.")
+    return data
+
+
+# Validates each entry against the model and skips the ones that don't fit. Only fails if
+# there were entries but none of them were usable.
+def validate_entries(model: Type[BaseModel], entries: list) -> list:
+    valid_entries = []
+    for entry in entries:
+        try:
+            valid_entries.append(model.model_validate(entry))
+        except ValidationError as e:
+            logger.warning("Skipping invalid " + model.__name__ + " " + str(entry)[:200] + ": " +
+                           str(e.errors(include_url=False)), extra=PER_ITEM)
+
+    if entries and not valid_entries:
+        raise ValueError("None of the " + str(len(entries)) + " entries in the response are a valid " + model.__name__)
+    return valid_entries
+
+
+class ItemsParser:
+    def __init__(self, response: str):
+        self.response = response
+        self.items: List[GenericItem] = []
+        with tracing.span("parse." + type(self).__name__, response_chars=len(self.response or "")):
+            self._parse()
+
+    def _parse(self):
+        for entry in validate_entries(ItemEntry, load_entries(self.response)):
+            self.items.append(GenericItem(entry.name, entry.description, entry.id))
 
     def get_items(self) -> List[GenericItem]:
         return self.items
 
 
-class TestStepParser:
-    def __init__(self, yaml_data: str):
-        self.yaml_data = yaml_data
-        self.steps: List[TestStep] = []
-        self._parse_yaml()
+# Parses the same "- name/description" YAML list as ItemsParser, but from a stream of text pieces.
+# Each entry is emitted as soon as the next top-level entry starts (or the stream ends).
+class StreamingItemsParser:
+    def __init__(self):
+        self._partial_line = ""
+        self._entry_lines: List[str] = []
+        self._entry_indent = None
+
+    def feed(self, text: str) -> List[GenericItem]:
+        lines = (self._partial_line + text).split("\n")
+        self._partial_line = lines.pop()
+
+        items = []
+        for line in lines:
+            items.extend(self._add_line(line))
+        return items
+
+    def close(self) -> List[GenericItem]:
+        items = self._add_line(self._partial_line)
+        self._partial_line = ""
+        items.extend(self._flush_entry())
+        return items
+
+    def _add_line(self, line: str) -> List[GenericItem]:
+        # Skip the Markdown fences GPT likes to wrap the YAML in
+        if line.strip().startswith("```"):
+            return []
+
+        indent = len(line) - len(line.lstrip())
+        is_entry_start = line.lstrip().startswith("- ") and (self._entry_indent is None or indent == self._entry_indent)
+
+        if not is_entry_start:
+            if self._entry_lines:
+                self._entry_lines.append(line)
+            return []
+
+        items = self._flush_entry()
+        self._entry_indent = indent
+        self._entry_lines = [line]
+        return items
 
-    def _parse_yaml(self):
-        # Parse the YAML string
-        data = yaml.safe_load(self.yaml_data)
+    def _flush_entry(self) -> List[GenericItem]:
+        if not self._entry_lines:
+            return []
 
-        # Check if the parsed data is a list
-        if not isinstance(data, list):
-            raise ValueError("Invalid YAML format. Expected a top-level list.")
+        entry_yaml = textwrap.dedent("\n".join(self._entry_lines))
+        self._entry_lines = []
 
-        for item in data:
-            # Ensure each item has the required keys
-            if not all(key in item for key in ["action", "expected_result"]):
-                raise ValueError(f"Missing keys in item: {item}")
+        # A broken entry only loses that entry, the rest of the stream is still parsed
+        try:
+            entries = validate_entries(ItemEntry, load_entries(entry_yaml))
+        except (ValueError, yaml.YAMLError) as e:
+            logger.warning("Skipping unparsable streamed entry: " + str(e), extra=PER_ITEM)
+            return []
 
-            # Create and append new item
-            self.steps.append(
-                TestStep(item["action"], item["expected_result"])
-            )
+        return [GenericItem(entry.name, entry.description, entry.id) for entry in entries]
+
+
+class TestStepParser:
+    def __init__(self, response: str):
+        self.response = response
+        self.steps: List[TestStep] = []
+        with tracing.span("parse." + type(self).__name__, response_chars=len(self.response or "")):
+            self._parse()
+
+    def _parse(self):
+        for entry in validate_entries(TestStepEntry, load_entries(self.response)):
+            self.steps.append(TestStep(entry.action, entry.expected_result))
 
     def get_items(self) -> List[TestStep]:
         return self.steps
 
 
-class WindchillPartParser:
-    def __init__(self, yaml_data: str):
-        self.yaml_data = yaml_data
-        self.wc_parts: List[WindchillPart] = []
-        self._parse_yaml()
+# Parses test steps for several test cases from one response, keyed by test case id
+class BatchTestStepParser:
+    def __init__(self, response: str):
+        self.response = response
+        self.steps_by_test_case: Dict[str, List[TestStep]] = {}
+        with tracing.span("parse." + type(self).__name__, response_chars=len(self.response or "")):
+            self._parse()
+
+    def _parse(self):
+        for entry in validate_entries(BatchTestStepEntry, load_entries(self.response)):
+            # Ids are stored as strings since GPT doesn't always echo them back as numbers
+            self.steps_by_test_case[str(entry.test_case_id)] = [
+                TestStep(step.action, step.expected_result) for step in entry.steps
+            ]
 
-    def _parse_yaml(self):
-        # Parse the YAML string
-        data = yaml.safe_load(self.yaml_data)
+    def get_items(self) -> Dict[str, List[TestStep]]:
+        return self.steps_by_test_case
 
-        # Check if the parsed data is a list
-        if not isinstance(data, list):
-            raise ValueError("Invalid YAML format. Expected a top-level list.")
 
-        for item in data:
-            # Ensure each item has the required keys
-            if not all(key in item for key in ["id", "part_name", "requirement_name"]):
-                raise ValueError(f"Missing keys in item: {item}")
+class WindchillPartParser:
+    def __init__(self, response: str):
+        self.response = response
+        self.wc_parts: List[WindchillPart] = []
+        with tracing.span("parse." + type(self).__name__, response_chars=len(self.response or "")):
+            self._parse()
 
-            # Create and append new item
-            self.wc_parts.append(
-                WindchillPart(item["id"], item["part_name"], item["requirement_name"])
-            )
+    def _parse(self):
+        for entry in validate_entries(WindchillPartEntry, load_entries(self.response)):
+            self.wc_parts.append(WindchillPart(str(entry.id), entry.part_name, entry.requirement_name))
 
     def get_items(self) -> List[WindchillPart]:
         return self.wc_parts
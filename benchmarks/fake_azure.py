@@ -0,0 +1,164 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yaml
+
+from services.throughput_stats import ThroughputStats
+
+
+# Stand-in for the Azure OpenAI chat completions endpoint. Answers every prompt with canned
+# YAML in the shape the prompt asks for, after a configurable delay, so benchmarks measure
+# the services rather than the model. Requests with a json_schema response_format get the same
+# entries as a JSON object under "items". Streaming requests get the YAML as server-sent events,
+# one line per chunk, spread over the same delay, followed by a usage chunk.
+class FakeAzureOpenAIServer:
+    DESCRIPTION = "The system shall respond within the specified time under nominal operating conditions."
+
+    def __init__(self, delay_ms=500.0):
+        self.delay_ms = delay_ms
+        self._stats = ThroughputStats()
+        self._prompt_counts = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        server = self
+
+        class Handler(FakeAzureOpenAIHandler):
+            fake = server
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-azure-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def stats(self):
+        summary = self._stats.summary()
+        with self._lock:
+            prompts = dict(self._prompt_counts)
+        return {"calls": summary["succeeded"] + summary["failed"], "prompts": prompts,
+                "latency_ms": summary["latency_ms"]}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = ThroughputStats()
+            self._prompt_counts = {}
+
+    def record(self, prompt_kind, seconds):
+        with self._lock:
+            self._prompt_counts[prompt_kind] = self._prompt_counts.get(prompt_kind, 0) + 1
+            stats = self._stats
+        stats.record_success(seconds)
+
+    # Returns (prompt kind, YAML answer) for the prompts GPTAPIClient sends
+    def answer(self, prompt):
+        entries = re.findall(r"^\s*- id: (\S+), name: (.*)$", prompt, re.MULTILINE)
+
+        if "test_case_id" in prompt:
+            return "test_steps_batch", "\n".join(
+                f"- test_case_id: {entry_id}\n"
+                f"  steps:\n"
+                f"    - action: \"Open {self.quote(name)}\"\n"
+                f"      expected_result: \"The screen is shown\"\n"
+                f"    - action: \"Run {self.quote(name)}\"\n"
+                f"      expected_result: \"The run completes\""
+                for entry_id, name in entries)
+
+        if entries:
+            count_match = re.search(r"create (\d+) corresponding", prompt)
+            count = int(count_match.group(1)) if count_match else 1
+            return "downstream_items", "\n".join(
+                self.item_yaml(f"Derived {self.quote(name)} {index}", entry_id)
+                for entry_id, name in entries for index in range(1, count + 1))
+
+        count_match = re.search(r"creating (\d+) ", prompt)
+        count = int(count_match.group(1)) if count_match else 5
+        return "top_level_items", "\n".join(self.item_yaml(f"Generated item {index}") for index in range(1, count + 1))
+
+    def item_yaml(self, name, entry_id=None):
+        lines = [f"- id: {entry_id}", f"  name: \"{name}\""] if entry_id is not None else [f"- name: \"{name}\""]
+        lines.append(f"  description: \"{self.DESCRIPTION}\"")
+        return "\n".join(lines)
+
+    @staticmethod
+    def quote(text):
+        return text.strip().replace("\\", "").replace('"', "'")
+
+    @staticmethod
+    def usage(prompt, content):
+        return {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4}
+
+
+class FakeAzureOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None
+
+    def do_POST(self):
+        start_time = time.perf_counter()
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request["messages"][-1]["content"]
+        prompt_kind, content = self.fake.answer(prompt)
+        if (request.get("response_format") or {}).get("type") == "json_schema":
+            content = json.dumps({"items": yaml.safe_load(content)})
+
+        if request.get("stream"):
+            self.stream(prompt, content)
+        else:
+            time.sleep(self.fake.delay_ms / 1000)
+            self.send_json({
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": self.fake.usage(prompt, content),
+            })
+
+        self.fake.record(prompt_kind, time.perf_counter() - start_time)
+
+    def stream(self, prompt, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        lines = content.splitlines(keepends=True)
+        delay = self.fake.delay_ms / 1000 / max(1, len(lines))
+        for line in lines:
+            time.sleep(delay)
+            self.send_event({"choices": [{"index": 0, "delta": {"content": line}}]})
+        self.send_event({"choices": [], "usage": self.fake.usage(prompt, content)})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def send_event(self, chunk):
+        self.wfile.write(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+        self.wfile.flush()
+
+    def send_json(self, body):
+        encoded = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
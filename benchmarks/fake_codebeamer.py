@@ -0,0 +1,354 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from services.throughput_stats import ThroughputStats
+
+
+# In-memory stand-in for the parts of the Codebeamer v3 REST API the services use: projects,
+# trackers, items, fields, transitions and test runs. Every call sleeps for the configured
+# latency, and a share of calls can be rejected with 429 to exercise the rate limiter.
+# Status codes and JSON shapes follow the v3 API spec the python-client is generated from:
+# creates answer 200 (the generated client has no response type for 201, so it would return
+# None), references carry their "type" discriminator and trackers their project.
+class FakeCodebeamerServer:
+    PROJECT_ID = 1
+    REQUIREMENTS_TRACKER_ID = 100
+    DOWNSTREAM_TRACKER_ID = 101
+    TEST_CASE_TRACKER_ID = 102
+    TEST_RUN_TRACKER_ID = 103
+
+    PRIORITY_FIELD_ID = 2
+    STORY_POINTS_FIELD_ID = 10001
+    OWNER_FIELD_ID = 10002
+
+    STATUSES = {1: "New", 2: "In Progress", 3: "Implemented", 4: "Accepted", 5: "Rejected"}
+    TRANSITIONS = [(1, 2), (2, 3), (3, 4), (1, 5), (2, 5)]
+
+    def __init__(self, latency_ms=20.0, jitter_ms=5.0, throttle_rate=0.0, retry_after_seconds=0.1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after_seconds = retry_after_seconds
+
+        self.trackers = {
+            self.REQUIREMENTS_TRACKER_ID: ("System Requirements", "Requirement"),
+            self.DOWNSTREAM_TRACKER_ID: ("Software Requirements", "Requirement"),
+            self.TEST_CASE_TRACKER_ID: ("Test Cases", "Testcase"),
+            self.TEST_RUN_TRACKER_ID: ("Test Runs", "Testrun"),
+        }
+        self.items = {}
+        self.items_by_tracker = {tracker_id: [] for tracker_id in self.trackers}
+        self.test_run_results = {}
+        self._next_id = 1000
+        self._lock = threading.Lock()
+
+        self._stats = {}
+        self._throttled = 0
+        self._stats_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/cb"
+
+    def start(self):
+        server = self
+
+        class Handler(FakeCodebeamerHandler):
+            fake = server
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-codebeamer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    # Adds items straight to the store, without going through the API
+    def seed_items(self, tracker_id, count, prefix="Item"):
+        return [self._add_item(tracker_id, {"name": f"{prefix} {i}", "description": "Seeded"})["id"]
+                for i in range(1, count + 1)]
+
+    def clear_tracker(self, tracker_id):
+        with self._lock:
+            for item_id in self.items_by_tracker[tracker_id]:
+                self.items.pop(item_id, None)
+            self.items_by_tracker[tracker_id] = []
+
+    def item_ids(self, tracker_id):
+        with self._lock:
+            return list(self.items_by_tracker[tracker_id])
+
+    # Calls per route, with latencies measured inside the server (including the injected latency)
+    def stats(self):
+        with self._stats_lock:
+            routes = {}
+            for route, stats in sorted(self._stats.items()):
+                summary = stats.summary()
+                routes[route] = {
+                    "calls": summary["succeeded"] + summary["failed"],
+                    "errors": summary["failed"],
+                    "latency_ms": summary["latency_ms"],
+                }
+            return {"routes": routes, "throttled": self._throttled}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {}
+            self._throttled = 0
+
+    def record(self, route, seconds, failed):
+        with self._stats_lock:
+            stats = self._stats.setdefault(route, ThroughputStats())
+        if failed:
+            stats.record_failure(seconds, route)
+        else:
+            stats.record_success(seconds)
+
+    def should_throttle(self):
+        if self.throttle_rate > 0 and random.random() < self.throttle_rate:
+            with self._stats_lock:
+                self._throttled += 1
+            return True
+        return False
+
+    def sleep(self):
+        delay_ms = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def _add_item(self, tracker_id, body):
+        with self._lock:
+            self._next_id += 1
+            item = {
+                "id": self._next_id,
+                "name": body.get("name") or "Unnamed",
+                "description": body.get("description") or "",
+                "descriptionFormat": "PlainText",
+                "tracker": self.tracker_reference(tracker_id),
+                "status": self.status_reference(1),
+                "subjects": body.get("subjects") or [],
+                "customFields": [],
+                "version": 1,
+            }
+            self.items[item["id"]] = item
+            self.items_by_tracker[tracker_id].append(item["id"])
+            return dict(item)
+
+    def tracker_reference(self, tracker_id):
+        return {"id": tracker_id, "name": self.trackers[tracker_id][0], "type": "TrackerReference"}
+
+    def status_reference(self, status_id):
+        return {"id": status_id, "name": self.STATUSES[status_id], "type": "ChoiceOptionReference"}
+
+    @staticmethod
+    def item_reference(item):
+        return {"id": item["id"], "name": item["name"], "type": "TrackerItemReference"}
+
+    # Route handlers, each returns (status, body)
+
+    def get_projects(self, match, query, body):
+        return 200, [{"id": self.PROJECT_ID, "name": "Benchmark Project", "type": "ProjectReference"}]
+
+    def get_trackers(self, match, query, body):
+        return 200, [self.tracker_reference(tracker_id) for tracker_id in self.trackers]
+
+    def get_members(self, match, query, body):
+        members = [{"id": user_id, "name": f"user{user_id}", "type": "UserReference"} for user_id in range(1, 6)]
+        return 200, {"page": 1, "pageSize": 25, "total": len(members), "members": members}
+
+    def get_tracker(self, match, query, body):
+        tracker_id = int(match["tracker_id"])
+        if tracker_id not in self.trackers:
+            return 404, {"message": "Tracker not found"}
+        name, type_name = self.trackers[tracker_id]
+        return 200, {"id": tracker_id, "name": name, "keyName": name[:3].upper(),
+                     "type": {"id": tracker_id, "name": type_name, "type": "TrackerTypeReference"},
+                     "project": {"id": self.PROJECT_ID, "name": "Benchmark Project", "type": "ProjectReference"}}
+
+    def get_tracker_fields(self, match, query, body):
+        fields = [(0, "ID"), (3, "Summary"), (self.PRIORITY_FIELD_ID, "Priority"),
+                  (self.STORY_POINTS_FIELD_ID, "Story Points"), (self.OWNER_FIELD_ID, "Owner")]
+        return 200, [{"id": field_id, "name": name, "type": "FieldReference", "trackerId": int(match["tracker_id"])}
+                     for field_id, name in fields]
+
+    def get_tracker_field(self, match, query, body):
+        field_id = int(match["field_id"])
+        if field_id == self.PRIORITY_FIELD_ID:
+            options = [{"id": option_id, "name": name, "type": "ChoiceOptionReference"}
+                       for option_id, name in enumerate(["Unset", "High", "Normal", "Low"])]
+            return 200, {"id": field_id, "name": "Priority", "type": "OptionChoiceField", "options": options,
+                         "multipleValues": False}
+        if field_id == self.OWNER_FIELD_ID:
+            return 200, {"id": field_id, "name": "Owner", "type": "UserChoiceField", "multipleValues": True}
+        return 200, {"id": field_id, "name": "Story Points", "type": "IntegerField"}
+
+    def get_transitions(self, match, query, body):
+        return 200, [{"id": index, "name": self.STATUSES[to_status],
+                      "fromStatus": self.status_reference(from_status), "toStatus": self.status_reference(to_status)}
+                     for index, (from_status, to_status) in enumerate(self.TRANSITIONS, start=1)]
+
+    def get_items_by_tracker(self, match, query, body):
+        tracker_id = int(match["tracker_id"])
+        page = int(query.get("page", ["1"])[0])
+        page_size = int(query.get("pageSize", ["25"])[0])
+        with self._lock:
+            item_ids = list(self.items_by_tracker.get(tracker_id, []))
+            refs = [self.item_reference(self.items[item_id]) for item_id in
+                    item_ids[(page - 1) * page_size:page * page_size]]
+        return 200, {"page": page, "pageSize": page_size, "total": len(item_ids), "itemRefs": refs}
+
+    def create_item(self, match, query, body):
+        tracker_id = int(match["tracker_id"])
+        if tracker_id not in self.trackers:
+            return 404, {"message": "Tracker not found"}
+        return 200, self._add_item(tracker_id, body or {})
+
+    def get_item(self, match, query, body):
+        with self._lock:
+            item = self.items.get(int(match["item_id"]))
+            return (200, dict(item)) if item else (404, {"message": "Item not found"})
+
+    def update_item(self, match, query, body):
+        with self._lock:
+            item = self.items.get(int(match["item_id"]))
+            if item is None:
+                return 404, {"message": "Item not found"}
+            for key in ("name", "description", "status", "subjects"):
+                if body and body.get(key) is not None:
+                    item[key] = body[key]
+            item["version"] += 1
+            return 200, dict(item)
+
+    def delete_item(self, match, query, body):
+        with self._lock:
+            item = self.items.pop(int(match["item_id"]), None)
+            if item is None:
+                return 404, {"message": "Item not found"}
+            self.items_by_tracker[item["tracker"]["id"]].remove(item["id"])
+            return 200, self.item_reference(item)
+
+    def get_item_fields(self, match, query, body):
+        editable = [
+            {"fieldId": 3, "name": "Summary", "type": "TextFieldValue", "value": ""},
+            {"fieldId": self.PRIORITY_FIELD_ID, "name": "Priority", "type": "ChoiceFieldValue", "values": []},
+            {"fieldId": self.STORY_POINTS_FIELD_ID, "name": "Story Points", "type": "IntegerFieldValue", "value": 0},
+            {"fieldId": self.OWNER_FIELD_ID, "name": "Owner", "type": "ChoiceFieldValue", "values": []},
+        ]
+        return 200, {"editableFields": editable, "readOnlyFields": [], "editableTableValues": [],
+                     "readOnlyTableValues": []}
+
+    def update_item_fields(self, match, query, body):
+        with self._lock:
+            item = self.items.get(int(match["item_id"]))
+            if item is None:
+                return 404, {"message": "Item not found"}
+            item["customFields"] = (body or {}).get("fieldValues", [])
+            return 200, dict(item)
+
+    def create_test_run(self, match, query, body):
+        tracker_id = int(match["tracker_id"])
+        test_case_ids = (body or {}).get("testCaseIds") or (body or {}).get("testCaseRefs") or []
+        test_run = self._add_item(tracker_id, {"name": f"Test Run ({len(test_case_ids)} test cases)"})
+        return 200, test_run
+
+    def update_test_run(self, match, query, body):
+        test_run_id = int(match["test_run_id"])
+        with self._lock:
+            if test_run_id not in self.items:
+                return 404, {"message": "Test run not found"}
+            results = self.test_run_results.setdefault(test_run_id, [])
+            results.extend((body or {}).get("updateRequestModels", []))
+            return 200, dict(self.items[test_run_id])
+
+    ROUTES = [
+        ("GET", "/v3/projects", "get_projects"),
+        ("GET", "/v3/projects/{project_id}/trackers", "get_trackers"),
+        ("GET", "/v3/projects/{project_id}/members", "get_members"),
+        ("GET", "/v3/trackers/{tracker_id}", "get_tracker"),
+        ("GET", "/v3/trackers/{tracker_id}/fields", "get_tracker_fields"),
+        ("GET", "/v3/trackers/{tracker_id}/fields/{field_id}", "get_tracker_field"),
+        ("GET", "/v3/trackers/{tracker_id}/transitions", "get_transitions"),
+        ("GET", "/v3/trackers/{tracker_id}/items", "get_items_by_tracker"),
+        ("POST", "/v3/trackers/{tracker_id}/items", "create_item"),
+        ("POST", "/v3/trackers/{tracker_id}/testruns", "create_test_run"),
+        ("GET", "/v3/items/{item_id}", "get_item"),
+        ("PUT", "/v3/items/{item_id}", "update_item"),
+        ("DELETE", "/v3/items/{item_id}", "delete_item"),
+        ("GET", "/v3/items/{item_id}/fields", "get_item_fields"),
+        ("PUT", "/v3/items/{item_id}/fields", "update_item_fields"),
+        ("PUT", "/v3/testruns/{test_run_id}", "update_test_run"),
+        ("POST", "/v3/testruns/{test_run_id}", "update_test_run"),
+    ]
+    COMPILED_ROUTES = [(method, re.compile(r"^.*?/api" + re.sub(r"{(\w+)}", r"(?P<\1>\\d+)", route) + r"/?$"), route, handler)
+                       for method, route, handler in ROUTES]
+
+    def dispatch(self, method, path):
+        for route_method, regex, route, handler in self.COMPILED_ROUTES:
+            if route_method != method:
+                continue
+            match = regex.match(path)
+            if match:
+                return method + " " + route, getattr(self, handler), match.groupdict()
+        return method + " unmatched", None, None
+
+
+class FakeCodebeamerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None
+
+    def do_GET(self):
+        self.handle_api_call("GET")
+
+    def do_POST(self):
+        self.handle_api_call("POST")
+
+    def do_PUT(self):
+        self.handle_api_call("PUT")
+
+    def do_DELETE(self):
+        self.handle_api_call("DELETE")
+
+    def handle_api_call(self, method):
+        start_time = time.perf_counter()
+        parsed = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+
+        route, handler, match = self.fake.dispatch(method, parsed.path)
+        self.fake.sleep()
+
+        if handler is None:
+            status, body = 404, {"message": "No route for " + method + " " + parsed.path}
+        elif self.fake.should_throttle():
+            status, body = 429, {"message": "Too many requests"}
+        else:
+            try:
+                status, body = handler(match, parse_qs(parsed.query), json.loads(raw_body) if raw_body else None)
+            except Exception as e:
+                status, body = 500, {"message": str(e)}
+
+        encoded = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        if status == 429:
+            self.send_header("Retry-After", str(self.fake.retry_after_seconds))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+        self.fake.record(route, time.perf_counter() - start_time, status >= 400)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+# Run as "python -m benchmarks.load_test" from the repository root
+from benchmarks.fake_azure import FakeAzureOpenAIServer
+from benchmarks.fake_codebeamer import FakeCodebeamerServer
+from services.throughput_stats import ThroughputStats
+
+
+# Load test for one instance of the FastAPI app.
+#
+# Starts main.py under uvicorn in its own process, pointed at the local Codebeamer and Azure
+# OpenAI stand-ins, and drives it with N simulated users. Each user has its own cookie jar,
+# connects, sets a product and then browses trackers and tracker items (revalidating with the
+# ETag it got last time), starting a generate_items job every few rounds and polling it until
+# it ends. The app's event loop lag is scraped from /metrics while the test runs.
+#
+# The summary (per route p50/p95/p99, error rates, job durations, event loop lag) is printed
+# and written as JSON, and can be compared against an earlier summary with --compare.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS_POLL_SECONDS = 1.0
+JOB_POLL_SECONDS = 1.0
+JOB_TIMEOUT_SECONDS = 300
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the FastAPI app with concurrent simulated users")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds each user keeps browsing")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds over which the users start")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="Pause between a user's requests")
+    parser.add_argument("--generate-every", type=int, default=5,
+                        help="Start a generate_items job every N browse rounds, 0 to never generate")
+    parser.add_argument("--item-count", type=int, default=10, help="Items per generate_items job")
+    parser.add_argument("--logins", type=int, default=1,
+                        help="Distinct Codebeamer logins the users are spread over (each gets its own client)")
+    parser.add_argument("--seed-items", type=int, default=300, help="Items in the tracker the users browse")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Codebeamer latency per call")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of Codebeamer calls answered with 429")
+    parser.add_argument("--gpt-delay-ms", type=float, default=2000.0, help="Azure OpenAI time per completion")
+    parser.add_argument("--app-url", help="Use an app that is already running (pointed at AZURE_OPENAI_BASE_URL "
+                                          "printed on start) instead of starting one")
+    parser.add_argument("--output", default="load_test_summary.json", help="Where to write the summary")
+    parser.add_argument("--app-log", default="load_test_app.log", help="Where the started app's output goes")
+    parser.add_argument("--compare", help="Earlier summary to compare the route latencies against")
+    return parser.parse_args(argv)
+
+
+# Latencies and statuses per route, e.g. "GET /api/tracker_items"
+class RouteStats:
+    def __init__(self):
+        self.routes = {}
+
+    def record(self, route, seconds, status):
+        entry = self.routes.setdefault(route, {"latencies": [], "statuses": {}})
+        entry["latencies"].append(seconds)
+        entry["statuses"][status] = entry["statuses"].get(status, 0) + 1
+
+    def summary(self, elapsed):
+        routes = {}
+        for route, entry in sorted(self.routes.items()):
+            latencies = sorted(entry["latencies"])
+            errors = sum(count for status, count in entry["statuses"].items() if not self.is_success(status))
+            routes[route] = {
+                "requests": len(latencies),
+                "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+                "errors": errors,
+                "error_rate": round(errors / len(latencies), 4),
+                "statuses": {str(status): count for status, count in sorted(entry["statuses"].items(), key=str)},
+                "latency_ms": {
+                    "p50": ThroughputStats.percentile_ms(latencies, 50),
+                    "p95": ThroughputStats.percentile_ms(latencies, 95),
+                    "p99": ThroughputStats.percentile_ms(latencies, 99),
+                    "max": ThroughputStats.percentile_ms(latencies, 100),
+                },
+            }
+        return routes
+
+    # 304 is a successful revalidation, anything else that isn't 2xx counts as an error
+    @staticmethod
+    def is_success(status):
+        return isinstance(status, int) and (200 <= status < 300 or status == 304)
+
+
+class SimulatedUser:
+    PRODUCT = "Load Test Vehicle"
+    PROJECT_NAME = "Benchmark Project"
+
+    def __init__(self, index, args, app_url, cb_url, route_stats, job_stats):
+        self.index = index
+        self.args = args
+        self.app_url = app_url
+        self.cb_url = cb_url
+        self.route_stats = route_stats
+        self.job_stats = job_stats
+        self.etags = {}
+
+    async def run(self, start_delay):
+        await asyncio.sleep(start_delay)
+        # Each user gets its own cookie jar, so the app sees one session per user
+        jar = aiohttp.CookieJar(unsafe=True)
+        async with aiohttp.ClientSession(self.app_url, cookie_jar=jar) as session:
+            await self.request(session, "GET", "/api/greet")
+            status, _ = await self.request(session, "POST", "/api/connect", json={
+                "url": self.cb_url,
+                "username": "loadtest" + str(self.index % max(1, self.args.logins)),
+                "password": "loadtest",
+            })
+            if status != 200:
+                return
+            await self.request(session, "POST", "/api/set_product", json={"product_name": self.PRODUCT})
+
+            deadline = time.monotonic() + self.args.duration
+            rounds = 0
+            while time.monotonic() < deadline:
+                rounds += 1
+                await self.browse(session)
+                if self.args.generate_every and rounds % self.args.generate_every == 0:
+                    await self.generate(session)
+                await self.think()
+
+    async def browse(self, session):
+        await self.request(session, "GET", "/api/trackers", params={"project_name": self.PROJECT_NAME},
+                           etag_key="trackers")
+        await self.think()
+        await self.request(session, "GET", "/api/tracker_items",
+                           params={"tracker_id": FakeCodebeamerServer.REQUIREMENTS_TRACKER_ID}, etag_key="tracker_items")
+
+    async def generate(self, session):
+        start_time = time.perf_counter()
+        status, body = await self.request(session, "POST", "/api/generate_items", json={
+            "tracker_id": FakeCodebeamerServer.DOWNSTREAM_TRACKER_ID,
+            "item_count": self.args.item_count,
+            "requirement_type": "software",
+            "additional_rules": "",
+        })
+        if status != 200 or not body:
+            return
+        self.job_stats["submitted"] += 1
+
+        # Poll like the frontend does until the job ends, jobs that take too long are reported as unfinished
+        job_deadline = time.monotonic() + JOB_TIMEOUT_SECONDS
+        while time.monotonic() < job_deadline:
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            status, job = await self.request(session, "GET", "/api/jobs/" + body["job_id"], route="GET /api/jobs/{job_id}")
+            if status == 200 and job and job.get("state") in ("succeeded", "failed"):
+                self.job_stats[job["state"]] += 1
+                self.job_stats["durations"].append(time.perf_counter() - start_time)
+                return
+        self.job_stats["unfinished"] += 1
+
+    async def think(self):
+        if self.args.think_ms > 0:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.args.think_ms / 1000)
+
+    # Returns (status, parsed JSON body or None). Network errors are recorded with their exception name.
+    async def request(self, session, method, path, json=None, params=None, etag_key=None, route=None):
+        headers = {}
+        if etag_key is not None and etag_key in self.etags:
+            headers["If-None-Match"] = self.etags[etag_key]
+
+        route = route or method + " " + path
+        start_time = time.perf_counter()
+        try:
+            async with session.request(method, path, json=json, params=params, headers=headers) as response:
+                body = await response.json(content_type=None) if response.status != 304 else None
+                if etag_key is not None and response.headers.get("ETag"):
+                    self.etags[etag_key] = response.headers["ETag"]
+                self.route_stats.record(route, time.perf_counter() - start_time, response.status)
+                return response.status, body
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self.route_stats.record(route, time.perf_counter() - start_time, type(e).__name__)
+            return None, None
+
+
+# Samples the app's event loop lag gauge until stopped
+async def watch_event_loop_lag(app_url, samples, stop):
+    async with aiohttp.ClientSession(app_url) as session:
+        while not stop.is_set():
+            try:
+                async with session.get("/metrics") as response:
+                    for line in (await response.text()).splitlines():
+                        if line.startswith("event_loop_lag_seconds "):
+                            samples.append(float(line.split()[1]))
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), METRICS_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def run_users(args, app_url, cb_url):
+    route_stats = RouteStats()
+    job_stats = {"submitted": 0, "succeeded": 0, "failed": 0, "unfinished": 0, "durations": []}
+    lag_samples = []
+    stop = asyncio.Event()
+
+    watcher = asyncio.create_task(watch_event_loop_lag(app_url, lag_samples, stop))
+    start_time = time.perf_counter()
+    users = [SimulatedUser(index, args, app_url, cb_url, route_stats, job_stats) for index in range(args.users)]
+    await asyncio.gather(*(user.run(args.ramp_up * index / max(1, args.users)) for index, user in enumerate(users)))
+    elapsed = time.perf_counter() - start_time
+    stop.set()
+    await watcher
+
+    all_requests = sum(len(entry["latencies"]) for entry in route_stats.routes.values())
+    routes = route_stats.summary(elapsed)
+    all_errors = sum(route["errors"] for route in routes.values())
+    durations = sorted(job_stats.pop("durations"))
+    lag = sorted(lag_samples)
+    return {
+        "seconds": round(elapsed, 3),
+        "requests": all_requests,
+        "requests_per_second": round(all_requests / elapsed, 2) if elapsed > 0 else 0.0,
+        "error_rate": round(all_errors / all_requests, 4) if all_requests else 0.0,
+        "routes": routes,
+        "jobs": {**job_stats, "duration_ms": {
+            "p50": ThroughputStats.percentile_ms(durations, 50),
+            "p95": ThroughputStats.percentile_ms(durations, 95),
+            "max": ThroughputStats.percentile_ms(durations, 100),
+        }},
+        "event_loop_lag_ms": {
+            "samples": len(lag),
+            "p50": ThroughputStats.percentile_ms(lag, 50),
+            "p95": ThroughputStats.percentile_ms(lag, 95),
+            "max": ThroughputStats.percentile_ms(lag, 100),
+        },
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Starts the app under uvicorn and waits until it answers
+def start_app(gpt_url, log_file):
+    port = free_port()
+    env = dict(os.environ, AZURE_OPENAI_BASE_URL=gpt_url, OPENAI_KEY=os.getenv("OPENAI_KEY", "loadtest"),
+               GPT_CACHE_ENABLED="false", LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+    app_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise Exception("The app exited with code " + str(process.returncode) + " while starting, see " + log_file.name)
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process, app_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise Exception("The app did not start within 30 seconds")
+
+
+def print_summary(summary, baseline=None):
+    print(f"{summary['requests']} requests in {summary['seconds']}s ({summary['requests_per_second']}/s), "
+          f"error rate {summary['error_rate']:.2%}")
+    print()
+    print(f"{'route':<30}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          + ("  p95 vs baseline" if baseline else ""))
+    for route, stats in summary["routes"].items():
+        latency = stats["latency_ms"]
+        line = (f"{route:<30}{stats['requests']:>9}{stats['errors']:>8}{str(latency['p50']):>9}"
+                f"{str(latency['p95']):>9}{str(latency['p99']):>9}{str(latency['max']):>9}")
+        baseline_route = (baseline or {}).get("routes", {}).get(route)
+        if baseline_route and baseline_route["latency_ms"]["p95"] and latency["p95"] is not None:
+            change = latency["p95"] / baseline_route["latency_ms"]["p95"] - 1
+            line += f"  {change:+.0%} (was {baseline_route['latency_ms']['p95']})"
+        print(line)
+
+    jobs = summary["jobs"]
+    print()
+    print(f"jobs: {jobs['submitted']} submitted, {jobs['succeeded']} succeeded, {jobs['failed']} failed, "
+          f"{jobs['unfinished']} unfinished, p50 {jobs['duration_ms']['p50']} ms, p95 {jobs['duration_ms']['p95']} ms")
+    lag = summary["event_loop_lag_ms"]
+    print(f"event loop lag: p50 {lag['p50']} ms, p95 {lag['p95']} ms, max {lag['max']} ms ({lag['samples']} samples)")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    cb_server = FakeCodebeamerServer(args.latency_ms, throttle_rate=args.throttle_rate).start()
+    cb_server.seed_items(cb_server.REQUIREMENTS_TRACKER_ID, args.seed_items, "Requirement")
+    gpt_server = FakeAzureOpenAIServer(args.gpt_delay_ms).start()
+    print("Codebeamer stand-in: " + cb_server.url)
+    print("Azure OpenAI stand-in: " + gpt_server.url)
+
+    process = None
+    app_log = None
+    try:
+        if args.app_url:
+            app_url = args.app_url.rstrip("/")
+        else:
+            app_log = open(args.app_log, "w", encoding="utf-8")
+            process, app_url = start_app(gpt_server.url, app_log)
+        print(f"Running {args.users} users against {app_url} for {args.duration}s...")
+
+        summary = asyncio.run(run_users(args, app_url, cb_server.url))
+        summary["settings"] = vars(args)
+        summary["codebeamer"] = cb_server.stats()
+        summary["gpt"] = gpt_server.stats()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if app_log is not None:
+            app_log.close()
+        cb_server.stop()
+        gpt_server.stop()
+
+    print()
+    print_summary(summary, baseline)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, default=str)
+    print()
+    print("Summary written to " + args.output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Run as "python -m benchmarks.run_benchmarks" from the repository root
+from benchmarks.fake_azure import FakeAzureOpenAIServer
+from benchmarks.fake_codebeamer import FakeCodebeamerServer
+
+
+# Runs the generator services against local stand-ins for Codebeamer and Azure OpenAI and
+# reports items/second, Codebeamer calls per route and latency percentiles for each service.
+# Latency, 429 rate and GPT delay are configurable, so changes to the pools, the rate limiter
+# or the batching can be compared run against run without touching a real server.
+SERVICES = ["top_level", "traceability", "field_updater", "status_updater", "test_runs", "delete_tracker_data"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the demo data services against local fakes")
+    parser.add_argument("--items", type=int, default=200, help="Items created, updated or deleted per service")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Codebeamer latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Random extra Codebeamer latency per call")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of Codebeamer calls answered with 429")
+    parser.add_argument("--gpt-delay-ms", type=float, default=500.0, help="Azure OpenAI time per completion")
+    parser.add_argument("--max-workers", type=int, default=8, help="Worker threads per Codebeamer client")
+    parser.add_argument("--initial-rate", type=float, default=None,
+                        help="Starting requests/second of the rate limiter (CB_RATE_LIMIT_INITIAL)")
+    parser.add_argument("--stream", action="store_true", help="Stream top level items from GPT")
+    parser.add_argument("--services", default=",".join(SERVICES), help="Comma separated, from: " + ", ".join(SERVICES))
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    return parser.parse_args(argv)
+
+
+class BenchmarkRunner:
+    PRODUCT = "Benchmark Vehicle"
+
+    def __init__(self, cb_server, gpt_server, cb_client, items, stream=False):
+        self.cb_server = cb_server
+        self.gpt_server = gpt_server
+        self.cb_client = cb_client
+        self.items = items
+        self.stream = stream
+
+    # Sets up the data a service needs, then runs it. Returns (service, processed item count)
+    def prepare_top_level(self):
+        from services.top_level_item_generator import TopLevelItemGenerator
+        tracker_id = self.cb_server.REQUIREMENTS_TRACKER_ID
+        self.cb_server.clear_tracker(tracker_id)
+        generator = TopLevelItemGenerator(self.cb_client, self.PRODUCT, tracker_id, self.items, "software", "",
+                                          bypass_cache=True, stream=self.stream)
+        return generator, lambda: len(self.cb_server.item_ids(tracker_id))
+
+    def prepare_traceability(self):
+        from services.traceability_generator import TraceabilityGenerator
+        upstream_tracker_id = self.cb_server.REQUIREMENTS_TRACKER_ID
+        downstream_tracker_id = self.cb_server.DOWNSTREAM_TRACKER_ID
+        self.cb_server.clear_tracker(upstream_tracker_id)
+        self.cb_server.clear_tracker(downstream_tracker_id)
+        upstream_items = [{"id": item_id, "name": "Requirement " + str(index)} for index, item_id in
+                          enumerate(self.cb_server.seed_items(upstream_tracker_id, self.items, "Requirement"), start=1)]
+        generator = TraceabilityGenerator(self.cb_client, self.PRODUCT, upstream_tracker_id, upstream_items,
+                                          downstream_tracker_id, 1, "", bypass_cache=True)
+        return generator, lambda: len(self.cb_server.item_ids(downstream_tracker_id))
+
+    def prepare_field_updater(self):
+        from services.field_updater import FieldUpdater
+        tracker_id = self.cb_server.REQUIREMENTS_TRACKER_ID
+        self.cb_server.clear_tracker(tracker_id)
+        generator = FieldUpdater(self.cb_client, tracker_id, self.cb_server.seed_items(tracker_id, self.items))
+        return generator, None
+
+    def prepare_status_updater(self):
+        from services.status_updater import StatusUpdater
+        tracker_id = self.cb_server.REQUIREMENTS_TRACKER_ID
+        self.cb_server.clear_tracker(tracker_id)
+        generator = StatusUpdater(self.cb_client, tracker_id, self.cb_server.seed_items(tracker_id, self.items))
+        return generator, None
+
+    def prepare_test_runs(self):
+        from services.test_run_generator import TestRunGenerator
+        test_case_tracker_id = self.cb_server.TEST_CASE_TRACKER_ID
+        self.cb_server.clear_tracker(test_case_tracker_id)
+        self.cb_server.clear_tracker(self.cb_server.TEST_RUN_TRACKER_ID)
+        self.cb_server.seed_items(test_case_tracker_id, self.items, "Test Case")
+        test_cases = self.cb_client.get_paginated_tracker_items(test_case_tracker_id)
+
+        # One run per 10 test cases, so the runs are created concurrently
+        passed_count = self.items * 7 // 10
+        failed_count = self.items * 2 // 10
+        generator = TestRunGenerator(self.cb_client, test_case_tracker_id, test_cases,
+                                     self.cb_server.TEST_RUN_TRACKER_ID, passed_count, failed_count,
+                                     self.items - passed_count - failed_count, shard_size=10)
+        return generator, lambda: self.items
+
+    def prepare_delete_tracker_data(self):
+        from services.delete_all_tracker_data import DeleteAllTrackerData
+        tracker_id = self.cb_server.REQUIREMENTS_TRACKER_ID
+        self.cb_server.clear_tracker(tracker_id)
+        self.cb_server.seed_items(tracker_id, self.items)
+        generator = DeleteAllTrackerData(self.cb_client, tracker_id)
+        return generator, lambda: self.items - len(self.cb_server.item_ids(tracker_id))
+
+    def run(self, service):
+        generator, count_processed = getattr(self, "prepare_" + service)()
+        self.cb_server.reset_stats()
+        self.gpt_server.reset_stats()
+
+        error = None
+        result = None
+        start_time = time.perf_counter()
+        try:
+            result = generator.generate()
+        except Exception as e:
+            error = str(e)
+        elapsed = time.perf_counter() - start_time
+
+        if count_processed is not None:
+            processed = count_processed()
+        elif isinstance(result, dict):
+            processed = result.get("updated", 0)
+        else:
+            processed = 0
+
+        cb_stats = self.cb_server.stats()
+        report = {
+            "service": type(generator).__name__,
+            "seconds": round(elapsed, 3),
+            "items": processed,
+            "items_per_second": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "codebeamer_calls": sum(route["calls"] for route in cb_stats["routes"].values()),
+            "codebeamer_throttled": cb_stats["throttled"],
+            "codebeamer_routes": cb_stats["routes"],
+            "gpt": self.gpt_server.stats(),
+            "error": error,
+        }
+        if isinstance(result, dict):
+            report["result"] = {key: (len(value) if isinstance(value, (list, dict)) else value)
+                                for key, value in result.items()}
+        return report
+
+
+def print_report(report):
+    print(f"{'service':<28}{'items':>8}{'seconds':>10}{'items/s':>10}{'cb calls':>10}{'429s':>7}"
+          f"{'gpt calls':>11}  error")
+    for entry in report["services"]:
+        print(f"{entry['service']:<28}{entry['items']:>8}{entry['seconds']:>10}{entry['items_per_second']:>10}"
+              f"{entry['codebeamer_calls']:>10}{entry['codebeamer_throttled']:>7}{entry['gpt']['calls']:>11}"
+              f"  {entry['error'] or ''}")
+
+    print()
+    print(f"{'service':<28}{'codebeamer route':<48}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for entry in report["services"]:
+        for route, stats in entry["codebeamer_routes"].items():
+            latency = stats["latency_ms"]
+            print(f"{entry['service']:<28}{route:<48}{stats['calls']:>7}{str(latency['p50']):>9}"
+                  f"{str(latency['p95']):>9}{str(latency['p99']):>9}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    services = [service.strip() for service in args.services.split(",") if service.strip()]
+    unknown = [service for service in services if service not in SERVICES]
+    if unknown:
+        raise SystemExit("Unknown services: " + ", ".join(unknown))
+
+    cb_server = FakeCodebeamerServer(args.latency_ms, args.jitter_ms, args.throttle_rate).start()
+    gpt_server = FakeAzureOpenAIServer(args.gpt_delay_ms).start()
+
+    # The clients read these when they are first imported
+    os.environ["AZURE_OPENAI_BASE_URL"] = gpt_server.url
+    os.environ.setdefault("OPENAI_KEY", "benchmark")
+    os.environ.setdefault("GPT_CACHE_ENABLED", "false")
+    if args.initial_rate is not None:
+        os.environ["CB_RATE_LIMIT_INITIAL"] = str(args.initial_rate)
+
+    from apis.cb_client.cb_api_client import CBApiClient
+    from apis.cb_client.rate_limiter import AdaptiveRateLimiter
+
+    cb_client = CBApiClient(cb_server.url, "benchmark", "benchmark", max_workers=args.max_workers)
+    cb_client.populate_project_data(cb_server.PROJECT_ID)
+    runner = BenchmarkRunner(cb_server, gpt_server, cb_client, args.items, stream=args.stream)
+
+    try:
+        report = {
+            "settings": vars(args),
+            "services": [runner.run(service) for service in services],
+            "rate_limiter": AdaptiveRateLimiter.all_stats(),
+        }
+    finally:
+        cb_client.close()
+        cb_server.stop()
+        gpt_server.stop()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+        print()
+        print("Report written to " + args.output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,38 @@
-import traceback
-
 from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from itsdangerous import Signer
+from itsdangerous import TimestampSigner
 
 from dotenv import load_dotenv
 
+import asyncio
+import os
+import threading
 import uuid
-import time
+
+from starlette.routing import Match
 
 
 from openapi_client.exceptions import ServiceException, UnauthorizedException, NotFoundException
 
-from apis.cb_client.cb_api_client import CBApiClient
+import metrics
+import tracing
+from apis.cb_client.cb_client_registry import CBClientRegistry
+from apis.cb_client.metadata_cache import MetadataCache
+from apis.cb_client.rate_limiter import AdaptiveRateLimiter
+from apis.gpt_client.gpt_api_client import GPTAPIClient
+from response_cache import ResponseCache
+from session_store import SessionStore
+from structured_logging import get_logger, log_context, logging_stats
+from services.batch_item_generation import BatchItemGeneration
 from services.delete_all_tracker_data import DeleteAllTrackerData
 from services.top_level_item_generator import TopLevelItemGenerator
 from services.traceability_generator import TraceabilityGenerator
 from services.delete_all_project_data import DeleteAllProjectData
+from services.job_manager import JobManager
 
 app = FastAPI()
+logger = get_logger("api")
 load_dotenv()
 
 # Allow requests from your frontend
@@ -35,46 +49,192 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Simple in-memory session store
-session_store = {}
-
-# Signer for secure session IDs
-signer = Signer("your-secret-key")
+# Signer for secure session IDs. The signature carries the issue time, so a session id expires even
+# after its stored session was already swept away.
+signer = TimestampSigner("your-secret-key")
 
 SESSION_EXPIRATION_SECONDS = 1800  # 30 minutes
 
+# Worker threads each Codebeamer client uses inside one job, and how many jobs run at once
+CB_CLIENT_MAX_WORKERS = 8
+JOB_WORKERS = 8
+
+# Codebeamer clients shared by every session logged in to the same server as the same user.
+# The pool has room for every job thread that can use one client at the same time.
+cb_client_registry = CBClientRegistry(max_workers=CB_CLIENT_MAX_WORKERS,
+                                      pool_size=CB_CLIENT_MAX_WORKERS * JOB_WORKERS)
+
+# Expiring, size-capped session store (SESSION_BACKEND=sqlite shares it between workers).
+# The Codebeamer client only lives in the worker that handled /api/connect, so running several
+# workers needs sticky routing by the session_id cookie; other workers answer "Codebeamer client
+# not found" until the user connects again through them.
+session_store = SessionStore.from_env(SESSION_EXPIRATION_SECONDS, release_client=cb_client_registry.release)
+
+# Upper bounds for synthetic bulk loads
+MAX_BULK_LOAD_ITEMS = 100000
+MAX_BULK_LOAD_WORKERS = 64
+MAX_BULK_LOAD_RETRIES = 10
+
+# Worker pool for long-running generate/delete jobs
+job_manager = JobManager(max_workers=JOB_WORKERS)
+
+# Bounded pool for the blocking Codebeamer reads behind the browse endpoints, so they don't
+# hold up the event loop
+READ_WORKERS = 16
+READ_TIMEOUT_SECONDS = float(os.getenv("CB_READ_TIMEOUT_SECONDS", "30"))
+DISCONNECT_POLL_SECONDS = 0.5
+read_executor = tracing.ContextThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="cb-read")
+
+# Tracker and tracker item lists are served from here for a short while, and dropped as soon
+# as a job changes the tracker
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+response_cache = ResponseCache(ttl_seconds=RESPONSE_CACHE_TTL_SECONDS)
+
+
+# Route template of the request, so metrics aren't split by path parameters
+def get_route_path(request):
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    route = get_route_path(request)
+    with metrics.track(metrics.http_request_duration, metrics.http_requests_in_flight,
+                       method=request.method, route=route) as observation:
+        response = await call_next(request)
+        observation["status"] = response.status_code
+        return response
+
+
+# Traces the request when TRACING_ENABLED is set. A request with "X-Debug-Trace: 1" is traced
+# either way and gets a summary of where its time went in the X-Trace-Summary header.
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    want_summary = request.headers.get("x-debug-trace") == "1"
+    if not tracing.TRACING_ENABLED and not want_summary:
+        return await call_next(request)
+
+    with tracing.start_trace("http " + request.method + " " + get_route_path(request), export=tracing.TRACING_ENABLED,
+                             method=request.method, path=request.url.path) as root:
+        response = await call_next(request)
+        root.set_attribute("status", response.status_code)
+
+    response.headers["X-Trace-Id"] = root.trace.trace_id
+    if want_summary:
+        response.headers["X-Trace-Summary"] = root.trace.summary()
+    return response
+
 
 @app.middleware("http")
 async def add_session_id(request: Request, call_next):
     session_id = request.cookies.get("session_id")
     expired = False
 
+    session_store.maybe_sweep()
+
     if session_id:
         try:
-            signer.unsign(session_id.encode())
-            session_data = session_store.get(session_id)
-            if session_data:
-                created_at = session_data.get("created_at", 0)
-                if time.time() - created_at > SESSION_EXPIRATION_SECONDS:
-                    expired = True
+            signer.unsign(session_id.encode(), max_age=SESSION_EXPIRATION_SECONDS)
         except Exception:
+            session_store.delete(session_id)
             expired = True
+        else:
+            state = session_store.get_state(session_id)
+            if state == "expired":
+                expired = True
+            elif state == "missing":
+                # First request that carries the cookie, so routes like set_product work before connecting
+                session_store.create(session_id)
 
     if not session_id or expired:
-        # Create new session
+        # Issue a new session id. The session itself is only stored once the client sends the
+        # cookie back, so cookieless probes and bots don't fill up the store
         raw_id = str(uuid.uuid4())
         signed_id = signer.sign(raw_id).decode()
-        session_store[signed_id] = {"created_at": time.time()}
         response = await call_next(request)
         response.set_cookie(key="session_id", value=signed_id, httponly=True)
         return response
 
-    response = await call_next(request)
+    # Every log line written while handling the request, or by jobs it starts, carries the session id
+    with log_context(session_id=session_id):
+        response = await call_next(request)
     return response
 
 
 
 
+# Runs a blocking Codebeamer read on the read pool. read(cancelled) gets a threading.Event
+# that is set when the client disconnects or the read times out, so it can stop early.
+async def run_read(request, read):
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+    future = loop.run_in_executor(read_executor, read, cancelled)
+    deadline = loop.time() + READ_TIMEOUT_SECONDS
+
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise HTTPException(status_code=504, detail="Codebeamer did not respond in time")
+
+            done, _ = await asyncio.wait({future}, timeout=min(DISCONNECT_POLL_SECONDS, remaining))
+            if done:
+                return future.result()
+
+            if await request.is_disconnected():
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not future.done():
+            cancelled.set()
+            future.cancel()
+
+
+# Attaches the job to a service so it can report progress, then runs it on the job worker thread.
+# Cached responses built from the tags are dropped when the job starts and again when it ends,
+# so lists fetched while the job was running don't outlive it.
+def run_with_job(generator, job, tags=()):
+    generator.job = job
+    response_cache.invalidate(*tags)
+    try:
+        with tracing.span("service." + type(generator).__name__, job_id=job.id):
+            return generator.generate()
+    finally:
+        response_cache.invalidate(*tags)
+
+
+# Only GET requests are revalidated. A browser doesn't send If-None-Match on POST by itself, and a
+# matching precondition on POST would have to be answered with 412 rather than 304.
+def is_not_modified(request, etag):
+    return request.method == "GET" and ResponseCache.etag_matches(request.headers.get("if-none-match"), etag)
+
+
+# Returns a cached response, or a 304 if the client already has it
+def cached_response(request, session_id, key):
+    cached = response_cache.get(session_id, key)
+    if cached is None:
+        return None
+
+    body, etag = cached
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(body, headers={"ETag": etag})
+
+
+# Caches a freshly built body. generation is response_cache.generation() from before the read,
+# so a body read before a job invalidated its tags isn't cached. A client that sent a matching
+# ETag still gets a 304.
+def cache_response(request, response, session_id, key, body, tags, generation):
+    etag = response_cache.set(session_id, key, body, tags=tags, generation=generation)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return body
+
+
 @app.get("/api/greet")
 def greet(request: Request):
     session_id = request.cookies.get("session_id")
@@ -104,38 +264,37 @@ async def connect(request: Request):
     url = data.get("url")
     username = data.get("username")
     password = data.get("password")
-    cb_api_client = CBApiClient(url, username, password)
     session_id = request.cookies.get("session_id")
 
-    if session_id not in session_store:
-        session_store[session_id] = {}
+    if not session_id:
+        raise HTTPException(status_code=400, detail="Session not found")
 
-        # When creating a new session
-        session_store[session_id] = {
-            "created_at": time.time(),
-        }
+    cb_api_client = cb_client_registry.acquire(url, username, password)
+    response_cache.drop_session(session_id)
+
+    if session_id not in session_store:
+        session_store.create(session_id)
 
-    session_store[session_id]["cb_url"] = url
-    session_store[session_id]["cb_api_client"] = cb_api_client
+    session_store.update(session_id, cb_url=url, cb_api_client=cb_api_client)
 
     try:
         projects = cb_api_client.project_api_instance.get_projects()
     except ServiceException:
-        session_store[session_id]["cb_api_client"] = None
+        session_store.update(session_id, cb_api_client=None)
         raise HTTPException(status_code=500, detail="Server Error: Please confirm server is running")
     except UnauthorizedException:
-        session_store[session_id]["cb_api_client"] = None
+        session_store.update(session_id, cb_api_client=None)
         raise HTTPException(status_code=401, detail="Unauthorized: Please check your username and password")
     except NotFoundException:
-        session_store[session_id]["cb_api_client"] = None
+        session_store.update(session_id, cb_api_client=None)
         raise HTTPException(status_code=404,
                             detail="The server was not found. Please ensure your URL is pointing to a Codebeamer instance.")
     except Exception as e:
-        session_store[session_id]["cb_api_client"] = None
+        session_store.update(session_id, cb_api_client=None)
         raise HTTPException(status_code=500, detail=str(e))
 
     project_map = {project.name: project.id for project in projects}
-    session_store[session_id]["project_map"] = project_map
+    session_store.update(session_id, project_map=project_map)
     return {"status": "success"}
 
 
@@ -148,7 +307,7 @@ async def set_product(request: Request):
     if not session_id or session_id not in session_store:
         raise HTTPException(status_code=400, detail="Session not found")
 
-    session_store[session_id]["product_name"] = product_name
+    session_store.update(session_id, product_name=product_name)
 
 
 @app.get("/api/project_names")
@@ -174,17 +333,25 @@ async def get_projects(request: Request):
         raise HTTPException(status_code=404, detail="No project map found")
 
     # tracker_list = [{"name": tracker.name, "id": tracker.id} for tracker in trackers]
-    print("This is the project list with keys and values")
     project_list = [{"name": key, "id": value} for key, value in project_map.items()]
-    print(project_list)
+    logger.debug("Returning " + str(len(project_list)) + " projects")
 
     return {"projects": project_list}
 
 
 @app.post("/api/trackers")
-async def get_tracker_names(request: Request):
+async def get_tracker_names(request: Request, response: Response):
     data = await request.json()
-    project_name = data.get("project_name")
+    return await read_trackers(request, response, data.get("project_name"))
+
+
+# Same as POST /api/trackers, but cacheable: send the ETag back in If-None-Match to get a 304
+@app.get("/api/trackers")
+async def get_trackers(request: Request, response: Response, project_name: str = None):
+    return await read_trackers(request, response, project_name)
+
+
+async def read_trackers(request, response, project_name):
     session_id = request.cookies.get("session_id")
 
     if not session_id or session_id not in session_store:
@@ -200,18 +367,35 @@ async def get_tracker_names(request: Request):
     if not cb_api_client:
         raise HTTPException(status_code=400, detail="Codebeamer client not found")
 
+    cached = cached_response(request, session_id, ("trackers", project_id))
+    if cached is not None:
+        return cached
+
     try:
-        trackers = cb_api_client.project_api_instance.get_trackers(project_id)
+        generation = response_cache.generation()
+        trackers = await run_read(request, lambda cancelled: cb_api_client.project_api_instance.get_trackers(project_id))
         tracker_list = [{"name": tracker.name, "id": tracker.id} for tracker in trackers]
-        return {"trackers": tracker_list}
+        return cache_response(request, response, session_id, ("trackers", project_id),
+                              {"trackers": tracker_list}, [("project", project_id)], generation)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/tracker_items")
-async def get_tracker_names(request: Request):
+async def get_tracker_names(request: Request, response: Response):
     data = await request.json()
-    tracker_id = data.get("tracker_id")
+    return await read_tracker_items(request, response, data.get("tracker_id"))
+
+
+# Same as POST /api/tracker_items, but cacheable: send the ETag back in If-None-Match to get a 304
+@app.get("/api/tracker_items")
+async def get_tracker_items(request: Request, response: Response, tracker_id: str = None):
+    return await read_tracker_items(request, response, tracker_id)
+
+
+async def read_tracker_items(request, response, tracker_id):
     session_id = request.cookies.get("session_id")
 
     if not session_id or session_id not in session_store:
@@ -223,9 +407,24 @@ async def get_tracker_names(request: Request):
         raise HTTPException(status_code=400, detail="Codebeamer client not found")
 
     try:
-        tracker_items = cb_api_client.get_paginated_tracker_items(int(tracker_id))
+        tracker_id = int(tracker_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="tracker_id must be a number")
+
+    cached = cached_response(request, session_id, ("tracker_items", tracker_id))
+    if cached is not None:
+        return cached
+
+    try:
+        generation = response_cache.generation()
+        tracker_items = await run_read(
+            request, lambda cancelled: cb_api_client.get_paginated_tracker_items(tracker_id, cancelled=cancelled))
         tracker_item_list = [{"name": tracker.name, "id": tracker.id} for tracker in tracker_items][::-1]
-        return {"tracker_items": tracker_item_list}
+        return cache_response(request, response, session_id, ("tracker_items", tracker_id),
+                              {"tracker_items": tracker_item_list}, [("tracker", tracker_id), "tracker_items"],
+                              generation)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -237,9 +436,10 @@ async def generate_items(request: Request):
     tracker_id = data.get("tracker_id")
     item_count = data.get("item_count")
     additional_rules = data.get("additional_rules")
+    bypass_cache = bool(data.get("bypass_cache", False))
+    stream = bool(data.get("stream", False))
 
     session_id = request.cookies.get("session_id")
-    print(session_id)
     if not session_id or session_id not in session_store:
         raise HTTPException(status_code=400, detail="Session not found")
 
@@ -254,13 +454,15 @@ async def generate_items(request: Request):
         raise HTTPException(status_code=400, detail="Product not set")
 
     try:
-        TopLevelItemGenerator(cb_api_client, product, int(tracker_id),
-                              item_count, requirement_type, additional_rules).generate()
-        return {"status": "success", "message": "Top level items generated"}
+        generator = TopLevelItemGenerator(cb_api_client, product, int(tracker_id),
+                                          item_count, requirement_type, additional_rules,
+                                          bypass_cache=bypass_cache, stream=stream)
+        job = job_manager.submit("generate_items", session_id,
+                                 lambda job: run_with_job(generator, job, tags=[("tracker", int(tracker_id))]))
+        return {"status": "queued", "message": "Top level item generation started", "job_id": job.id}
 
     except Exception as e:
-        print("Exception occurred:", str(e))
-        traceback.print_exc()  # This prints the full traceback to the console
+        logger.exception("Exception occurred: " + str(e))
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
 
@@ -272,6 +474,7 @@ async def generate_traceability(request: Request):
     downstream_tracker_id = data.get("downstream_tracker_id")
     downstream_count = data.get("downstream_count")
     additional_rules = data.get("additional_rules")
+    bypass_cache = bool(data.get("bypass_cache", False))
 
     session_id = request.cookies.get("session_id")
     if not session_id or session_id not in session_store:
@@ -285,13 +488,15 @@ async def generate_traceability(request: Request):
         raise HTTPException(status_code=400, detail="Missing session data")
 
     try:
-        TraceabilityGenerator(cb_api_client, product, int(upstream_tracker_id),
-                              selected_upstream_items, int(downstream_tracker_id), downstream_count, additional_rules).generate()
-        return {"status": "success", "message": "Top level items generated"}
+        generator = TraceabilityGenerator(cb_api_client, product, int(upstream_tracker_id),
+                                          selected_upstream_items, int(downstream_tracker_id), downstream_count,
+                                          additional_rules, bypass_cache=bypass_cache)
+        job = job_manager.submit("generate_traceability", session_id,
+                                 lambda job: run_with_job(generator, job, tags=[("tracker", int(downstream_tracker_id))]))
+        return {"status": "queued", "message": "Traceability generation started", "job_id": job.id}
 
     except Exception as e:
-        print("Exception occurred:", str(e))
-        traceback.print_exc()  # This prints the full traceback to the console
+        logger.exception("Exception occurred: " + str(e))
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
 
@@ -312,12 +517,13 @@ async def delete_tracker_data(request: Request):
         raise HTTPException(status_code=400, detail="Missing session data")
 
     try:
-        DeleteAllTrackerData(cb_api_client, int(tracker_id)).generate()
-        return {"status": "success", "message": "All tracker items deleted"}
+        generator = DeleteAllTrackerData(cb_api_client, int(tracker_id))
+        job = job_manager.submit("delete_tracker_data", session_id,
+                                 lambda job: run_with_job(generator, job, tags=[("tracker", int(tracker_id))]))
+        return {"status": "queued", "message": "Tracker item deletion started", "job_id": job.id}
 
     except Exception as e:
-        print("Exception occured:", str(e))
-        traceback.print_exc() # prints the full traceback to the console
+        logger.exception("Exception occurred: " + str(e))
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
 @app.post("/api/delete_project_data")
@@ -337,10 +543,156 @@ async def delete_project_data(request: Request):
         raise HTTPException(status_code=400, detail="Missing session data")
 
     try:
-        DeleteAllProjectData(cb_api_client, int(project_id)).generate()
-        return {"status": "success", "message": "All project data deleted"}
+        generator = DeleteAllProjectData(cb_api_client, int(project_id))
+        # Item lists aren't tagged with their project, so drop all of them
+        job = job_manager.submit("delete_project_data", session_id,
+                                 lambda job: run_with_job(generator, job, tags=[("project", int(project_id)), "tracker_items"]))
+        return {"status": "queued", "message": "Project data deletion started", "job_id": job.id}
 
     except Exception as e:
-        print("Exception occurred:", str(e))
-        traceback.print_exc() # prints the full traceback to the console
-        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
\ No newline at end of file
+        logger.exception("Exception occurred: " + str(e))
+        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
+
+
+@app.post("/api/bulk_load")
+async def bulk_load(request: Request):
+    data = await request.json()
+    tracker_id = data.get("tracker_id")
+    item_count = data.get("item_count")
+    max_workers = data.get("max_workers")
+    max_retries = data.get("max_retries", 2)
+
+    session_id = request.cookies.get("session_id")
+
+    if not session_id or session_id not in session_store:
+        raise HTTPException(status_code=400, detail="Session not found")
+
+    session_data = session_store[session_id]
+    cb_api_client = session_data.get("cb_api_client")
+
+    if not cb_api_client:
+        raise HTTPException(status_code=400, detail="Missing session data")
+
+    try:
+        tracker_id = int(tracker_id)
+        item_count = int(item_count)
+        max_workers = int(max_workers) if max_workers else None
+        max_retries = int(max_retries)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="tracker_id, item_count, max_workers and max_retries must be numbers")
+
+    if not 0 < item_count <= MAX_BULK_LOAD_ITEMS:
+        raise HTTPException(status_code=400, detail=f"item_count must be between 1 and {MAX_BULK_LOAD_ITEMS}")
+    if max_workers is not None and not 0 < max_workers <= MAX_BULK_LOAD_WORKERS:
+        raise HTTPException(status_code=400, detail=f"max_workers must be between 1 and {MAX_BULK_LOAD_WORKERS}")
+    if not 0 <= max_retries <= MAX_BULK_LOAD_RETRIES:
+        raise HTTPException(status_code=400, detail=f"max_retries must be between 0 and {MAX_BULK_LOAD_RETRIES}")
+
+    try:
+        generator = BatchItemGeneration(cb_api_client, tracker_id, None, item_count,
+                                        max_workers=max_workers, max_retries=max_retries)
+        job = job_manager.submit("bulk_load", session_id,
+                                 lambda job: run_with_job(generator, job, tags=[("tracker", tracker_id)]))
+        return {"status": "queued", "message": "Bulk load started", "job_id": job.id}
+
+    except Exception as e:
+        logger.exception("Exception occurred: " + str(e))
+        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    session_id = request.cookies.get("session_id")
+
+    if not session_id or session_id not in session_store:
+        raise HTTPException(status_code=400, detail="Session not found")
+
+    job = job_manager.get(job_id)
+    if job is None or job.session_id != session_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job.to_dict()
+
+
+# Connection pool usage of the session's shared Codebeamer client. The clients of every
+# server and user are reported on /metrics.
+@app.get("/api/client_pool_stats")
+async def get_client_pool_stats(request: Request):
+    session_id = request.cookies.get("session_id")
+
+    if not session_id or session_id not in session_store:
+        raise HTTPException(status_code=400, detail="Session not found")
+
+    cb_api_client = session_store[session_id].get("cb_api_client")
+
+    if not cb_api_client:
+        raise HTTPException(status_code=400, detail="Codebeamer client not found")
+
+    return cb_client_registry.stats(cb_api_client)
+
+
+# How late the event loop wakes up from a short sleep. Anything well above zero means
+# something is blocking the loop.
+EVENT_LOOP_LAG_INTERVAL_SECONDS = 0.5
+
+
+async def measure_event_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time() + EVENT_LOOP_LAG_INTERVAL_SECONDS
+        await asyncio.sleep(EVENT_LOOP_LAG_INTERVAL_SECONDS)
+        metrics.event_loop_lag.set(max(0.0, loop.time() - scheduled))
+
+
+@app.on_event("startup")
+async def start_event_loop_lag_monitor():
+    app.state.event_loop_lag_task = asyncio.create_task(measure_event_loop_lag())
+
+
+# Cache, pool and job stats that are kept by their owners, read on every scrape.
+# Each stat becomes one gauge, e.g. codebeamer_metadata_cache_hits{server="..."}
+def collect_component_stats():
+    collected = []
+
+    def labels_for(label_name, label):
+        if isinstance(label_name, tuple):
+            return dict(zip(label_name, label))
+        return {label_name: label}
+
+    # label_name can be a tuple of names, the labels are then tuples of the same length
+    def add(prefix, help_text, label_name, stats_by_label, keys):
+        for key in keys:
+            samples = [(labels_for(label_name, label), stats[key]) for label, stats in stats_by_label.items()
+                       if key in stats]
+            collected.append((prefix + "_" + key, help_text + ": " + key.replace("_", " "), samples))
+
+    add("response_cache", "Tracker list response cache", "cache", {"responses": response_cache.stats()},
+        ("hits", "misses", "invalidations", "entries", "hit_rate"))
+    add("codebeamer_metadata_cache", "Tracker schema cache", "server", MetadataCache.all_stats(),
+        ("hits", "misses", "expirations", "entries", "hit_rate"))
+    add("codebeamer_rate_limiter", "Codebeamer rate limiter", "server", AdaptiveRateLimiter.all_stats(),
+        ("rate_per_second", "requests", "throttles", "retries"))
+    # Every user on a server has its own client, so the server alone doesn't identify one
+    add("codebeamer_client", "Shared Codebeamer client", ("server", "user"),
+        {(client["url"], client["user"]): client for client in cb_client_registry.stats()["clients"]},
+        ("sessions", "pool_size", "in_flight", "peak_in_flight", "saturation", "pool_full_discards"))
+
+    gpt_cache_stats = GPTAPIClient.cache_stats()
+    if gpt_cache_stats is not None:
+        add("gpt_response_cache", "GPT response cache", "cache", {"prompts": gpt_cache_stats}, tuple(gpt_cache_stats))
+
+    add("log_records", "Log records not written", "logger", {"demo_generator": logging_stats()},
+        ("sampled_out", "queue_full_drops"))
+
+    collected.append(("jobs", "Known jobs per state",
+                      [({"state": state}, count) for state, count in job_manager.state_counts().items()]))
+    return collected
+
+
+metrics.registry.add_collector(collect_component_stats)
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
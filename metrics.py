@@ -0,0 +1,220 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from structured_logging import get_logger
+
+logger = get_logger("metrics")
+
+
+# Minimal Prometheus client: counters, gauges and histograms with labels, rendered in the
+# text exposition format. Kept in-house so the app doesn't need prometheus_client.
+class Metric:
+    TYPE = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label_name, "")) for label_name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [self.name + format_labels(zip(self.label_names, key)) + " " + format_value(value)]
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    TYPE = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    TYPE = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[key] = entry
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][index] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def _render_value(self, key, entry):
+        labels = list(zip(self.label_names, key))
+        lines = []
+        for bound, count in zip(self.buckets, entry["counts"]):
+            lines.append(self.name + "_bucket" + format_labels(labels + [("le", format_value(bound))]) + " " + str(count))
+        lines.append(self.name + "_bucket" + format_labels(labels + [("le", "+Inf")]) + " " + str(entry["count"]))
+        lines.append(self.name + "_sum" + format_labels(labels) + " " + format_value(entry["sum"]))
+        lines.append(self.name + "_count" + format_labels(labels) + " " + str(entry["count"]))
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    # A collector is called on every scrape and returns gauges as
+    # [(name, help_text, [(labels_dict, value), ...]), ...], e.g. for cache stats that live elsewhere
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                logger.exception("Metrics collector failed: " + str(e))
+                continue
+            for name, help_text, samples in collected:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in samples:
+                    lines.append(name + format_labels(sorted(labels.items())) + " " + format_value(value))
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+
+def format_labels(labels):
+    labels = list(labels)
+    if not labels:
+        return ""
+    escaped = [name + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for name, value in labels]
+    return "{" + ",".join(escaped) + "}"
+
+
+def format_value(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+registry = MetricsRegistry()
+
+# FastAPI routes
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests", ("method", "route", "status"))
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("method", "route"))
+event_loop_lag = registry.gauge(
+    "event_loop_lag_seconds", "How late the event loop woke up from its last scheduled sleep")
+
+# Codebeamer REST operations, observed per attempt so retries are visible
+codebeamer_request_duration = registry.histogram(
+    "codebeamer_request_duration_seconds", "Time spent in Codebeamer API calls", ("operation", "outcome"))
+codebeamer_requests_in_flight = registry.gauge(
+    "codebeamer_requests_in_flight", "Codebeamer API calls currently running", ("operation",))
+codebeamer_errors = registry.counter(
+    "codebeamer_errors_total", "Failed Codebeamer API calls by HTTP status", ("operation", "status"))
+
+# Azure OpenAI prompts
+gpt_request_duration = registry.histogram(
+    "gpt_request_duration_seconds", "Time spent waiting for Azure OpenAI completions", ("prompt_type", "outcome"))
+gpt_requests_in_flight = registry.gauge(
+    "gpt_requests_in_flight", "Azure OpenAI requests currently running", ("prompt_type",))
+gpt_errors = registry.counter(
+    "gpt_errors_total", "Failed Azure OpenAI requests", ("prompt_type",))
+gpt_tokens = registry.counter(
+    "gpt_tokens_total", "Azure OpenAI tokens used, from the completion usage", ("prompt_type", "kind"))
+gpt_cache_hits = registry.counter(
+    "gpt_cache_hits_total", "Prompts answered from the GPT response cache", ("prompt_type",))
+
+
+# Times the block into a histogram and tracks it in an in-flight gauge. outcome is "error" if
+# the block raised; the caller can also set it through the yielded dict.
+@contextmanager
+def track(histogram, in_flight, **labels):
+    in_flight_labels = {name: labels[name] for name in in_flight.label_names if name in labels}
+    in_flight.inc(**in_flight_labels)
+    observation = {"outcome": "ok"}
+    start_time = time.perf_counter()
+    try:
+        yield observation
+    except BaseException:
+        observation["outcome"] = "error"
+        raise
+    finally:
+        in_flight.dec(**in_flight_labels)
+        histogram_labels = dict(labels)
+        if "outcome" in histogram.label_names:
+            histogram_labels["outcome"] = observation["outcome"]
+        if "status" in histogram.label_names:
+            histogram_labels["status"] = observation.get("status", "")
+        histogram.observe(time.perf_counter() - start_time, **histogram_labels)
+
+
+# Token usage as reported in the "usage" object of a completion response
+def record_gpt_usage(prompt_type, usage):
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            gpt_tokens.inc(usage[kind], prompt_type=prompt_type, kind=kind.replace("_tokens", ""))
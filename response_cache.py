@@ -0,0 +1,109 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+# Short-lived, per-session cache for read endpoint responses.
+#
+# Entries are keyed by session and request (e.g. ("tracker_items", 123)) and carry an ETag
+# computed from the body, so clients can revalidate with If-None-Match. Each entry is tagged
+# with what it was built from (e.g. ("tracker", 123)); jobs that change a tracker invalidate
+# its tag for every session, since sessions can share a Codebeamer server.
+#
+# Every invalidation bumps a generation counter. A read takes generation() before it starts and
+# passes it to set(), which refuses to store the body if one of its tags was invalidated since,
+# so a list fetched while a job was changing the tracker can't be cached after the job's cleanup.
+class ResponseCache:
+    DEFAULT_TTL_SECONDS = 60
+    MAX_ENTRIES = 2000
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._generation = 0
+        self._tag_generations = {}
+
+    # Returns (body, etag) or None
+    def get(self, session_id, key):
+        with self._lock:
+            entry = self._entries.get((session_id, key))
+            if entry is None or time.monotonic() >= entry["expires_at"]:
+                if entry is not None:
+                    del self._entries[(session_id, key)]
+                self._misses += 1
+                return None
+            self._entries.move_to_end((session_id, key))
+            self._hits += 1
+            return entry["body"], entry["etag"]
+
+    # Current generation, to be taken before reading the data that will be passed to set()
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    # Stores a JSON-serialisable body and returns its ETag. The body isn't stored if any of its
+    # tags was invalidated after the given generation.
+    def set(self, session_id, key, body, tags=(), generation=None):
+        etag = self.make_etag(body)
+        with self._lock:
+            if generation is not None and any(self._tag_generations.get(tag, 0) > generation for tag in tags):
+                return etag
+            self._entries[(session_id, key)] = {
+                "body": body,
+                "etag": etag,
+                "tags": set(tags),
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+            self._entries.move_to_end((session_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    # Drops every session's entries carrying any of the tags
+    def invalidate(self, *tags):
+        tags = set(tags)
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                self._tag_generations[tag] = self._generation
+            stale = [cache_key for cache_key, entry in self._entries.items() if entry["tags"] & tags]
+            for cache_key in stale:
+                del self._entries[cache_key]
+            self._invalidations += len(stale)
+
+    # Drops one session's entries, e.g. after it connected to another server
+    def drop_session(self, session_id):
+        with self._lock:
+            for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == session_id]:
+                del self._entries[cache_key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations,
+                "entries": len(self._entries),
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
+
+    @staticmethod
+    def make_etag(body):
+        encoded = json.dumps(body, sort_keys=True, separators=(",", ":")).encode()
+        return '"' + hashlib.sha256(encoded).hexdigest()[:32] + '"'
+
+    # If-None-Match may list several ETags, or "*"
+    @staticmethod
+    def etag_matches(if_none_match, etag):
+        if not if_none_match:
+            return False
+        candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or ("W/" + etag) in candidates
@@ -1,20 +1,84 @@
-import concurrent.futures
+import random
+import time
 
 from openapi_client import TrackerItem
+from openapi_client.exceptions import ApiException
+from urllib3.exceptions import HTTPError
+
+from services.throughput_stats import ThroughputStats
+from structured_logging import PER_ITEM, get_logger, log_context
+from tracing import ContextThreadPoolExecutor
+
+logger = get_logger("batch_item_generation")
 
 
 class BatchItemGeneration:
-    def __init__(self, cb_client, tracker_id, tracker_name, count):
+    RETRY_BACKOFF_SECONDS = 0.5
+
+    def __init__(self, cb_client, tracker_id, tracker_name, count, max_workers=None, max_retries=2, job=None):
         self.cb_client = cb_client
         self.tracker_id = tracker_id
         self.tracker_name = tracker_name
         self.count = count
+        self.max_workers = max_workers or cb_client.max_workers
+        self.max_retries = max_retries
+        self.job = job
+        self.stats = None
 
     def generate(self):
-        print("Generating batch items...")
-        # Use ThreadPoolExecutor for parallelism
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            executor.map(self.create_tracker_item, range(1, self.count))
+        with log_context(tracker_id=self.tracker_id):
+            return self.generate_items()
+
+    def generate_items(self):
+        logger.info("Generating " + str(self.count) + " batch items...")
+        if self.tracker_name is None:
+            self.tracker_name = self.cb_client.get_tracker(self.tracker_id).name
+
+        self.stats = ThroughputStats()
+
+        # Bounded pool so the load is predictable, and consume the results so nothing is dropped
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for _ in executor.map(self.create_with_retries, range(1, self.count + 1)):
+                pass
+
+        summary = self.stats.summary()
+        logger.info("Created " + str(summary["succeeded"]) + " of " + str(self.count) + " items in " +
+                    str(summary["seconds"]) + "s (" + str(summary["items_per_second"]) + " items/s, p50 " +
+                    str(summary["latency_ms"]["p50"]) + "ms, p95 " + str(summary["latency_ms"]["p95"]) + "ms, p99 " +
+                    str(summary["latency_ms"]["p99"]) + "ms, " + str(summary["failed"]) + " failed)")
+        return summary
+
+    # Latency covers the whole item, including failed attempts and backoff sleeps
+    def create_with_retries(self, i):
+        start_time = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.create_tracker_item(i)
+            except Exception as e:
+                if attempt < self.max_retries and self.is_retryable(e):
+                    self.stats.record_retry()
+                    time.sleep(self.RETRY_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5))
+                    continue
+
+                self.stats.record_failure(time.perf_counter() - start_time, e)
+                logger.warning("Failed to create " + self.tracker_name + " " + str(i) + ": " + str(e), extra=PER_ITEM)
+                if self.job is not None:
+                    self.job.add_failed(self.tracker_name + " " + str(i) + ": " + str(e))
+                return
+
+            self.stats.record_success(time.perf_counter() - start_time)
+            if self.job is not None:
+                self.job.add_created()
+            return
+
+    # Creating an item isn't idempotent, so only retry when the server failed (5xx) or the
+    # connection dropped. 4xx won't succeed on a retry, and 429 is already retried by the
+    # rate limiter, so once it gets here the server is still throttling.
+    @staticmethod
+    def is_retryable(exception):
+        if isinstance(exception, ApiException):
+            return exception.status is not None and 500 <= exception.status < 600
+        return isinstance(exception, (HTTPError, ConnectionError))
 
     def create_tracker_item(self, i):
         tracker_item = TrackerItem()
@@ -23,4 +87,3 @@ class BatchItemGeneration:
 
         self.cb_client.tracker_item_api_instance.create_tracker_item(
             self.tracker_id, tracker_item)
-        print("Added " + tracker_item.name)
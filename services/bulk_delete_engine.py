@@ -0,0 +1,138 @@
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from structured_logging import PER_ITEM, get_logger
+from tracing import ContextThreadPoolExecutor
+
+logger = get_logger("bulk_delete")
+
+
+# Delete progress for one tracker
+class TrackerSweep:
+    def __init__(self, tracker_id):
+        self.tracker_id = tracker_id
+        self.page = 1
+        self.in_flight = 0
+        self.submitted_ids = set()
+        self.new_in_pass = 0
+        self.relist_when_drained = False
+
+
+# Deletes every item of a set of trackers using one shared, bounded pool.
+#
+# Listings and deletions for all trackers run on the same pool. As soon as a page has been
+# listed its items are queued for deletion and the next page is listed while those deletions
+# run. Deleting shifts later items towards the front, so each pass can miss a few. When a pass
+# reaches the end, the tracker is listed again from page 1 once its deletions have drained.
+# A tracker leaves the sweep after a full pass that finds nothing new. Items that fail to
+# delete are not retried, so a sweep always ends. A tracker whose listing fails leaves the sweep
+# too, and the run raises once the other trackers are done so the job doesn't report success.
+class BulkDeleteEngine:
+    PAGE_SIZE = 500
+
+    def __init__(self, cb_client, tracker_ids, max_workers=None, job=None):
+        self.cb_client = cb_client
+        self.tracker_ids = list(tracker_ids)
+        self.max_workers = max_workers or cb_client.max_workers
+        self.job = job
+        self.deleted_count = 0
+        self.failed_count = 0
+        self.listing_errors = {}
+        self._pending = {}
+
+    def run(self):
+        start_time = time.time()
+
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for tracker_id in self.tracker_ids:
+                self._submit_listing(executor, TrackerSweep(tracker_id))
+
+            # Only this thread touches the sweep state, the pool just runs the API calls
+            while self._pending:
+                done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task, sweep, item = self._pending.pop(future)
+                    if task == "list":
+                        self._on_listed(executor, sweep, future)
+                    else:
+                        self._on_deleted(executor, sweep, item, future)
+
+        elapsed = time.time() - start_time
+        throughput = self.deleted_count / elapsed if elapsed > 0 else 0.0
+        logger.info("Deleted " + str(self.deleted_count) + " items from " + str(len(self.tracker_ids)) + " trackers in " +
+                    f"{elapsed:.1f}s ({throughput:.1f} items/s, {self.failed_count} failed)")
+
+        if self.listing_errors:
+            raise Exception("Failed to list items of tracker(s) " +
+                            ", ".join(str(tracker_id) + ": " + error for tracker_id, error in self.listing_errors.items()) +
+                            " (" + str(self.deleted_count) + " items deleted)")
+
+        return {
+            "deleted": self.deleted_count,
+            "failed": self.failed_count,
+            "seconds": round(elapsed, 3),
+            "items_per_second": round(throughput, 2),
+        }
+
+    def _submit_listing(self, executor, sweep):
+        future = executor.submit(self._list_page, sweep.tracker_id, sweep.page)
+        self._pending[future] = ("list", sweep, None)
+
+    def _list_page(self, tracker_id, page):
+        return self.cb_client.tracker_api_instance.get_items_by_tracker(tracker_id, page, self.PAGE_SIZE).item_refs
+
+    def _delete_item(self, item):
+        self.cb_client.tracker_item_api_instance.delete_tracker_item(item.id)
+
+    def _on_listed(self, executor, sweep, future):
+        try:
+            item_refs = future.result() or []
+        except Exception as e:
+            logger.warning("Failed to list items: " + str(e), extra={"tracker_id": sweep.tracker_id})
+            self.listing_errors[sweep.tracker_id] = str(e)
+            return
+
+        if item_refs:
+            for item in item_refs:
+                if item.id in sweep.submitted_ids:
+                    continue
+                sweep.submitted_ids.add(item.id)
+                sweep.new_in_pass += 1
+                sweep.in_flight += 1
+                self._pending[executor.submit(self._delete_item, item)] = ("delete", sweep, item)
+
+            # List the next page while this page's deletions are running
+            sweep.page += 1
+            self._submit_listing(executor, sweep)
+            return
+
+        # Reached the end of a pass
+        if sweep.new_in_pass == 0 and sweep.in_flight == 0:
+            logger.info("Finished deleting items", extra={"tracker_id": sweep.tracker_id})
+            return
+
+        sweep.relist_when_drained = True
+        self._relist_if_drained(executor, sweep)
+
+    def _on_deleted(self, executor, sweep, item, future):
+        sweep.in_flight -= 1
+        try:
+            future.result()
+            self.deleted_count += 1
+            if self.job is not None:
+                self.job.add_deleted()
+        except Exception as e:
+            logger.warning("Failed to delete " + str(item.name) + ": " + str(e),
+                           extra={"tracker_id": sweep.tracker_id, **PER_ITEM})
+            self.failed_count += 1
+            if self.job is not None:
+                self.job.add_failed(str(item.name) + ": " + str(e))
+
+        self._relist_if_drained(executor, sweep)
+
+    def _relist_if_drained(self, executor, sweep):
+        if sweep.relist_when_drained and sweep.in_flight == 0:
+            sweep.relist_when_drained = False
+            sweep.page = 1
+            sweep.new_in_pass = 0
+            self._submit_listing(executor, sweep)
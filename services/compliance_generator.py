@@ -15,7 +15,7 @@ class ComplianceGenerator:
         gpt_client = GPTAPIClient()
 
         # Get upstream tracker information from id
-        tracker = self.cb_client.tracker_api_instance.get_tracker(self.tracker_id)
+        tracker = self.cb_client.get_tracker(self.tracker_id)
         tracker_name = tracker.name
         tracker_type = tracker.type.name
 
@@ -26,10 +26,9 @@ class ComplianceGenerator:
         parser = ItemsParser(response)
         new_items = parser.get_items()
 
-        # Add each item to tracker
-        for item in new_items:
-            self.cb_client.create_generic_tracker_item(
-                tracker_name, item.name, item.description, None)
+        # Add all items to tracker
+        item_requests = [(self.tracker_id, item.name, item.description, None) for item in new_items]
+        self.cb_client.create_generic_tracker_items(item_requests)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,14 @@
+import copy
 import random
 
-from openapi_client import OptionChoiceField, UpdateTrackerItemField, UserChoiceField, TrackerItemChoiceField
+from openapi_client import IntegerField, OptionChoiceField, UpdateTrackerItemField, UserChoiceField
 
 from apis.cb_client.cb_api_client import CBApiClient
 from apis.cb_client.utils import Utils
+from structured_logging import PER_ITEM, get_logger
+from tracing import ContextThreadPoolExecutor
+
+logger = get_logger("field_updater")
 
 
 # This class updates fields on tracker items to random values
@@ -11,38 +16,89 @@ class FieldUpdater:
     _fields_to_ignore = {"ID", "Summary", "Tracker", "Submitted at", "Submitted by", "Parent", "Children",
                          "Description", "Description Format", "Attachments", "Status"}
 
-    def __init__(self, cb_client: CBApiClient, tracker_id, item_id_list):
+    def __init__(self, cb_client: CBApiClient, tracker_id, item_id_list, max_workers=None, project_id=None):
         self.cb_client = cb_client
         self.tracker_id = tracker_id
-        self.item_id_list = item_id_list
+        self.item_id_list = list(item_id_list)
+        self.max_workers = max_workers or cb_client.max_workers
+        self.project_id = project_id
+        self.member_ids = []
 
     def generate(self):
-        print("Updating metadata...")
-
-        for item_id in self.item_id_list:
-            update_field_item = UpdateTrackerItemField()
-            update_field_item.field_values = []
-            tracker_item_fields = self.cb_client.tracker_item_api_instance.get_tracker_item_fields(item_id)
-
-            for field in tracker_item_fields.editable_fields:
-                if field.type == "ChoiceFieldValue" and not self._fields_to_ignore.__contains__(field.name):
-                    detailed_field = self.cb_client.tracker_api_instance.get_tracker_field(self.tracker_id, field.field_id)
-                    if isinstance(detailed_field, OptionChoiceField):
-                        # TODO: Add code to make sure we arent changing the type of folder/information items
-                        valid_options = Utils.get_valid_ids(detailed_field.options)
-                        if valid_options:
-                            new_choice_id = Utils.get_random_option_from_list(valid_options)
-                            setattr(field, "values", [new_choice_id])
-                            update_field_item.field_values.append(field)
-                    elif isinstance(detailed_field, UserChoiceField):
-                        user = Utils.get_abstract_reference_user(random.choice(self.cb_client.member_ids))
-                        setattr(field, "values", user)
-                        update_field_item.field_values.append(field)
-                elif field.type == "IntegerFieldValue" and not self._fields_to_ignore.__contains__(field.name):
-                    setattr(field, "value", random.randint(1, 10))
-                    update_field_item.field_values.append(field)
-
-            self.cb_client.tracker_item_api_instance.update_custom_field_tracker_item(item_id, update_field_item)
+        logger.info("Updating metadata...")
+        if not self.item_id_list:
+            return {"updated": 0, "failed": {}}
+
+        # Resolve the field schema once for the whole tracker instead of once per item
+        plan = self.build_plan()
+
+        def update_item(item_id):
+            try:
+                tracker_item_fields = self.cb_client.tracker_item_api_instance.get_tracker_item_fields(item_id)
+                self.cb_client.tracker_item_api_instance.update_custom_field_tracker_item(
+                    item_id, self.build_update(plan, tracker_item_fields.editable_fields))
+                return None
+            except Exception as e:
+                logger.warning("Failed to update metadata of " + str(item_id) + ": " + str(e), extra=PER_ITEM)
+                return str(e)
+
+        failed = {}
+        with ContextThreadPoolExecutor(max_workers=min(self.max_workers, len(self.item_id_list))) as executor:
+            for item_id, error in zip(self.item_id_list, executor.map(update_item, self.item_id_list)):
+                if error is not None:
+                    failed[item_id] = error
+
+        logger.info("Updated metadata of " + str(len(self.item_id_list) - len(failed)) + " of " +
+                    str(len(self.item_id_list)) + " items")
+        return {"updated": len(self.item_id_list) - len(failed), "failed": failed}
+
+    # Works out which fields to randomise and what values they accept from the tracker's (cached)
+    # field definitions, keyed by field id
+    def build_plan(self):
+        plan = {}
+        if self.project_id is None:
+            self.project_id = self.cb_client.get_tracker(self.tracker_id).project.id
+        self.member_ids = self.cb_client.get_project_member_ids(self.project_id)
+
+        for field_ref in self.cb_client.get_tracker_fields(self.tracker_id):
+            if field_ref.name in self._fields_to_ignore:
+                continue
+
+            detailed_field = self.cb_client.get_tracker_field(self.tracker_id, field_ref.id)
+            if isinstance(detailed_field, OptionChoiceField):
+                # TODO: Add code to make sure we arent changing the type of folder/information items
+                valid_options = Utils.get_valid_ids(detailed_field.options)
+                if valid_options:
+                    plan[field_ref.id] = {"kind": "option", "valid_ids": valid_options}
+            elif isinstance(detailed_field, UserChoiceField) and self.member_ids:
+                plan[field_ref.id] = {"kind": "user"}
+            elif isinstance(detailed_field, IntegerField):
+                plan[field_ref.id] = {"kind": "integer"}
+
+        return plan
+
+    # Builds a fresh set of random field values for one item. The item's own editable field values
+    # are copied so the concrete value types are kept and the fetched objects aren't modified.
+    def build_update(self, plan, editable_fields):
+        update_field_item = UpdateTrackerItemField()
+        update_field_item.field_values = []
+
+        for field in editable_fields:
+            entry = plan.get(field.field_id)
+            if entry is None or field.name in self._fields_to_ignore:
+                continue
+
+            field_value = copy.deepcopy(field)
+            if entry["kind"] == "option":
+                setattr(field_value, "values", [Utils.get_random_option_from_list(entry["valid_ids"])])
+            elif entry["kind"] == "user":
+                setattr(field_value, "values", Utils.get_abstract_reference_user(random.choice(self.member_ids)))
+            else:
+                setattr(field_value, "value", random.randint(1, 10))
+
+            update_field_item.field_values.append(field_value)
+
+        return update_field_item
 
 
 if __name__ == "__main__":
@@ -53,7 +109,7 @@ if __name__ == "__main__":
     cb_api_client.populate_project_data(project_id)
 
     # Create an instance of DeleteAllProjectData
-    generator = FieldUpdater(cb_api_client, tracker_id, [12164])
+    generator = FieldUpdater(cb_api_client, tracker_id, [12164], project_id=project_id)
 
     # Call the generate method
     generator.generate()
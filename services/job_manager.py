@@ -0,0 +1,156 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from structured_logging import get_logger, log_context
+from tracing import ContextThreadPoolExecutor
+
+logger = get_logger("jobs")
+
+
+# Tracks the state, progress counters and timings of one background job
+class Job:
+    # Only the first few per-item errors are kept so a failing bulk run can't grow the job unbounded
+    MAX_ITEM_ERRORS = 20
+
+    def __init__(self, job_type, session_id):
+        self.id = str(uuid.uuid4())
+        self.type = job_type
+        self.session_id = session_id
+        self.state = "queued"
+        self.items_created = 0
+        self.items_deleted = 0
+        self.items_failed = 0
+        self.item_errors = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    # Counters are updated from the services' worker threads, so they go through the lock
+    def add_created(self, count=1):
+        with self._lock:
+            self.items_created += count
+
+    def add_deleted(self, count=1):
+        with self._lock:
+            self.items_deleted += count
+
+    def add_failed(self, message):
+        with self._lock:
+            self.items_failed += 1
+            if len(self.item_errors) < self.MAX_ITEM_ERRORS:
+                self.item_errors.append(message)
+
+    # Callback for CBApiClient.create_generic_tracker_items
+    def record_create_result(self, result):
+        if result.succeeded:
+            self.add_created()
+        else:
+            self.add_failed(str(result.item_request[1]) + ": " + str(result.error))
+
+    # True when the job tried to write items and every one of them failed
+    @property
+    def all_items_failed(self):
+        with self._lock:
+            return self.items_failed > 0 and self.items_created == 0 and self.items_deleted == 0
+
+    @property
+    def finished(self):
+        return self.state in ("succeeded", "failed")
+
+    def to_dict(self):
+        with self._lock:
+            now = time.time()
+            queued_seconds = (self.started_at or now) - self.created_at
+            run_seconds = None
+            items_per_second = None
+            if self.started_at is not None:
+                run_seconds = (self.finished_at or now) - self.started_at
+                if run_seconds > 0:
+                    items_per_second = round((self.items_created + self.items_deleted) / run_seconds, 2)
+
+            return {
+                "id": self.id,
+                "type": self.type,
+                "state": self.state,
+                "progress": {
+                    "items_created": self.items_created,
+                    "items_deleted": self.items_deleted,
+                    "items_failed": self.items_failed,
+                    "items_per_second": items_per_second,
+                },
+                "timings": {
+                    "created_at": self.created_at,
+                    "started_at": self.started_at,
+                    "finished_at": self.finished_at,
+                    "queued_seconds": round(queued_seconds, 3),
+                    "run_seconds": round(run_seconds, 3) if run_seconds is not None else None,
+                },
+                "result": self.result,
+                "error": self.error,
+                "item_errors": list(self.item_errors),
+            }
+
+
+# Runs long-running generate/delete services on an in-process worker pool so the
+# FastAPI event loop is never blocked by a GPT or Codebeamer round-trip
+class JobManager:
+    def __init__(self, max_workers=8, max_finished_jobs=500):
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ContextThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Queues func(job) and returns the job immediately, whatever func returns becomes the job result
+    def submit(self, job_type, session_id, func):
+        job = Job(job_type, session_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune_finished_jobs()
+
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # Number of known jobs per state
+    def state_counts(self):
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job.state] = counts.get(job.state, 0) + 1
+            return counts
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job, func):
+        job.state = "running"
+        job.started_at = time.time()
+        try:
+            with log_context(session_id=job.session_id, job_id=job.id):
+                job.result = func(job)
+            if job.all_items_failed:
+                job.error = "All " + str(job.items_failed) + " items failed"
+                job.state = "failed"
+            else:
+                job.state = "succeeded"
+        except Exception as e:
+            logger.exception("Exception occurred in job " + job.id + ": " + str(e),
+                             extra={"session_id": job.session_id, "job_id": job.id})
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    # Keeps finished jobs around for polling, but drops the oldest ones once over the limit
+    def _prune_finished_jobs(self):
+        finished_ids = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished_ids[:max(0, len(finished_ids) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
@@ -18,15 +18,15 @@ class RelatedComplianceDataGenerator:
 
     def generate(self):
         # Initialize gpt client
-        gpt_client = GPTAPIClient(1)
+        gpt_client = GPTAPIClient()
 
         # Get upstream tracker information from id
-        upstream_tracker = self.cb_client.tracker_api_instance.get_tracker(self.compliance_tracker_id)
+        upstream_tracker = self.cb_client.get_tracker(self.compliance_tracker_id)
         upstream_tracker_name = upstream_tracker.name
         upstream_tracker_type = upstream_tracker.type.name
 
         # Get downstream tracker information from id
-        downstream_tracker = self.cb_client.tracker_api_instance.get_tracker(self.downstream_tracker_id)
+        downstream_tracker = self.cb_client.get_tracker(self.downstream_tracker_id)
         downstream_tracker_name = downstream_tracker.name
         downstream_tracker_type = downstream_tracker.type.name
 
@@ -48,15 +48,10 @@ class RelatedComplianceDataGenerator:
         parser = ItemsParser(response)
         new_items = parser.get_items()
 
-        response_items = []
-
-        # Add each item to downstream tracker
-        for item in new_items:
-            upstream_reference = Utils.get_abstract_reference_tracker_item(item.parent_id)
-
-            new_added_item = self.cb_client.create_generic_tracker_item(
-                downstream_tracker_name, item.name, item.description, upstream_reference)
-            response_items.append(new_added_item)
+        # Add all items to downstream tracker, linked to their compliance item
+        item_requests = [(self.downstream_tracker_id, item.name, item.description,
+                          Utils.get_abstract_reference_tracker_item(item.parent_id)) for item in new_items]
+        self.cb_client.create_generic_tracker_items(item_requests)
 
 
 if __name__ == "__main__":
@@ -1,37 +1,140 @@
 import random
-from collections import defaultdict
+from collections import defaultdict, deque
 
 from apis.cb_client.utils import Utils
+from structured_logging import PER_ITEM, get_logger
+from tracing import ContextThreadPoolExecutor
+
+logger = get_logger("status_updater")
 
 
 class StatusUpdater:
-    def __init__(self, cb_client, tracker_id, item_id_list):
+    # target_distribution maps status names to weights, e.g. {"Accepted": 60, "Implemented": 40}.
+    # Without one, each item moves to a random status one transition away (as before).
+    def __init__(self, cb_client, tracker_id, item_id_list, target_distribution=None, max_workers=None):
         self.cb_client = cb_client
         self.tracker_id = tracker_id
-        self.item_id_list = item_id_list
+        self.item_id_list = list(item_id_list)
+        self.target_distribution = target_distribution
+        self.max_workers = max_workers or cb_client.max_workers
         self.transition_map = defaultdict(set)
+        self.status_names = {}
+        self._paths_from = {}
 
     def generate(self):
-        print("Updating statuses...")
+        logger.info("Updating statuses...")
+        if not self.item_id_list:
+            return {"updated": 0, "failed": {}}
+
         # Gets all the possible transitions from the current item status (new)
-        possible_transitions = self.cb_client.tracker_api_instance.get_tracker_transitions(self.tracker_id)
+        possible_transitions = self.cb_client.get_tracker_transitions(self.tracker_id)
         for transition in possible_transitions:
             from_id = transition.from_status.id
             to_id = transition.to_status.id
+            self.status_names[from_id] = transition.from_status.name
+            self.status_names[to_id] = transition.to_status.name
 
             if transition.to_status.name != "Rejected":
                 self.transition_map[from_id].add(to_id)
                 self.transition_map[from_id].add(from_id)
 
-        # Moves each item to a random status that's valid from it's current status
-        for item_id in self.item_id_list:
-            tracker_item = self.cb_client.tracker_item_api_instance.get_tracker_item(item_id)
-            current_status = tracker_item.status.id
-            next_transition = self.transition_map.get(current_status, set())
-            next_transition = list(next_transition)
-
-            tracker_item.status = Utils.get_abstract_reference_choice(random.choice(next_transition))
-            try:
-                self.cb_client.tracker_item_api_instance.update_tracker_item(item_id, tracker_item)
-            except Exception as e:
-                print(e)
+        failed = {}
+        with ContextThreadPoolExecutor(max_workers=min(self.max_workers, len(self.item_id_list))) as executor:
+            # An item that can't be read is reported as failed, the others are still moved
+            tracker_items = []
+            for item_id, (tracker_item, error) in zip(self.item_id_list, executor.map(self.get_item, self.item_id_list)):
+                if error is not None:
+                    failed[item_id] = error
+                else:
+                    tracker_items.append(tracker_item)
+
+            if self.target_distribution:
+                paths = self.plan_distribution(tracker_items)
+            else:
+                paths = [self.plan_random_hop(tracker_item) for tracker_item in tracker_items]
+
+            # Items move in parallel, but the hops of one item are applied in order
+            errors = list(executor.map(self.move_item, tracker_items, paths))
+
+        failed.update({tracker_item.id: error for tracker_item, error in zip(tracker_items, errors) if error is not None})
+        hop_count = sum(len(path) for path in paths)
+        logger.info("Moved " + str(len(self.item_id_list) - len(failed)) + " of " + str(len(self.item_id_list)) +
+                    " items using " + str(hop_count) + " transitions")
+        return {"updated": len(self.item_id_list) - len(failed), "failed": failed}
+
+    # Moves each item to a random status that's valid from it's current status
+    def plan_random_hop(self, tracker_item):
+        current_status = tracker_item.status.id
+        next_transition = list(self.transition_map.get(current_status, set()))
+        if not next_transition:
+            return []
+
+        next_status = random.choice(next_transition)
+        return [] if next_status == current_status else [next_status]
+
+    # Assigns each item a target status so the tracker ends up as close to the requested
+    # distribution as the workflow allows, preferring targets with the largest shortfall
+    def plan_distribution(self, tracker_items):
+        remaining = self.get_target_counts(len(tracker_items))
+        order = list(range(len(tracker_items)))
+        random.shuffle(order)
+
+        paths = [[] for _ in tracker_items]
+        for index in order:
+            reachable = self.get_paths_from(tracker_items[index].status.id)
+            candidates = [status_id for status_id, count in remaining.items() if count > 0 and status_id in reachable]
+            if not candidates:
+                continue
+
+            target = max(candidates, key=lambda status_id: (remaining[status_id], -len(reachable[status_id])))
+            remaining[target] -= 1
+            paths[index] = reachable[target]
+
+        return paths
+
+    # Turns the weighted distribution into item counts per status id (largest remainder rounding)
+    def get_target_counts(self, item_count):
+        ids_by_name = {name.lower(): status_id for status_id, name in self.status_names.items()}
+        weights = {}
+        for name, weight in self.target_distribution.items():
+            status_id = ids_by_name.get(name.lower())
+            if status_id is None:
+                logger.warning("Ignoring unknown status " + name)
+            elif weight > 0:
+                weights[status_id] = weights.get(status_id, 0) + weight
+
+        return Utils.distribute_counts(weights, item_count)
+
+    # Shortest transition path from a status to every status reachable from it (breadth first search)
+    def get_paths_from(self, start_status):
+        if start_status not in self._paths_from:
+            paths = {start_status: []}
+            queue = deque([start_status])
+            while queue:
+                status_id = queue.popleft()
+                for next_status in self.transition_map.get(status_id, set()):
+                    if next_status not in paths:
+                        paths[next_status] = paths[status_id] + [next_status]
+                        queue.append(next_status)
+            self._paths_from[start_status] = paths
+        return self._paths_from[start_status]
+
+    # Returns (tracker item, None), or (None, error) if it can't be read
+    def get_item(self, item_id):
+        try:
+            return self.cb_client.tracker_item_api_instance.get_tracker_item(item_id), None
+        except Exception as e:
+            logger.warning("Failed to read item " + str(item_id) + ": " + str(e), extra=PER_ITEM)
+            return None, str(e)
+
+    def move_item(self, tracker_item, path):
+        try:
+            for status_id in path:
+                tracker_item.status = Utils.get_abstract_reference_choice(status_id)
+                updated_item = self.cb_client.tracker_item_api_instance.update_tracker_item(tracker_item.id, tracker_item)
+                if updated_item is not None:
+                    tracker_item = updated_item
+            return None
+        except Exception as e:
+            logger.warning("Failed to move " + str(tracker_item.name) + ": " + str(e), extra=PER_ITEM)
+            return str(e)
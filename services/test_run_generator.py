@@ -4,50 +4,99 @@ from openapi_client import CreateTestRunRequest, UpdateTestCaseRunRequest, Updat
 
 from apis.cb_client.cb_api_client import CBApiClient
 from apis.cb_client.utils import Utils
+from structured_logging import PER_ITEM, get_logger
+from tracing import ContextThreadPoolExecutor
 
+logger = get_logger("test_run_generator")
 
-class TestRunGenerator:
 
-    def __init__(self, cb_client, test_case_tracker_id, test_case_items, test_run_tracker_id, passed_count, failed_count, blocked_count):
+class TestRunGenerator:
+    # Results are pushed in chunks of this many test cases so big suites don't time out
+    RESULT_CHUNK_SIZE = 200
+
+    # run_count creates several runs (e.g. for trend charts), shard_size splits each run into
+    # runs of at most that many test cases, and result_distribution ({"PASSED": 70, "FAILED": 20, ...})
+    # gives per-run result weights instead of the fixed passed/failed/blocked counts
+    def __init__(self, cb_client, test_case_tracker_id, test_case_items, test_run_tracker_id, passed_count, failed_count, blocked_count,
+                 run_count=1, shard_size=None, result_distribution=None, result_chunk_size=RESULT_CHUNK_SIZE,
+                 max_workers=None):
         self.test_case_tracker_id = test_case_tracker_id
         self.test_run_tracker_id = test_run_tracker_id
         self.passed_count = passed_count
         self.failed_count = failed_count
         self.blocked_count = blocked_count
         self.cb_client = cb_client
-        self.test_case_items = test_case_items
+        self.test_case_items = list(test_case_items)
+        self.run_count = run_count
+        self.shard_size = shard_size
+        self.result_distribution = result_distribution
+        self.result_chunk_size = result_chunk_size
+        self.max_workers = max_workers or cb_client.max_workers
 
     def generate(self):
-        test_run = CreateTestRunRequest()
-        test_run.test_case_ids = self.test_case_items
-        test_run.test_case_refs = self.test_case_items
-        test_run.run_only_accepted_test_cases = False
-
-        test_run = self.cb_client.test_run_api_instance.create_test_run_for_test_case(
-            self.test_run_tracker_id, test_run)
-
-        result_distribution = ["PASSED"] * self.passed_count + ["FAILED"] * self.failed_count + ["BLOCKED"] * self.blocked_count
+        shard_size = self.shard_size or len(self.test_case_items) or 1
+        runs = []
+        for _ in range(self.run_count):
+            results = self.get_results()
+            for start in range(0, len(self.test_case_items), shard_size):
+                runs.append((self.test_case_items[start:start + shard_size], results[start:start + shard_size]))
+
+        logger.info("Creating " + str(len(runs)) + " test runs...")
+
+        with ContextThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(runs)))) as executor:
+            errors = [error for error in executor.map(self.create_test_run, runs) if error is not None]
+
+        logger.info("Created " + str(len(runs) - len(errors)) + " of " + str(len(runs)) + " test runs")
+        if errors and len(errors) == len(runs):
+            raise Exception("Failed to create test runs: " + errors[0])
+        return {"created": len(runs) - len(errors), "failed": errors}
+
+    # One result (or None for no result) per test case, shuffled so every run looks different
+    def get_results(self):
+        if self.result_distribution:
+            counts = Utils.distribute_counts(self.result_distribution, len(self.test_case_items))
+            result_distribution = [result for result, count in counts.items() for _ in range(count)]
+        else:
+            result_distribution = ["PASSED"] * self.passed_count + ["FAILED"] * self.failed_count + ["BLOCKED"] * self.blocked_count
 
         random.shuffle(result_distribution)
 
-        result_list = []
-        for test_case, result in zip(self.test_case_items, result_distribution):
-
-            update_result_request = UpdateTestCaseRunRequest(
-                result=result,
-                testCaseReference=Utils.create_tracker_item_reference_object(test_case.id)
-            )
-
-            result_list.append(update_result_request)
-
-        update_result = UpdateTestRunRequest(
-            parent_result_propagation=True,
-            update_request_models=result_list
-        )
-
-        print("Creating test run...")
-
-        self.cb_client.test_run_api_instance.update_test_run_result(test_run.id, update_result)
+        result_distribution = result_distribution[:len(self.test_case_items)]
+        return result_distribution + [None] * (len(self.test_case_items) - len(result_distribution))
+
+    def create_test_run(self, run):
+        test_case_items, results = run
+        try:
+            test_run = CreateTestRunRequest()
+            test_run.test_case_ids = test_case_items
+            test_run.test_case_refs = test_case_items
+            test_run.run_only_accepted_test_cases = False
+
+            test_run = self.cb_client.test_run_api_instance.create_test_run_for_test_case(
+                self.test_run_tracker_id, test_run)
+
+            result_list = []
+            for test_case, result in zip(test_case_items, results):
+                if result is None:
+                    continue
+
+                update_result_request = UpdateTestCaseRunRequest(
+                    result=result,
+                    testCaseReference=Utils.create_tracker_item_reference_object(test_case.id)
+                )
+
+                result_list.append(update_result_request)
+
+            for start in range(0, len(result_list), self.result_chunk_size):
+                update_result = UpdateTestRunRequest(
+                    parent_result_propagation=True,
+                    update_request_models=result_list[start:start + self.result_chunk_size]
+                )
+                self.cb_client.test_run_api_instance.update_test_run_result(test_run.id, update_result)
+            return None
+        except Exception as e:
+            logger.warning("Failed to create test run: " + str(e), extra=PER_ITEM)
+            return str(e)
 
 
 if __name__ == "__main__":
@@ -1,75 +1,144 @@
 from openapi_client import AbstractFieldValue
 
 from apis.gpt_client.gpt_api_client import GPTAPIClient
-from apis.gpt_client.gpt_response_data import TestStepParser
+from apis.gpt_client.gpt_response_data import BatchTestStepParser, TestStepParser
+from structured_logging import PER_ITEM, get_logger
+from tracing import ContextThreadPoolExecutor
+
+logger = get_logger("test_step_generator")
 
 
 class TestStepGenerator:
-    def __init__(self, cb_api_client, product, test_case_tracker_id, test_case_item_ids):
+    def __init__(self, cb_api_client, product, test_case_tracker_id, test_case_item_ids, batch_size=10,
+                 gpt_parallelism=4, max_workers=None):
         self.cb_api_client = cb_api_client
         self.product = product
         self.test_case_tracker_id = test_case_tracker_id
-        self.test_case_item_ids = test_case_item_ids
+        self.test_case_item_ids = list(test_case_item_ids)
+        self.batch_size = batch_size
+        self.gpt_parallelism = gpt_parallelism
+        self.max_workers = max_workers or cb_api_client.max_workers
+        self.gpt_client = GPTAPIClient()
+        self.test_step_field_id = None
+        self.action_field_id = None
+        self.expected_result_id = None
 
     def generate(self):
-        for test_case_id in self.test_case_item_ids:
-            tracker_item = self.cb_api_client.tracker_item_api_instance.get_tracker_item(test_case_id)
-
-            gpt_client = GPTAPIClient()
-
-            # Gets test steps from gpt
-            response = gpt_client.get_test_steps(self.product, tracker_item.name)
-
-            parser = TestStepParser(response)
-            new_steps = parser.get_items()
-
-            test_step_field_id = None
-            action_field_id = None
-            expected_result_id = None
-            tracker_fields = self.cb_api_client.tracker_api_instance.get_tracker_fields(self.test_case_tracker_id)
-            for field in tracker_fields:
-                if field.name == "Test Steps":
-                    test_step_field_id = field.id
-
-            test_step_fields = self.cb_api_client.tracker_api_instance.get_tracker_field(self.test_case_tracker_id, test_step_field_id)
-            for column in getattr(test_step_fields, "columns"):
-                if column.name == "Action":
-                    action_field_id = column.id
-                if column.name == "Expected result":
-                    expected_result_id = column.id
-
-            existing_test_steps = None
-            for field in tracker_item.custom_fields:
-                if field.field_id == test_step_field_id:
-                    existing_test_steps = field
-
-            test_steps = None
-            if existing_test_steps is not None:
-                test_steps = existing_test_steps
-            else:
-                test_steps = AbstractFieldValue(
-                    field_id=test_step_field_id,
-                    type="TableFieldValue"
-                )
-                tracker_item.custom_fields.append(test_steps)
-
-            setattr(test_steps, "values", [])
-
-            for step in new_steps:
-                action = AbstractFieldValue(
-                    field_id=action_field_id,
-                    type="WikiTextFieldValue"
-                )
-                setattr(action, "value", step.action)
-
-                expected_result = AbstractFieldValue(
-                    field_id=expected_result_id,
-                    type="WikiTextFieldValue"
-                )
-                setattr(expected_result, "value", step.expected_result)
-
-                current_values = getattr(test_steps, "values")  # Retrieve the current list
-                current_values.append([action, expected_result])  # Append new pair
-                setattr(test_steps, "values", current_values)
-
-            self.cb_api_client.tracker_item_api_instance.update_tracker_item(test_case_id, tracker_item)
+        if not self.test_case_item_ids:
+            return {"updated": 0, "failed": {}}
+
+        # Resolve the "Test Steps" table and its column ids once for the tracker
+        test_step_field = self.cb_api_client.get_tracker_field_by_name(self.test_case_tracker_id, "Test Steps")
+        if test_step_field is None:
+            raise Exception("Tracker " + str(self.test_case_tracker_id) + " has no Test Steps field")
+
+        self.test_step_field_id = test_step_field.id
+        for column in getattr(test_step_field, "columns"):
+            if column.name == "Action":
+                self.action_field_id = column.id
+            if column.name == "Expected result":
+                self.expected_result_id = column.id
+
+        failed = {}
+        with ContextThreadPoolExecutor(max_workers=min(self.max_workers, len(self.test_case_item_ids))) as executor:
+            # A test case that can't be read is reported as failed, the others still get steps
+            tracker_items = []
+            for item_id, (tracker_item, error) in zip(self.test_case_item_ids,
+                                                      executor.map(self.get_item, self.test_case_item_ids)):
+                if error is not None:
+                    failed[item_id] = error
+                else:
+                    tracker_items.append(tracker_item)
+
+            # Gets test steps from gpt, several test cases per prompt
+            batches = [tracker_items[i:i + self.batch_size] for i in range(0, len(tracker_items), self.batch_size)]
+            steps_by_test_case = {}
+            with ContextThreadPoolExecutor(max_workers=max(1, min(self.gpt_parallelism, len(batches)))) as gpt_executor:
+                for batch_steps, batch_errors in gpt_executor.map(self.get_batch_steps, batches):
+                    steps_by_test_case.update(batch_steps)
+                    failed.update(batch_errors)
+
+            # Only test cases GPT returned steps for are updated
+            tracker_items = [tracker_item for tracker_item in tracker_items if str(tracker_item.id) in steps_by_test_case]
+            errors = list(executor.map(
+                lambda tracker_item: self.update_test_steps(tracker_item, steps_by_test_case[str(tracker_item.id)]),
+                tracker_items))
+
+        failed.update({tracker_item.id: error for tracker_item, error in zip(tracker_items, errors) if error is not None})
+        updated = len(self.test_case_item_ids) - len(failed)
+        logger.info("Added test steps to " + str(updated) + " of " + str(len(self.test_case_item_ids)) + " test cases")
+        return {"updated": updated, "failed": failed}
+
+    # Returns (tracker item, None), or (None, error) if it can't be read
+    def get_item(self, item_id):
+        try:
+            return self.cb_api_client.tracker_item_api_instance.get_tracker_item(item_id), None
+        except Exception as e:
+            logger.warning("Failed to read test case " + str(item_id) + ": " + str(e), extra=PER_ITEM)
+            return None, str(e)
+
+    # Returns the steps per test case id, and the errors of the test cases no steps could be generated for.
+    # If the batch prompt fails, every test case in it falls back to its own prompt.
+    def get_batch_steps(self, tracker_items):
+        steps_by_test_case = {}
+        try:
+            response = self.gpt_client.get_test_steps_batch(self.product, {item.id: item.name for item in tracker_items})
+            steps_by_test_case = BatchTestStepParser(response).get_items()
+        except Exception as e:
+            logger.warning("Failed to get test steps for a batch of " + str(len(tracker_items)) + " test cases: " + str(e))
+
+        # Fall back to a single prompt for any test case GPT left out of the batch
+        errors = {}
+        for tracker_item in tracker_items:
+            if not steps_by_test_case.get(str(tracker_item.id)):
+                try:
+                    response = self.gpt_client.get_test_steps(self.product, tracker_item.name)
+                    steps_by_test_case[str(tracker_item.id)] = TestStepParser(response).get_items()
+                except Exception as e:
+                    logger.warning("Failed to get test steps for " + str(tracker_item.name) + ": " + str(e), extra=PER_ITEM)
+                    steps_by_test_case.pop(str(tracker_item.id), None)
+                    errors[tracker_item.id] = str(e)
+
+        return steps_by_test_case, errors
+
+    def update_test_steps(self, tracker_item, new_steps):
+        existing_test_steps = None
+        for field in tracker_item.custom_fields:
+            if field.field_id == self.test_step_field_id:
+                existing_test_steps = field
+
+        test_steps = None
+        if existing_test_steps is not None:
+            test_steps = existing_test_steps
+        else:
+            test_steps = AbstractFieldValue(
+                field_id=self.test_step_field_id,
+                type="TableFieldValue"
+            )
+            tracker_item.custom_fields.append(test_steps)
+
+        setattr(test_steps, "values", [])
+
+        for step in new_steps:
+            action = AbstractFieldValue(
+                field_id=self.action_field_id,
+                type="WikiTextFieldValue"
+            )
+            setattr(action, "value", step.action)
+
+            expected_result = AbstractFieldValue(
+                field_id=self.expected_result_id,
+                type="WikiTextFieldValue"
+            )
+            setattr(expected_result, "value", step.expected_result)
+
+            current_values = getattr(test_steps, "values")  # Retrieve the current list
+            current_values.append([action, expected_result])  # Append new pair
+            setattr(test_steps, "values", current_values)
+
+        try:
+            self.cb_api_client.tracker_item_api_instance.update_tracker_item(tracker_item.id, tracker_item)
+            return None
+        except Exception as e:
+            logger.warning("Failed to add test steps to " + str(tracker_item.name) + ": " + str(e), extra=PER_ITEM)
+            return str(e)
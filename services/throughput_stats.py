@@ -0,0 +1,61 @@
+import math
+import threading
+import time
+
+
+# Collects per-call latencies and failures from worker threads and summarises them as
+# items/second and latency percentiles
+class ThroughputStats:
+    MAX_ERRORS = 20
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.errors = []
+        self._latencies = []
+        self._lock = threading.Lock()
+
+    def record_success(self, latency_seconds):
+        with self._lock:
+            self.succeeded += 1
+            self._latencies.append(latency_seconds)
+
+    def record_failure(self, latency_seconds, error):
+        with self._lock:
+            self.failed += 1
+            self._latencies.append(latency_seconds)
+            if len(self.errors) < self.MAX_ERRORS:
+                self.errors.append(str(error))
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def summary(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self.start_time
+            latencies = sorted(self._latencies)
+            return {
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "retries": self.retries,
+                "seconds": round(elapsed, 3),
+                "items_per_second": round(self.succeeded / elapsed, 2) if elapsed > 0 else 0.0,
+                "latency_ms": {
+                    "p50": self.percentile_ms(latencies, 50),
+                    "p95": self.percentile_ms(latencies, 95),
+                    "p99": self.percentile_ms(latencies, 99),
+                    "max": self.percentile_ms(latencies, 100),
+                },
+                "errors": list(self.errors),
+            }
+
+    # Nearest-rank percentile of an already sorted list of seconds, in milliseconds
+    @staticmethod
+    def percentile_ms(sorted_latencies, percent):
+        if not sorted_latencies:
+            return None
+        rank = max(1, math.ceil(percent / 100 * len(sorted_latencies)))
+        return round(sorted_latencies[rank - 1] * 1000, 1)
@@ -1,6 +1,7 @@
 from apis.cb_client.cb_api_client import CBApiClient
 from apis.gpt_client.gpt_api_client import GPTAPIClient
-from apis.gpt_client.gpt_response_data import ItemsParser
+from apis.gpt_client.gpt_response_data import ItemsParser, StreamingItemsParser
+from tracing import ContextThreadPoolExecutor
 
 
 class TopLevelItemGenerator:
@@ -11,42 +12,72 @@ class TopLevelItemGenerator:
         "both": "The requirements should be a mix of hardware and software requirements."
     }
 
-    def __init__(self, cb_client, product, tracker_id, item_count, requirement_type, additional_rules):
+    def __init__(self, cb_client, product, tracker_id, item_count, requirement_type, additional_rules, job=None,
+                 bypass_cache=False, stream=False):
         self.product = product
         self.tracker_id = tracker_id
         self.item_count = item_count
         self.cb_client = cb_client
         self.requirement_type_prompt_text = self.requirement_types_mapping.get(requirement_type)
         self.additional_rules = additional_rules
+        self.job = job
+        self.bypass_cache = bypass_cache
+        self.stream = stream
 
     def generate(self):
         # Initialize gpt client
-        gpt_client = GPTAPIClient()
+        gpt_client = GPTAPIClient(bypass_cache=self.bypass_cache)
 
         # Get tracker information from id
-        tracker = self.cb_client.tracker_api_instance.get_tracker(self.tracker_id)
+        tracker = self.cb_client.get_tracker(self.tracker_id)
         tracker_name = tracker.name
         tracker_type = tracker.type.name
 
         # test_step_updater = TestStepUpdater(self.cb_client, gpt_client)
 
+        if self.stream:
+            self.generate_streaming(gpt_client, tracker_name, tracker_type)
+            return
+
         # Get new top level items from GPT
         response = gpt_client.get_top_level_items(self.product, tracker_name, tracker_type, self.item_count, self.requirement_type_prompt_text, self.additional_rules)
 
         parser = ItemsParser(response)
         new_items = parser.get_items()
 
-        response_items = []
-
-        # Add each item to tracker
-        for item in new_items:
-            new_added_item = self.cb_client.create_generic_tracker_item(
-                self.tracker_id, item.name, item.description, None)
-            response_items.append(new_added_item)
+        # Add all items to tracker
+        item_requests = [(self.tracker_id, item.name, item.description, None) for item in new_items]
+        response_items = self.cb_client.create_generic_tracker_items(item_requests, on_result=self.on_item_result)
 
         # if tracker_type == "Testcase":
         #     test_step_updater.update_test_steps(self.product, self.tracker_id, response_items)
 
+    # Creates each item in Codebeamer as soon as its YAML entry has been streamed from GPT,
+    # so item creation overlaps with token generation instead of waiting for the whole response
+    def generate_streaming(self, gpt_client, tracker_name, tracker_type):
+        parser = StreamingItemsParser()
+        futures = []
+
+        with ContextThreadPoolExecutor(max_workers=self.cb_client.max_workers) as executor:
+            for text in gpt_client.stream_top_level_items(self.product, tracker_name, tracker_type, self.item_count,
+                                                          self.requirement_type_prompt_text, self.additional_rules):
+                for item in parser.feed(text):
+                    futures.append(executor.submit(self.create_item, item))
+
+            for item in parser.close():
+                futures.append(executor.submit(self.create_item, item))
+
+            return [future.result() for future in futures]
+
+    def create_item(self, item):
+        result = self.cb_client.try_create_generic_tracker_item((self.tracker_id, item.name, item.description, None))
+        self.on_item_result(result)
+        return result
+
+    def on_item_result(self, result):
+        if self.job is not None:
+            self.job.record_create_result(result)
+
 
 if __name__ == "__main__":
     # Input data
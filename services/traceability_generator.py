@@ -2,11 +2,19 @@ from apis.cb_client.cb_api_client import CBApiClient
 from apis.cb_client.utils import Utils
 from apis.gpt_client.gpt_api_client import GPTAPIClient
 from apis.gpt_client.gpt_response_data import ItemsParser
+from structured_logging import PER_ITEM, get_logger
+from tracing import ContextThreadPoolExecutor
+
+logger = get_logger("traceability_generator")
 
 
 class TraceabilityGenerator:
 
-    def __init__(self, cb_client, product, upstream_tracker_id, upstream_items, downstream_tracker_id, downstream_count, additional_rules):
+    # Rough token cost of one generated downstream item (name + realistic description)
+    ESTIMATED_TOKENS_PER_ITEM = 250
+
+    def __init__(self, cb_client, product, upstream_tracker_id, upstream_items, downstream_tracker_id, downstream_count, additional_rules, job=None,
+                 bypass_cache=False, chunk_token_budget=3000, gpt_parallelism=4):
         self.product = product
         self.upstream_tracker_id = upstream_tracker_id
         self.upstream_items = upstream_items
@@ -14,41 +22,111 @@ class TraceabilityGenerator:
         self.cb_client = cb_client
         self.downstream_count = downstream_count
         self.additional_rules = additional_rules
+        self.job = job
+        self.bypass_cache = bypass_cache
+        self.chunk_token_budget = chunk_token_budget
+        self.gpt_parallelism = gpt_parallelism
 
     def generate(self):
         # Initialize gpt client
-        gpt_client = GPTAPIClient()
+        gpt_client = GPTAPIClient(bypass_cache=self.bypass_cache)
 
         # Get upstream tracker information from id
-        upstream_tracker = self.cb_client.tracker_api_instance.get_tracker(self.upstream_tracker_id)
+        upstream_tracker = self.cb_client.get_tracker(self.upstream_tracker_id)
         upstream_tracker_name = upstream_tracker.name
         upstream_tracker_type = upstream_tracker.type.name
 
         # Get downstream tracker information from id
-        downstream_tracker = self.cb_client.tracker_api_instance.get_tracker(self.downstream_tracker_id)
+        downstream_tracker = self.cb_client.get_tracker(self.downstream_tracker_id)
         downstream_tracker_name = downstream_tracker.name
         downstream_tracker_type = downstream_tracker.type.name
 
+        # One upstream item's downstream items have to fit in a single completion, or the response gets cut off
+        max_downstream_count = self.max_downstream_count()
+        if int(self.downstream_count or 1) > max_downstream_count:
+            raise Exception("Cannot generate " + str(self.downstream_count) + " downstream items per upstream item, " +
+                            "at most " + str(max_downstream_count) + " fit in one GPT response")
+
         # Create map of upstream items ids and names
         id_name_map = {item['id']: item['name'] for item in self.upstream_items}
 
-        # Get new downstream items from GPT
-        response = gpt_client.get_downstream_items(id_name_map, self.product, downstream_tracker_name,
-                                                   upstream_tracker_name,
-                                                   upstream_tracker_type, downstream_tracker_type,
-                                                   self.downstream_count, self.additional_rules)
-        parser = ItemsParser(response)
-        new_items = parser.get_items()
+        # Split the upstream items into chunks that fit in one completion and send them to GPT concurrently
+        chunks = self.chunk_id_name_map(id_name_map)
+        logger.info("Sending " + str(len(id_name_map)) + " upstream items to GPT in " + str(len(chunks)) + " chunks...")
+
+        # A chunk that fails or can't be parsed only loses its own upstream items
+        def get_chunk_items(chunk):
+            try:
+                response = gpt_client.get_downstream_items(chunk, self.product, downstream_tracker_name,
+                                                           upstream_tracker_name,
+                                                           upstream_tracker_type, downstream_tracker_type,
+                                                           self.downstream_count, self.additional_rules)
+                return self.match_parent_ids(chunk, ItemsParser(response).get_items())
+            except Exception as e:
+                logger.warning("Failed to get downstream items for " + str(len(chunk)) + " upstream items: " + str(e))
+                if self.job is not None:
+                    self.job.add_failed("Upstream items " + ", ".join(str(item_id) for item_id in chunk) + ": " + str(e))
+                return None
+
+        new_items = []
+        failed_chunks = 0
+        with ContextThreadPoolExecutor(max_workers=max(1, min(self.gpt_parallelism, len(chunks)))) as executor:
+            for chunk_items in executor.map(get_chunk_items, chunks):
+                if chunk_items is None:
+                    failed_chunks += 1
+                else:
+                    new_items.extend(chunk_items)
+
+        if chunks and failed_chunks == len(chunks):
+            raise Exception("GPT failed for all " + str(len(chunks)) + " chunks of upstream items")
+
+        # Add all items to downstream tracker, linked to their upstream item
+        item_requests = [(self.downstream_tracker_id, item.name, item.description,
+                          Utils.get_abstract_reference_tracker_item(item.parent_id)) for item in new_items]
+        self.cb_client.create_generic_tracker_items(item_requests, on_result=self.on_item_result)
+
+    def on_item_result(self, result):
+        if self.job is not None:
+            self.job.record_create_result(result)
+
+    # Most downstream items per upstream item whose estimated output fits in one completion
+    def max_downstream_count(self):
+        return max(1, GPTAPIClient.MAX_TOKENS // self.ESTIMATED_TOKENS_PER_ITEM)
+
+    # Groups upstream items so each prompt's input plus its expected output stays within the token budget
+    def chunk_id_name_map(self, id_name_map):
+        output_tokens_per_upstream = max(1, int(self.downstream_count or 1)) * self.ESTIMATED_TOKENS_PER_ITEM
 
-        response_items = []
+        chunks = []
+        current_chunk = {}
+        current_tokens = 0
+        for item_id, name in id_name_map.items():
+            item_tokens = len(f"- id: {item_id}, name: {name}") // 4 + 1 + output_tokens_per_upstream
+            if current_chunk and current_tokens + item_tokens > self.chunk_token_budget:
+                chunks.append(current_chunk)
+                current_chunk = {}
+                current_tokens = 0
+            current_chunk[item_id] = name
+            current_tokens += item_tokens
 
-        # Add each item to downstream tracker
-        for item in new_items:
-            upstream_reference = Utils.get_abstract_reference_tracker_item(item.parent_id)
+        if current_chunk:
+            chunks.append(current_chunk)
+        return chunks
 
-            new_added_item = self.cb_client.create_generic_tracker_item(
-               self.downstream_tracker_id, item.name, item.description, upstream_reference)
-            response_items.append(new_added_item)
+    # GPT may echo ids back as strings, so map them onto the real upstream ids of the chunk
+    # and drop anything that doesn't belong to it
+    @staticmethod
+    def match_parent_ids(chunk, items):
+        ids_by_text = {str(item_id): item_id for item_id in chunk}
+        matched_items = []
+        for item in items:
+            parent_id = ids_by_text.get(str(item.parent_id))
+            if parent_id is None:
+                logger.warning("Skipping " + str(item.name) + ", unknown upstream id " + str(item.parent_id), extra=PER_ITEM)
+                continue
+            item.parent_id = parent_id
+            matched_items.append(item)
+        return matched_items
 
 
 if __name__ == "__main__":
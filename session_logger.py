@@ -2,22 +2,32 @@ import logging
 from datetime import datetime
 import anvil.server
 
+from structured_logging import attach_queue_handler, get_log_context
 
+
+# Adds the session id and user email to each record. They are read from the fields bound with
+# structured_logging.log_context(); Anvil and the session store are only asked when a record
+# is logged outside of a bound context.
 class SessionContextFilter(logging.Filter):
     def __init__(self, session_store):
         super().__init__()
         self.session_store = session_store
 
     def filter(self, record):
-        try:
-            session_id = anvil.server.get_session_id()
-            user_email = self.session_store.get(session_id, {}).get("user_email", "Unknown user")
-        except Exception:
-            session_id = "unknown"
-            user_email = "unknown"
+        context = get_log_context()
+        session_id = context.get("session_id")
+        user_email = context.get("user_email")
+
+        if session_id is None:
+            try:
+                session_id = anvil.server.get_session_id()
+                user_email = self.session_store.get(session_id, {}).get("user_email", "Unknown user")
+            except Exception:
+                session_id = "unknown"
+                user_email = "unknown"
 
         record.session_id = session_id
-        record.user_email = user_email
+        record.user_email = user_email or "Unknown user"
         return True
 
 
@@ -31,10 +41,11 @@ class SessionLogger:
             handler = logging.StreamHandler()
             formatter = logging.Formatter("[%(asctime)s][%(user_email)s][%(session_id)s] %(message)s")
             handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
+            # Written from a listener thread so callers never wait on stdout
+            queue_handler = attach_queue_handler(self.logger, handler)
 
-        # Add the dynamic filter
-        self.logger.addFilter(SessionContextFilter(self.session_store))
+            # The filter has to run in the calling thread, where the session is known
+            queue_handler.addFilter(SessionContextFilter(self.session_store))
 
     def info(self, message):
         self.logger.info(message)
@@ -0,0 +1,242 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# Keeps session metadata in this process. Fast, but not shared between uvicorn workers.
+class InMemorySessionBackend:
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            return None if record is None else (dict(record[0]), record[1], record[2])
+
+    def save(self, session_id, data, created_at, last_access):
+        with self._lock:
+            self._sessions[session_id] = (dict(data), created_at, last_access)
+
+    def touch(self, session_id, last_access):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is not None:
+                self._sessions[session_id] = (record[0], record[1], last_access)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def count(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def expired_ids(self, created_before):
+        with self._lock:
+            return [session_id for session_id, record in self._sessions.items() if record[1] < created_before]
+
+    def least_recently_used_ids(self, limit):
+        with self._lock:
+            records = sorted(self._sessions.items(), key=lambda entry: entry[1][2])
+            return [session_id for session_id, _ in records[:limit]]
+
+
+# Keeps session metadata in a SQLite file so several uvicorn workers on one pod can share it.
+# Only the metadata is shared: see SessionStore for the clients, which need sticky routing.
+class SQLiteSessionBackend:
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, data TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data, created_at, last_access FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return None if row is None else (json.loads(row[0]), row[1], row[2])
+
+    def save(self, session_id, data, created_at, last_access):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(data), created_at, last_access))
+
+    def touch(self, session_id, last_access):
+        with self._lock:
+            self._connection.execute("UPDATE sessions SET last_access = ? WHERE id = ?", (last_access, session_id))
+
+    def delete(self, session_id):
+        with self._lock:
+            self._connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def expired_ids(self, created_before):
+        with self._lock:
+            rows = self._connection.execute("SELECT id FROM sessions WHERE created_at < ?", (created_before,)).fetchall()
+        return [row[0] for row in rows]
+
+    def least_recently_used_ids(self, limit):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id FROM sessions ORDER BY last_access LIMIT ?", (limit,)).fetchall()
+        return [row[0] for row in rows]
+
+
+# Session store with expiry, a size cap and a pluggable backend.
+#
+# JSON-friendly metadata (url, product, project map, ...) lives in the backend. Live objects
+# such as the Codebeamer client can't be serialised, so they stay in this process. When a
+# session expires or is evicted, its client's pooled connections are closed.
+#
+# The client isn't rebuilt in other processes since that would mean storing the password in the
+# backend. With a shared backend, requests must be routed to the worker the session connected
+# through (sticky sessions on the session_id cookie); elsewhere the session has no client.
+class SessionStore:
+    LOCAL_KEYS = {"cb_api_client"}
+
+    # Last access is only written back once it is this old, so reads don't each cost a write
+    TOUCH_INTERVAL_SECONDS = 30
+
+    # release_client is called with a session's Codebeamer client once the session no longer uses it
+    def __init__(self, backend=None, ttl_seconds=1800, max_entries=5000, sweep_interval_seconds=60,
+                 release_client=None):
+        self.backend = backend or InMemorySessionBackend()
+        self.release_client = release_client or (lambda cb_api_client: cb_api_client.close())
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._local = {}
+        self._local_lock = threading.Lock()
+        self._next_sweep = time.time() + sweep_interval_seconds
+
+    # Picks the backend from SESSION_BACKEND ("memory" or "sqlite") and SESSION_DB_PATH
+    @classmethod
+    def from_env(cls, ttl_seconds, release_client=None):
+        if os.getenv("SESSION_BACKEND", "memory").lower() == "sqlite":
+            backend = SQLiteSessionBackend(os.getenv("SESSION_DB_PATH", "sessions.db"))
+        else:
+            backend = InMemorySessionBackend()
+        return cls(backend, ttl_seconds=ttl_seconds,
+                   max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "5000")), release_client=release_client)
+
+    def create(self, session_id):
+        now = time.time()
+        self._release_local(session_id)
+        self.backend.save(session_id, {}, now, now)
+        self._evict_over_capacity()
+
+    def update(self, session_id, **values):
+        record = self._load(session_id)
+        if record is None:
+            raise KeyError(session_id)
+
+        data, created_at, _ = record
+        replaced_clients = []
+        with self._local_lock:
+            local_data = self._local.setdefault(session_id, {})
+            for key, value in values.items():
+                if key in self.LOCAL_KEYS:
+                    # Every client handed to the store is released once, even if the same
+                    # shared client is set again
+                    previous_value = local_data.get(key)
+                    if key == "cb_api_client" and previous_value is not None:
+                        replaced_clients.append(previous_value)
+                    local_data[key] = value
+                else:
+                    data[key] = value
+        self.backend.save(session_id, data, created_at, time.time())
+
+        for cb_api_client in replaced_clients:
+            self.release_client(cb_api_client)
+
+    # Returns a snapshot of the session's data; changes must go through update()
+    def get(self, session_id, default=None):
+        record = self._load(session_id)
+        if record is None:
+            return default
+
+        data, created_at, last_access = record
+        now = time.time()
+        if now - last_access >= self.TOUCH_INTERVAL_SECONDS:
+            self.backend.touch(session_id, now)
+        data["created_at"] = created_at
+        with self._local_lock:
+            data.update(self._local.get(session_id, {}))
+        return data
+
+    def delete(self, session_id):
+        self.backend.delete(session_id)
+        self._release_local(session_id)
+
+    # "active", "expired" (it was just dropped for being too old) or "missing"
+    def get_state(self, session_id):
+        record = self.backend.load(session_id)
+        if record is None:
+            return "missing"
+        if time.time() - record[1] > self.ttl_seconds:
+            self.delete(session_id)
+            return "expired"
+        return "active"
+
+    def __contains__(self, session_id):
+        return session_id is not None and self._load(session_id) is not None
+
+    def __getitem__(self, session_id):
+        data = self.get(session_id)
+        if data is None:
+            raise KeyError(session_id)
+        return data
+
+    def maybe_sweep(self):
+        if time.time() >= self._next_sweep:
+            self.sweep()
+
+    # Removes expired sessions and trims the store back down to max_entries
+    def sweep(self):
+        self._next_sweep = time.time() + self.sweep_interval_seconds
+        expired_ids = self.backend.expired_ids(time.time() - self.ttl_seconds)
+        for session_id in expired_ids:
+            self.delete(session_id)
+
+        # With a shared backend another worker may have removed the session, so drop its local objects too
+        with self._local_lock:
+            orphaned_ids = list(self._local)
+        for session_id in orphaned_ids:
+            if self.backend.load(session_id) is None:
+                self._release_local(session_id)
+
+        self._evict_over_capacity()
+        return len(expired_ids)
+
+    def _load(self, session_id):
+        record = self.backend.load(session_id)
+        if record is None:
+            return None
+        if time.time() - record[1] > self.ttl_seconds:
+            self.delete(session_id)
+            return None
+        return record
+
+    def _evict_over_capacity(self):
+        overflow = self.backend.count() - self.max_entries
+        if overflow > 0:
+            for session_id in self.backend.least_recently_used_ids(overflow):
+                self.delete(session_id)
+
+    def _release_local(self, session_id):
+        with self._local_lock:
+            local_data = self._local.pop(session_id, {})
+
+        cb_api_client = local_data.get("cb_api_client")
+        if cb_api_client is not None:
+            self.release_client(cb_api_client)
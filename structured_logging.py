@@ -0,0 +1,177 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+
+# Non-blocking structured logging.
+#
+# Worker threads only put records on a bounded queue; one listener thread formats them and
+# writes them out, so dozens of threads creating or deleting items don't contend for stdout.
+# When the queue is full records are dropped and counted rather than blocking the caller.
+#
+# Context fields (session id, job id, tracker id) are bound with log_context() and carried in
+# a contextvar, so they follow requests into jobs and ContextThreadPoolExecutor workers and are
+# never looked up per record.
+#
+# Per-item messages pass extra=PER_ITEM and are sampled per level (LOG_SAMPLE_DEBUG,
+# LOG_SAMPLE_INFO, LOG_SAMPLE_WARNING, 0.0 - 1.0). Services log one summary line per batch.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+SAMPLE_RATES = {
+    logging.DEBUG: float(os.getenv("LOG_SAMPLE_DEBUG", "0.01")),
+    logging.INFO: float(os.getenv("LOG_SAMPLE_INFO", "0.1")),
+    logging.WARNING: float(os.getenv("LOG_SAMPLE_WARNING", "1.0")),
+}
+CONTEXT_FIELDS = ("session_id", "job_id", "tracker_id")
+
+PER_ITEM = {"per_item": True}
+
+_log_context = contextvars.ContextVar("log_context", default={})
+
+
+# Binds fields to every record logged inside the block, in this thread and in tasks it submits
+@contextmanager
+def log_context(**fields):
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def get_log_context():
+    return _log_context.get()
+
+
+# Copies the bound context fields onto the record. Runs in the logging thread, before the
+# record is queued, since the listener thread has its own context.
+class ContextFieldsFilter(logging.Filter):
+    def filter(self, record):
+        context = _log_context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+# Keeps the first and then every 1/rate-th per-item record of each level; other records always pass.
+# Counting instead of random sampling keeps the output even across threads.
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_rates=None):
+        super().__init__()
+        self.sample_rates = dict(SAMPLE_RATES if sample_rates is None else sample_rates)
+        self.dropped = 0
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, "per_item", False):
+            return True
+
+        rate = self.sample_rates.get(record.levelno, 1.0)
+        if rate >= 1.0:
+            return True
+
+        with self._lock:
+            count = self._counters.get(record.levelno, 0)
+            self._counters[record.levelno] = count + 1
+            keep = rate > 0 and count % max(1, round(1 / rate)) == 0
+            if not keep:
+                self.dropped += 1
+        return keep
+
+
+# QueueHandler that drops records instead of blocking or raising when the queue is full
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+# Routes a logger through a queue to the given handler, which runs on its own listener thread.
+# Returns the queue handler so callers can add filters to it.
+def attach_queue_handler(logger, handler, queue_size=LOG_QUEUE_SIZE):
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFieldsFilter())
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return queue_handler
+
+
+ROOT_LOGGER_NAME = "demo_generator"
+
+_setup_lock = threading.Lock()
+_sampling_filter = None
+_queue_handler = None
+
+
+def setup_logging():
+    global _sampling_filter, _queue_handler
+    with _setup_lock:
+        if _queue_handler is not None:
+            return
+
+        logger = logging.getLogger(ROOT_LOGGER_NAME)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+
+        handler = logging.StreamHandler()
+        if LOG_FORMAT == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter(
+                "[%(asctime)s][%(levelname)s][%(session_id)s][%(job_id)s][%(tracker_id)s] %(message)s"))
+
+        _queue_handler = attach_queue_handler(logger, handler)
+        _sampling_filter = SamplingFilter()
+        _queue_handler.addFilter(_sampling_filter)
+
+
+# Logger under the shared, queue-backed "demo_generator" logger, e.g. get_logger("bulk_delete")
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(ROOT_LOGGER_NAME + "." + name)
+
+
+def logging_stats():
+    return {
+        "sampled_out": _sampling_filter.dropped if _sampling_filter is not None else 0,
+        "queue_full_drops": _queue_handler.dropped if _queue_handler is not None else 0,
+    }
@@ -0,0 +1,43 @@
+import pytest
+
+from services.throughput_stats import ThroughputStats
+
+
+def test_percentile_uses_nearest_rank():
+    latencies = [i / 1000 for i in range(1, 101)]
+    assert ThroughputStats.percentile_ms(latencies, 50) == 50.0
+    assert ThroughputStats.percentile_ms(latencies, 99) == 99.0
+    assert ThroughputStats.percentile_ms(latencies, 100) == 100.0
+    assert ThroughputStats.percentile_ms([0.2], 1) == 200.0
+
+
+def test_percentile_without_samples():
+    assert ThroughputStats.percentile_ms([], 50) is None
+
+
+def test_summary_counts_failures_and_caps_errors():
+    stats = ThroughputStats()
+    stats.record_success(0.01)
+    for i in range(ThroughputStats.MAX_ERRORS + 1):
+        stats.record_failure(0.02, "error " + str(i))
+    stats.record_retry()
+
+    summary = stats.summary()
+    assert (summary["succeeded"], summary["failed"], summary["retries"]) == (1, ThroughputStats.MAX_ERRORS + 1, 1)
+    assert len(summary["errors"]) == ThroughputStats.MAX_ERRORS
+    assert summary["latency_ms"]["max"] == 20.0
+
+
+def test_only_server_and_connection_errors_are_retried():
+    pytest.importorskip("openapi_client")
+    from openapi_client.exceptions import ApiException
+    from urllib3.exceptions import ProtocolError
+
+    from services.batch_item_generation import BatchItemGeneration
+
+    assert BatchItemGeneration.is_retryable(ApiException(status=503))
+    assert not BatchItemGeneration.is_retryable(ApiException(status=400))
+    assert not BatchItemGeneration.is_retryable(ApiException(status=None))
+    assert BatchItemGeneration.is_retryable(ProtocolError("connection reset"))
+    assert BatchItemGeneration.is_retryable(ConnectionError())
+    assert not BatchItemGeneration.is_retryable(ValueError())
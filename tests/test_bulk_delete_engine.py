@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from services.bulk_delete_engine import BulkDeleteEngine
+
+
+class ItemRef:
+    def __init__(self, item_id):
+        self.id = item_id
+        self.name = "Item " + str(item_id)
+
+
+class Page:
+    def __init__(self, item_refs):
+        self.item_refs = item_refs
+
+
+# In-memory tracker: deleting an item shifts later items to earlier pages, like Codebeamer does
+class FakeTrackers:
+    def __init__(self, items_by_tracker, failing_ids=(), failing_trackers=()):
+        self.items_by_tracker = {tracker_id: list(item_ids) for tracker_id, item_ids in items_by_tracker.items()}
+        self.failing_ids = set(failing_ids)
+        self.failing_trackers = set(failing_trackers)
+        self.delete_calls = []
+        self._lock = threading.Lock()
+
+    def get_items_by_tracker(self, tracker_id, page, page_size):
+        if tracker_id in self.failing_trackers:
+            raise Exception("403 Forbidden")
+        with self._lock:
+            item_ids = self.items_by_tracker[tracker_id][(page - 1) * page_size:page * page_size]
+        return Page([ItemRef(item_id) for item_id in item_ids])
+
+    def delete_tracker_item(self, item_id):
+        with self._lock:
+            self.delete_calls.append(item_id)
+            if item_id in self.failing_ids:
+                raise Exception("500 Internal Server Error")
+            for item_ids in self.items_by_tracker.values():
+                if item_id in item_ids:
+                    item_ids.remove(item_id)
+
+
+class FakeClient:
+    max_workers = 4
+
+    def __init__(self, trackers):
+        self.tracker_api_instance = trackers
+        self.tracker_item_api_instance = trackers
+
+
+@pytest.fixture(autouse=True)
+def small_pages(monkeypatch):
+    monkeypatch.setattr(BulkDeleteEngine, "PAGE_SIZE", 3)
+
+
+def test_relists_until_every_tracker_is_empty():
+    trackers = FakeTrackers({1: range(10), 2: range(100, 107)})
+
+    result = BulkDeleteEngine(FakeClient(trackers), [1, 2]).run()
+
+    assert (result["deleted"], result["failed"]) == (17, 0)
+    assert trackers.items_by_tracker == {1: [], 2: []}
+    assert sorted(trackers.delete_calls) == sorted(list(range(10)) + list(range(100, 107)))
+
+
+def test_failed_items_are_not_retried():
+    trackers = FakeTrackers({1: range(5)}, failing_ids={2})
+
+    result = BulkDeleteEngine(FakeClient(trackers), [1]).run()
+
+    assert (result["deleted"], result["failed"]) == (4, 1)
+    assert trackers.items_by_tracker == {1: [2]}
+    assert trackers.delete_calls.count(2) == 1
+
+
+def test_listing_failure_raises_after_the_other_trackers():
+    trackers = FakeTrackers({1: range(4), 2: range(3)}, failing_trackers={2})
+    engine = BulkDeleteEngine(FakeClient(trackers), [1, 2])
+
+    with pytest.raises(Exception, match="403 Forbidden"):
+        engine.run()
+
+    assert engine.deleted_count == 4
+    assert trackers.items_by_tracker[1] == []
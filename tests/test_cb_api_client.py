@@ -0,0 +1,53 @@
+import pytest
+
+# CBApiClient wraps the generated Codebeamer client
+pytest.importorskip("openapi_client")
+
+from apis.cb_client.cb_api_client import CBApiClient
+
+
+class Page:
+    def __init__(self, total, item_refs):
+        self.total = total
+        self.item_refs = item_refs
+
+
+class FakeTrackerApi:
+    def __init__(self, item_count):
+        self.item_count = item_count
+        self.requested_pages = []
+
+    def get_items_by_tracker(self, tracker_id, page, page_size):
+        self.requested_pages.append((page, page_size))
+        first = (page - 1) * page_size
+        return Page(self.item_count, list(range(first, min(first + page_size, self.item_count))))
+
+
+def make_client(item_count):
+    client = CBApiClient.__new__(CBApiClient)
+    client.max_workers = 4
+    client.tracker_api_instance = FakeTrackerApi(item_count)
+    return client
+
+
+def test_pages_are_returned_in_order():
+    client = make_client(23)
+    assert client.get_paginated_tracker_items(1, page_size=5) == list(range(23))
+    assert sorted(client.tracker_api_instance.requested_pages) == [(page, 5) for page in range(1, 6)]
+
+
+def test_single_page_is_fetched_once():
+    client = make_client(5)
+    assert client.get_paginated_tracker_items(1, page_size=5) == list(range(5))
+    assert client.tracker_api_instance.requested_pages == [(1, 5)]
+
+
+def test_empty_tracker():
+    assert make_client(0).get_paginated_tracker_items(1) == []
+
+
+def test_page_size_is_capped():
+    client = make_client(CBApiClient.MAX_PAGE_SIZE + 1)
+    items = client.get_paginated_tracker_items(1, page_size=CBApiClient.MAX_PAGE_SIZE * 2)
+    assert len(items) == CBApiClient.MAX_PAGE_SIZE + 1
+    assert client.tracker_api_instance.requested_pages[0] == (1, CBApiClient.MAX_PAGE_SIZE)
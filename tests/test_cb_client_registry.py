@@ -0,0 +1,47 @@
+import pytest
+
+# The registry creates CBApiClient instances, which wrap the generated Codebeamer client
+pytest.importorskip("openapi_client")
+
+from apis.cb_client import cb_client_registry
+from apis.cb_client.cb_client_registry import CBClientRegistry
+
+
+class FakeClient:
+    def __init__(self, url, username, password, max_workers=8, pool_size=None):
+        self.host = url + "/api"
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(cb_client_registry, "CBApiClient", FakeClient)
+    return CBClientRegistry()
+
+
+def test_same_credentials_share_a_client(registry):
+    first = registry.acquire("http://cb", "alice", "secret")
+    assert registry.acquire("http://cb", "alice", "secret") is first
+    assert registry.acquire("http://cb", "alice", "other") is not first
+    assert registry.acquire("http://cb", "bob", "secret") is not first
+
+
+def test_client_is_closed_after_the_last_release(registry):
+    client = registry.acquire("http://cb", "alice", "secret")
+    registry.acquire("http://cb", "alice", "secret")
+
+    registry.release(client)
+    assert not client.closed
+
+    registry.release(client)
+    assert client.closed
+    assert registry.acquire("http://cb", "alice", "secret") is not client
+
+
+def test_unknown_clients_are_closed_on_release(registry):
+    client = FakeClient("http://cb", "alice", "secret")
+    registry.release(client)
+    assert client.closed
@@ -0,0 +1,37 @@
+from apis.gpt_client.gpt_response_cache import GPTResponseCache
+
+
+def test_key_depends_on_every_request_setting():
+    key = GPTResponseCache.make_key("gpt-4o", [{"role": "user", "content": "hi"}], 0.7, 1000)
+    assert key == GPTResponseCache.make_key("gpt-4o", [{"role": "user", "content": "hi"}], 0.7, 1000)
+    assert key != GPTResponseCache.make_key("gpt-4o", [{"role": "user", "content": "hi"}], 0.2, 1000)
+
+
+def test_key_depends_on_the_response_format():
+    messages = [{"role": "user", "content": "hi"}]
+    schema = {"type": "json_schema", "json_schema": {"name": "steps", "schema": {"type": "object"}}}
+    other_schema = {"type": "json_schema", "json_schema": {"name": "items", "schema": {"type": "object"}}}
+
+    key = GPTResponseCache.make_key("gpt-4o", messages, 0.7, 1000, schema)
+    assert key != GPTResponseCache.make_key("gpt-4o", messages, 0.7, 1000)
+    assert key != GPTResponseCache.make_key("gpt-4o", messages, 0.7, 1000, other_schema)
+    assert GPTResponseCache.make_key("gpt-4o", messages, 0.7, 1000, None) == \
+        GPTResponseCache.make_key("gpt-4o", messages, 0.7, 1000)
+
+
+def test_memory_then_disk_hits(tmp_path):
+    cache = GPTResponseCache(str(tmp_path), memory_entries=1)
+    cache.set("a", "response a")
+    cache.set("b", "response b")
+
+    assert cache.get("b") == "response b"
+    assert cache.get("a") == "response a"
+    assert cache.get("missing") is None
+
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_disk_entries_survive_a_restart(tmp_path):
+    GPTResponseCache(str(tmp_path)).set("a", "response a")
+    assert GPTResponseCache(str(tmp_path)).get("a") == "response a"
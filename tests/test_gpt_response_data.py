@@ -0,0 +1,81 @@
+import pytest
+
+from apis.gpt_client import gpt_response_data
+from apis.gpt_client.gpt_response_data import (BatchTestStepParser, ItemEntry, ItemsParser, StreamingItemsParser,
+                                               WindchillPartParser, load_entries, validate_entries)
+
+
+def test_load_entries_reads_yaml_list():
+    assert load_entries("- name: a\n  description: b\n") == [{"name": "a", "description": "b"}]
+
+
+def test_load_entries_unwraps_structured_output_items():
+    assert load_entries('{"items": [{"name": "a", "description": "b"}]}') == [{"name": "a", "description": "b"}]
+
+
+def test_load_entries_rejects_non_list():
+    with pytest.raises(ValueError):
+        load_entries("name: a")
+
+
+def test_validate_entries_skips_invalid_entries():
+    entries = validate_entries(ItemEntry, [{"name": "a", "description": "b"}, {"name": "c"}])
+    assert [entry.name for entry in entries] == ["a"]
+
+
+def test_validate_entries_fails_when_nothing_is_valid():
+    with pytest.raises(ValueError):
+        validate_entries(ItemEntry, [{"name": "c"}])
+
+
+def test_validate_entries_accepts_empty_list():
+    assert validate_entries(ItemEntry, []) == []
+
+
+def test_items_parser_coerces_numbers_to_text():
+    items = ItemsParser("- name: 2024\n  description: 1.5\n  id: 7\n").get_items()
+    assert [(item.name, item.description, item.parent_id) for item in items] == [("2024", "1.5", 7)]
+
+
+def test_test_step_parser():
+    steps = gpt_response_data.TestStepParser('{"items": [{"action": "Open", "expected_result": "Shown"}]}').get_items()
+    assert [(step.action, step.expected_result) for step in steps] == [("Open", "Shown")]
+
+
+def test_batch_test_step_parser_keys_by_string_id():
+    response = "- test_case_id: 12\n  steps:\n    - action: Run\n      expected_result: Done\n"
+    steps_by_test_case = BatchTestStepParser(response).get_items()
+    assert list(steps_by_test_case) == ["12"]
+    assert steps_by_test_case["12"][0].action == "Run"
+
+
+def test_windchill_part_parser_stringifies_ids():
+    parts = WindchillPartParser("- id: 123\n  part_name: Bolt\n  requirement_name: R1\n").get_items()
+    assert (parts[0].part_id, parts[0].part_name) == ("123", "Bolt")
+
+
+def test_streaming_parser_emits_entries_as_they_complete():
+    parser = StreamingItemsParser()
+    assert parser.feed("```yaml\n- name: a\n  descr") == []
+
+    items = parser.feed("iption: b\n- name: c\n")
+    assert [(item.name, item.description) for item in items] == [("a", "b")]
+
+    items = parser.feed("  description: d\n```")
+    assert items == []
+    assert [(item.name, item.description) for item in parser.close()] == [("c", "d")]
+
+
+def test_streaming_parser_skips_invalid_entries():
+    parser = StreamingItemsParser()
+    assert parser.feed("- name: b\n") == []
+    assert parser.feed("- name: c\n  description: d\n") == []
+    assert [item.name for item in parser.close()] == ["c"]
+
+
+def test_streaming_parser_skips_unparsable_entries():
+    parser = StreamingItemsParser()
+    parser.feed("- name: [a\n  description: b\n")
+    items = parser.feed("- name: c\n  description: d\n")
+    assert items == []
+    assert [item.name for item in parser.close()] == ["c"]
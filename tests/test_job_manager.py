@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from services.job_manager import Job, JobManager
+
+
+class CreateResult:
+    def __init__(self, name, error=None):
+        self.item_request = (None, name)
+        self.error = error
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+
+@pytest.fixture
+def job_manager():
+    manager = JobManager(max_workers=2)
+    yield manager
+    manager.shutdown()
+
+
+def wait_for(job, timeout=5):
+    deadline = time.time() + timeout
+    while not job.finished:
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return job
+
+
+def test_job_result_is_kept(job_manager):
+    job = wait_for(job_manager.submit("test", "session", lambda job: {"created": 1}))
+
+    assert job.state == "succeeded"
+    assert job.result == {"created": 1}
+    assert job_manager.get(job.id) is job
+
+
+def test_job_fails_when_the_service_raises(job_manager):
+    def run(job):
+        raise Exception("boom")
+
+    job = wait_for(job_manager.submit("test", "session", run))
+
+    assert job.state == "failed"
+    assert job.error == "boom"
+
+
+def test_job_fails_when_every_item_failed(job_manager):
+    def run(job):
+        job.record_create_result(CreateResult("a", "400 Bad Request"))
+        job.record_create_result(CreateResult("b", "400 Bad Request"))
+
+    job = wait_for(job_manager.submit("test", "session", run))
+
+    assert job.state == "failed"
+    assert job.to_dict()["progress"]["items_failed"] == 2
+    assert job.item_errors == ["a: 400 Bad Request", "b: 400 Bad Request"]
+
+
+def test_job_with_some_created_items_succeeds(job_manager):
+    def run(job):
+        job.record_create_result(CreateResult("a"))
+        job.record_create_result(CreateResult("b", "400 Bad Request"))
+
+    job = wait_for(job_manager.submit("test", "session", run))
+
+    assert job.state == "succeeded"
+    assert (job.items_created, job.items_failed) == (1, 1)
+
+
+def test_item_errors_are_capped():
+    job = Job("test", "session")
+    for i in range(Job.MAX_ITEM_ERRORS + 5):
+        job.add_failed(str(i))
+
+    assert job.items_failed == Job.MAX_ITEM_ERRORS + 5
+    assert len(job.item_errors) == Job.MAX_ITEM_ERRORS
+
+
+def test_state_counts(job_manager):
+    wait_for(job_manager.submit("test", "session", lambda job: None))
+    counts = job_manager.state_counts()
+    assert counts["succeeded"] == 1
+    assert counts["failed"] == 0
+
+
+def test_finished_jobs_are_pruned():
+    manager = JobManager(max_workers=1, max_finished_jobs=2)
+    try:
+        jobs = [wait_for(manager.submit("test", "session", lambda job: None)) for _ in range(4)]
+        manager.submit("test", "session", lambda job: None)
+
+        assert manager.get(jobs[0].id) is None
+        assert manager.get(jobs[3].id) is jobs[3]
+    finally:
+        manager.shutdown()
@@ -0,0 +1,45 @@
+from metrics import Histogram, MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(5, route="/a")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 5.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+
+
+def test_render_includes_metrics_and_collectors():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests", ("status",)).inc(status=200)
+    registry.add_collector(lambda: [("cache_hits", "Cache hits", [({"cache": "a\"b"}, 3), ({"cache": "c"}, None)])])
+
+    assert registry.render() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{status="200"} 1\n'
+        "# HELP cache_hits Cache hits\n"
+        "# TYPE cache_hits gauge\n"
+        'cache_hits{cache="a\\"b"} 3\n'
+        'cache_hits{cache="c"} NaN\n'
+    )
+
+
+def test_failing_collector_is_skipped():
+    registry = MetricsRegistry()
+    registry.gauge("up", "Up").set(1)
+
+    def collector():
+        raise Exception("boom")
+
+    registry.add_collector(collector)
+    assert registry.render() == "# HELP up Up\n# TYPE up gauge\nup 1\n"
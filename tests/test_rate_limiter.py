@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+# rate_limiter needs the generated Codebeamer client for its exception types
+pytest.importorskip("openapi_client")
+
+from openapi_client.exceptions import ApiException
+
+from apis.cb_client.rate_limiter import AdaptiveRateLimiter, InFlightCounter, RateLimitedApi
+
+
+class FlakyApi:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def get_items(self):
+        return self._call()
+
+    def create_item(self):
+        return self._call()
+
+    def _call(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class FastRetryApi(RateLimitedApi):
+    BACKOFF_BASE_SECONDS = 0.001
+    BACKOFF_MAX_SECONDS = 0.001
+
+
+def test_throttle_halves_rate_down_to_minimum():
+    limiter = AdaptiveRateLimiter(rate=8, min_rate=2, max_rate=100)
+    limiter.on_throttle()
+    assert limiter.rate == 4
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.rate == 2
+    assert limiter.stats()["throttles"] == 3
+
+
+def test_success_raises_rate_up_to_maximum():
+    limiter = AdaptiveRateLimiter(rate=9.95, min_rate=1, max_rate=10)
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.rate == 10
+
+
+def test_acquire_waits_out_retry_after():
+    limiter = AdaptiveRateLimiter(rate=1000, min_rate=1, max_rate=1000)
+    limiter.on_throttle(retry_after=0.1)
+
+    start_time = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start_time >= 0.09
+
+
+def test_acquire_paces_requests_to_the_rate():
+    limiter = AdaptiveRateLimiter(rate=50, min_rate=1, max_rate=50)
+    start_time = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.monotonic() - start_time >= 0.08
+    assert limiter.stats()["requests"] == 6
+
+
+def test_for_server_shares_one_limiter_per_server():
+    assert AdaptiveRateLimiter.for_server("http://a/api") is AdaptiveRateLimiter.for_server("http://a/api")
+    assert AdaptiveRateLimiter.for_server("http://a/api") is not AdaptiveRateLimiter.for_server("http://b/api")
+
+
+def test_throttled_calls_are_retried():
+    api = FlakyApi([ApiException(status=429), ApiException(status=429)])
+    limiter = AdaptiveRateLimiter(rate=1000, min_rate=1, max_rate=1000)
+
+    assert FastRetryApi(api, limiter).create_item() == "ok"
+    assert api.calls == 3
+    assert limiter.stats()["retries"] == 2
+
+
+def test_server_errors_are_only_retried_for_idempotent_calls():
+    limiter = AdaptiveRateLimiter(rate=1000, min_rate=1, max_rate=1000)
+
+    api = FlakyApi([ApiException(status=502)])
+    assert FastRetryApi(api, limiter).get_items() == "ok"
+
+    api = FlakyApi([ApiException(status=502)])
+    with pytest.raises(ApiException):
+        FastRetryApi(api, limiter).create_item()
+    assert api.calls == 1
+
+
+def test_in_flight_counter_tracks_peak():
+    counter = InFlightCounter()
+    with counter:
+        with counter:
+            assert counter.current == 2
+    assert (counter.current, counter.peak) == (0, 2)
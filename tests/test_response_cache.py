@@ -0,0 +1,76 @@
+import time
+
+from response_cache import ResponseCache
+
+
+def test_set_and_get_with_etag():
+    cache = ResponseCache()
+    etag = cache.set("s1", ("trackers", 1), {"trackers": []}, tags=[("project", 1)])
+
+    assert cache.get("s1", ("trackers", 1)) == ({"trackers": []}, etag)
+    assert cache.get("s2", ("trackers", 1)) is None
+    assert etag == ResponseCache.make_etag({"trackers": []})
+
+
+def test_etag_matches():
+    assert ResponseCache.etag_matches('"a", "b"', '"b"')
+    assert ResponseCache.etag_matches('W/"b"', '"b"')
+    assert ResponseCache.etag_matches("*", '"b"')
+    assert not ResponseCache.etag_matches(None, '"b"')
+    assert not ResponseCache.etag_matches('"a"', '"b"')
+
+
+def test_invalidate_drops_tagged_entries_of_every_session():
+    cache = ResponseCache()
+    cache.set("s1", ("tracker_items", 1), {}, tags=[("tracker", 1)])
+    cache.set("s2", ("tracker_items", 1), {}, tags=[("tracker", 1)])
+    cache.set("s1", ("tracker_items", 2), {}, tags=[("tracker", 2)])
+
+    cache.invalidate(("tracker", 1))
+
+    assert cache.get("s1", ("tracker_items", 1)) is None
+    assert cache.get("s2", ("tracker_items", 1)) is None
+    assert cache.get("s1", ("tracker_items", 2)) is not None
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_reads_started_before_an_invalidation_are_not_stored():
+    cache = ResponseCache()
+    generation = cache.generation()
+    cache.invalidate(("tracker", 1))
+
+    cache.set("s1", ("tracker_items", 1), {}, tags=[("tracker", 1)], generation=generation)
+    cache.set("s1", ("tracker_items", 2), {}, tags=[("tracker", 2)], generation=generation)
+
+    assert cache.get("s1", ("tracker_items", 1)) is None
+    assert cache.get("s1", ("tracker_items", 2)) is not None
+
+
+def test_entries_expire(monkeypatch):
+    cache = ResponseCache(ttl_seconds=10)
+    cache.set("s1", "key", {})
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert cache.get("s1", "key") is None
+
+
+def test_oldest_entries_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set("s1", "a", {})
+    cache.set("s1", "b", {})
+    cache.get("s1", "a")
+    cache.set("s1", "c", {})
+
+    assert cache.get("s1", "a") is not None
+    assert cache.get("s1", "b") is None
+
+
+def test_drop_session():
+    cache = ResponseCache()
+    cache.set("s1", "a", {})
+    cache.set("s2", "a", {})
+    cache.drop_session("s1")
+
+    assert cache.get("s1", "a") is None
+    assert cache.get("s2", "a") is not None
@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+# main imports the generated Codebeamer client
+pytest.importorskip("openapi_client")
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def test_session_is_stored_once_the_cookie_comes_back(client):
+    first = client.get("/api/session_check")
+    session_id = first.cookies["session_id"]
+    assert session_id not in main.session_store
+
+    client.post("/api/set_product", json={"product_name": "Snowmobile"})
+    assert main.session_store[session_id]["product_name"] == "Snowmobile"
+
+
+def test_expired_session_gets_a_new_cookie(client, monkeypatch):
+    client.get("/api/session_check")
+    client.post("/api/set_product", json={"product_name": "Snowmobile"})
+    session_id = client.cookies["session_id"]
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + main.SESSION_EXPIRATION_SECONDS + 1)
+    response = client.get("/api/session_check")
+
+    assert response.status_code == 400
+    assert response.cookies["session_id"] != session_id
+    assert session_id not in main.session_store
+
+
+def test_tampered_cookie_gets_a_new_cookie(client):
+    client.cookies.set("session_id", "not-signed")
+    response = client.get("/api/session_check")
+    assert response.cookies["session_id"] != "not-signed"
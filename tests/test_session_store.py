@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+from session_store import InMemorySessionBackend, SessionStore, SQLiteSessionBackend
+
+
+class FakeClient:
+    pass
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    return InMemorySessionBackend()
+
+
+def make_store(backend, released, **kwargs):
+    return SessionStore(backend, release_client=released.append, **kwargs)
+
+
+def test_update_and_get(backend):
+    store = make_store(backend, [])
+    store.create("s1")
+    store.update("s1", cb_url="http://cb", project_map={"P": 1})
+
+    assert "s1" in store
+    assert store["s1"]["project_map"] == {"P": 1}
+    assert store.get("s1")["cb_url"] == "http://cb"
+    assert "created_at" in store["s1"]
+
+
+def test_update_of_unknown_session_fails(backend):
+    with pytest.raises(KeyError):
+        make_store(backend, []).update("missing", cb_url="http://cb")
+
+
+def test_clients_stay_local_and_are_released(backend):
+    released = []
+    store = make_store(backend, released)
+    first, second = FakeClient(), FakeClient()
+    store.create("s1")
+
+    store.update("s1", cb_api_client=first)
+    assert "cb_api_client" not in backend.load("s1")[0]
+    assert store["s1"]["cb_api_client"] is first
+
+    store.update("s1", cb_api_client=second)
+    assert released == [first]
+
+    store.delete("s1")
+    assert released == [first, second]
+    assert "s1" not in store
+
+
+def test_expired_sessions_are_dropped(backend, monkeypatch):
+    released = []
+    store = make_store(backend, released, ttl_seconds=10)
+    client = FakeClient()
+    store.create("s1")
+    store.update("s1", cb_api_client=client)
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+
+    assert "s1" not in store
+    assert released == [client]
+
+
+def test_get_state_tells_expired_from_missing(backend, monkeypatch):
+    store = make_store(backend, [], ttl_seconds=10)
+    store.create("s1")
+    assert store.get_state("s1") == "active"
+    assert store.get_state("s2") == "missing"
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert store.get_state("s1") == "expired"
+    assert store.get_state("s1") == "missing"
+
+
+def test_get_only_touches_after_the_interval(backend, monkeypatch):
+    store = make_store(backend, [])
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    store.create("s1")
+
+    monkeypatch.setattr(time, "time", lambda: now + 1)
+    store.get("s1")
+    assert backend.load("s1")[2] == now
+
+    monkeypatch.setattr(time, "time", lambda: now + SessionStore.TOUCH_INTERVAL_SECONDS)
+    store.get("s1")
+    assert backend.load("s1")[2] == now + SessionStore.TOUCH_INTERVAL_SECONDS
+
+
+def test_sweep_removes_expired_sessions(backend, monkeypatch):
+    store = make_store(backend, [], ttl_seconds=10)
+    store.create("s1")
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    store.create("s2")
+
+    assert store.sweep() == 1
+    assert backend.count() == 1
+
+
+def test_least_recently_used_sessions_are_evicted(backend, monkeypatch):
+    store = make_store(backend, [], max_entries=2)
+    now = time.time()
+    for offset, session_id in enumerate(["s1", "s2"]):
+        monkeypatch.setattr(time, "time", lambda: now + offset)
+        store.create(session_id)
+
+    monkeypatch.setattr(time, "time", lambda: now + SessionStore.TOUCH_INTERVAL_SECONDS + 1)
+    store.get("s1")
+    monkeypatch.setattr(time, "time", lambda: now + SessionStore.TOUCH_INTERVAL_SECONDS + 2)
+    store.create("s3")
+
+    assert "s1" in store
+    assert "s2" not in store
+    assert "s3" in store
@@ -0,0 +1,46 @@
+import pytest
+
+# StatusUpdater builds status references with the generated Codebeamer client
+pytest.importorskip("openapi_client")
+
+from services.status_updater import StatusUpdater
+
+
+class Status:
+    def __init__(self, status_id):
+        self.id = status_id
+
+
+class Item:
+    def __init__(self, status_id):
+        self.status = Status(status_id)
+
+
+# New(1) -> In Progress(2) -> Done(3), and New(1) -> Blocked(4)
+def make_updater(target_distribution=None):
+    updater = StatusUpdater(type("Client", (), {"max_workers": 2})(), 1, [], target_distribution)
+    updater.status_names = {1: "New", 2: "In Progress", 3: "Done", 4: "Blocked"}
+    for from_id, to_ids in {1: {1, 2, 4}, 2: {2, 3}, 3: {3}, 4: {4}}.items():
+        updater.transition_map[from_id] = set(to_ids)
+    return updater
+
+
+def test_get_paths_from_finds_shortest_paths():
+    paths = make_updater().get_paths_from(1)
+    assert paths == {1: [], 2: [2], 3: [2, 3], 4: [4]}
+
+
+def test_unreachable_statuses_have_no_path():
+    assert make_updater().get_paths_from(3) == {3: []}
+
+
+def test_plan_distribution_meets_the_targets():
+    updater = make_updater({"Done": 50, "Blocked": 50})
+    paths = updater.plan_distribution([Item(1) for _ in range(4)])
+    assert sorted(paths) == [[2, 3], [2, 3], [4], [4]]
+
+
+def test_plan_distribution_leaves_items_that_cant_reach_a_target():
+    updater = make_updater({"blocked": 1})
+    paths = updater.plan_distribution([Item(2), Item(1)])
+    assert paths == [[], [4]]
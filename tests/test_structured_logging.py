@@ -0,0 +1,32 @@
+import logging
+
+from structured_logging import SamplingFilter
+
+
+def make_record(level, per_item=True):
+    record = logging.LogRecord("demo_generator.test", level, __file__, 1, "message", None, None)
+    if per_item:
+        record.per_item = True
+    return record
+
+
+def test_keeps_every_nth_per_item_record():
+    sampling_filter = SamplingFilter({logging.INFO: 0.25})
+    kept = [sampling_filter.filter(make_record(logging.INFO)) for _ in range(8)]
+
+    assert kept == [True, False, False, False, True, False, False, False]
+    assert sampling_filter.dropped == 6
+
+
+def test_other_records_always_pass():
+    sampling_filter = SamplingFilter({logging.INFO: 0.25, logging.WARNING: 0})
+
+    assert all(sampling_filter.filter(make_record(logging.INFO, per_item=False)) for _ in range(4))
+    assert all(sampling_filter.filter(make_record(logging.ERROR)) for _ in range(4))
+    assert sampling_filter.dropped == 0
+
+
+def test_zero_rate_drops_every_per_item_record():
+    sampling_filter = SamplingFilter({logging.WARNING: 0})
+    assert not any(sampling_filter.filter(make_record(logging.WARNING)) for _ in range(3))
+    assert sampling_filter.dropped == 3
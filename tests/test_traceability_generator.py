@@ -0,0 +1,44 @@
+import pytest
+
+# The generator imports the generated Codebeamer client through CBApiClient
+pytest.importorskip("openapi_client")
+
+from services.traceability_generator import TraceabilityGenerator
+
+
+class Item:
+    def __init__(self, name, parent_id):
+        self.name = name
+        self.parent_id = parent_id
+
+
+def make_generator(downstream_count=1, chunk_token_budget=3000):
+    return TraceabilityGenerator(None, "Racecar", 1, [], 2, downstream_count, "",
+                                 chunk_token_budget=chunk_token_budget)
+
+
+def test_chunks_stay_within_the_token_budget():
+    id_name_map = {item_id: "Requirement " + str(item_id) for item_id in range(10)}
+    generator = make_generator(chunk_token_budget=3 * TraceabilityGenerator.ESTIMATED_TOKENS_PER_ITEM + 30)
+
+    chunks = generator.chunk_id_name_map(id_name_map)
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    assert {item_id: name for chunk in chunks for item_id, name in chunk.items()} == id_name_map
+
+
+def test_an_item_larger_than_the_budget_gets_its_own_chunk():
+    generator = make_generator(downstream_count=5, chunk_token_budget=100)
+    assert generator.chunk_id_name_map({1: "a", 2: "b"}) == [{1: "a"}, {2: "b"}]
+
+
+def test_match_parent_ids_keeps_known_ids_of_the_chunk():
+    items = [Item("a", "1"), Item("b", 2), Item("c", 3)]
+    matched = TraceabilityGenerator.match_parent_ids({1: "x", 2: "y"}, items)
+    assert [(item.name, item.parent_id) for item in matched] == [("a", 1), ("b", 2)]
+
+
+def test_downstream_count_above_the_output_limit_is_rejected():
+    generator = make_generator(downstream_count=make_generator().max_downstream_count() + 1)
+    with pytest.raises(Exception):
+        generator.generate()
@@ -0,0 +1,60 @@
+import pytest
+
+import tracing
+from tracing import ContextThreadPoolExecutor, span, start_trace
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.spans = []
+
+    def write(self, new_span):
+        self.spans.append(new_span)
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    recording_writer = RecordingWriter()
+    monkeypatch.setattr(tracing, "span_writer", recording_writer)
+    return recording_writer
+
+
+def test_spans_in_worker_threads_are_children_of_the_submitting_span(writer):
+    def work(i):
+        with span("work", index=i) as child:
+            return child.parent_id
+
+    with start_trace("request") as root:
+        with span("fan_out") as fan_out:
+            with ContextThreadPoolExecutor(max_workers=2) as executor:
+                parent_ids = list(executor.map(work, range(3)))
+
+    assert parent_ids == [fan_out.span_id] * 3
+    assert fan_out.parent_id == root.span_id
+    assert [recorded.name for recorded in writer.spans].count("work") == 3
+    assert {recorded.trace.trace_id for recorded in writer.spans} == {root.trace.trace_id}
+
+
+def test_span_without_a_trace_does_nothing(writer):
+    with span("orphan") as orphan:
+        assert orphan is None
+    assert writer.spans == []
+
+
+def test_errors_are_recorded_on_the_span(writer):
+    with pytest.raises(ValueError):
+        with start_trace("request"):
+            with span("failing"):
+                raise ValueError("bad")
+
+    assert [(recorded.name, recorded.error) for recorded in writer.spans] == [
+        ("failing", "ValueError: bad"), ("request", "ValueError: bad")]
+
+
+def test_unexported_traces_are_not_written(writer):
+    with start_trace("request", export=False) as root:
+        with span("child"):
+            pass
+
+    assert writer.spans == []
+    assert "child=1x" in root.trace.summary()
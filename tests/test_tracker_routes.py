@@ -0,0 +1,67 @@
+import pytest
+
+# main imports the generated Codebeamer client
+pytest.importorskip("openapi_client")
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+class Tracker:
+    def __init__(self, tracker_id, name):
+        self.id = tracker_id
+        self.name = name
+
+
+class FakeProjectApi:
+    def __init__(self):
+        self.calls = 0
+
+    def get_trackers(self, project_id):
+        self.calls += 1
+        return [Tracker(7, "Requirements")]
+
+
+class FakeClient:
+    def __init__(self):
+        self.project_api_instance = FakeProjectApi()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client():
+    test_client = TestClient(main.app)
+    test_client.get("/api/session_check")
+    test_client.post("/api/set_product", json={"product_name": "Snowmobile"})
+    cb_api_client = FakeClient()
+    main.session_store.update(test_client.cookies["session_id"], project_map={"Demo": 1}, cb_api_client=cb_api_client)
+    yield test_client
+    main.response_cache.drop_session(test_client.cookies["session_id"])
+
+
+def test_get_revalidates_with_the_etag(client):
+    first = client.get("/api/trackers", params={"project_name": "Demo"})
+    assert first.json() == {"trackers": [{"name": "Requirements", "id": 7}]}
+
+    second = client.get("/api/trackers", params={"project_name": "Demo"},
+                        headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+def test_post_is_served_from_the_cache_without_a_304(client):
+    first = client.get("/api/trackers", params={"project_name": "Demo"})
+    second = client.post("/api/trackers", json={"project_name": "Demo"},
+                         headers={"If-None-Match": first.headers["etag"]})
+
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    project_api = main.session_store[client.cookies["session_id"]]["cb_api_client"].project_api_instance
+    assert project_api.calls == 1
+
+
+def test_unknown_project(client):
+    assert client.get("/api/trackers", params={"project_name": "Other"}).status_code == 404
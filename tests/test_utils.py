@@ -0,0 +1,20 @@
+import pytest
+
+# Utils builds the generated Codebeamer client's reference models
+pytest.importorskip("openapi_client")
+
+from apis.cb_client.utils import Utils
+
+
+def test_distribute_counts_adds_up_to_total():
+    counts = Utils.distribute_counts({"a": 1, "b": 1, "c": 1}, 10)
+    assert sum(counts.values()) == 10
+    assert sorted(counts.values()) == [3, 3, 4]
+
+
+def test_distribute_counts_follows_weights():
+    assert Utils.distribute_counts({"a": 3, "b": 1}, 8) == {"a": 6, "b": 2}
+
+
+def test_distribute_counts_without_weight():
+    assert Utils.distribute_counts({"a": 0}, 5) == {}
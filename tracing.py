@@ -0,0 +1,158 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from structured_logging import get_logger
+
+logger = get_logger("tracing")
+
+
+# Lightweight request tracing.
+#
+# A trace starts with a root span (one per FastAPI request) and every span opened while it
+# is current becomes its child. The current span lives in a contextvar, so it follows the
+# request into awaited code, and into worker threads started through ContextThreadPoolExecutor.
+# Finished spans are appended to a JSONL file, one span per line.
+#
+# Tracing is off unless TRACING_ENABLED is set or a request asks for a trace summary. When no
+# trace is active, span() does nothing, so the hot paths only pay for a contextvar lookup.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+# Spans of one trace, aggregated by name for the debug summary
+class Trace:
+    def __init__(self, export=True):
+        self.trace_id = uuid.uuid4().hex
+        self.export = export
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        with self._lock:
+            count, total_seconds = self._totals.get(span.name, (0, 0.0))
+            self._totals[span.name] = (count + 1, total_seconds + span.duration)
+
+    # e.g. "gpt.prompt=2x3120ms, codebeamer.create_tracker_item=40x2210ms"
+    def summary(self, limit=10):
+        with self._lock:
+            totals = sorted(self._totals.items(), key=lambda entry: entry[1][1], reverse=True)
+        return ", ".join(f"{name}={count}x{total_seconds * 1000:.0f}ms" for name, (count, total_seconds) in totals[:limit])
+
+
+class Span:
+    def __init__(self, name, trace, parent=None, attributes=None):
+        self.name = name
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = 0.0
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "thread": threading.current_thread().name,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+# Appends finished spans to the trace file
+class JsonlSpanWriter:
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line + "\n")
+
+
+span_writer = JsonlSpanWriter(TRACE_FILE)
+
+
+def current_span():
+    return _current_span.get()
+
+
+# Starts a new trace. export=False keeps the spans out of the trace file, for requests that
+# only want the summary header.
+@contextmanager
+def start_trace(name, export=True, **attributes):
+    with _run_span(Span(name, Trace(export), attributes=attributes)) as root:
+        yield root
+
+
+# Opens a child of the current span; does nothing when no trace is active.
+# Generators that yield inside the span must pass activate=False, otherwise the span would
+# leak into the caller's context between yields.
+@contextmanager
+def span(name, activate=True, **attributes):
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    with _run_span(Span(name, parent.trace, parent, attributes), activate) as child:
+        yield child
+
+
+# Sets an attribute on the current span, if there is one
+def set_attribute(key, value):
+    current = _current_span.get()
+    if current is not None:
+        current.set_attribute(key, value)
+
+
+@contextmanager
+def _run_span(new_span, activate=True):
+    token = _current_span.set(new_span) if activate else None
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = type(e).__name__ + ": " + str(e)
+        raise
+    finally:
+        if token is not None:
+            _current_span.reset(token)
+        new_span.finish()
+        new_span.trace.record(new_span)
+        if new_span.trace.export:
+            try:
+                span_writer.write(new_span)
+            except OSError as e:
+                logger.warning("Failed to write span: " + str(e))
+
+
+# ThreadPoolExecutor that runs each task in a copy of the submitting thread's context, so
+# spans opened in a worker thread become children of the span that submitted the work
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    def submit(self, fn, /, *args, **kwargs):
+        context = contextvars.copy_context()
+        return super().submit(context.run, fn, *args, **kwargs)